@@ -1,91 +1,286 @@
 from flask import Flask, request, jsonify, send_from_directory, Response
 from flask_cors import CORS
 import os
+import sys
 import subprocess
 import threading
-import queue
 import time
 import uuid
+import re
 import json
-import numpy as np
-import math
-from ffprobe import FFProbe
+import shutil
+import mimetypes
 from dotenv import load_dotenv
+from result_cache import ResultCache, hash_file, make_cache_key
+from scheduler import JobScheduler, Stage, QueueFullError, NEW_PROCESS_GROUP, SKIPPED
+from task_store import open_task_store, fail_orphaned_tasks, process_owner
+from event_bus import EventBus, sse_stream
+from job_groups import JobGroups
+from zip_stream import stream_zip
+from remote_workers import LeaseQueue, SYNC_ROOTS, map_path
+from camera_path import build_camera_path, write_camera_path
+from mesh_cache import MeshCache, make_mesh_key
+from mesh_lod import LOD_TRIANGLES, build_lod
+from metrics import Metrics, ProcessSampler
+from uploads import UploadManager, UploadError, probe_video
+from planner import RuntimeModel, plan_extraction, fit_plan
+from render_segments import SEGMENTS_DIR, detect_render_devices, plan_segments, segment_path, frame_pattern, missing_frames, aggregate_progress, encode_frames, concat_segments
+
+# Stage checkpoints are shared with video2nerf.py in the project directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_stages import PIPELINE_STAGES, PipelineStage, check_stage, clear_manifest, record_stage, stage_range
+from frame_extractor import FRAME_FORMATS, frame_glob
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
-os.add_dll_directory(os.getenv("CUDA_BIN_PATH"))
+# Only Windows needs the CUDA DLL directory registered explicitly
+if hasattr(os, 'add_dll_directory') and os.getenv("CUDA_BIN_PATH"):
+    os.add_dll_directory(os.getenv("CUDA_BIN_PATH"))
 
 # Get the absolute path to the project root (D:\VScode\Code\simpleNeRF)
 # Assuming app.py is in Video2NeRF/backend/
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-VENV_PYTHON_PATH = os.path.join(PROJECT_ROOT, '.venv', 'Scripts', 'python.exe')
+VIDEO2NERF_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Interpreter and instant-ngp scripts used for the pipeline subprocesses; the
+# environment overrides let other setups (and benchmarks/bench_e2e.py) swap them
+VENV_PYTHON_PATH = os.getenv("VENV_PYTHON_PATH", os.path.join(PROJECT_ROOT, '.venv', 'Scripts', 'python.exe'))
+INSTANT_NGP_SCRIPTS = os.getenv("INSTANT_NGP_SCRIPTS", os.path.join(PROJECT_ROOT, 'instant-ngp', 'scripts'))
+RUN_SCRIPT_PATH = os.path.join(INSTANT_NGP_SCRIPTS, 'run.py')
 
-app = Flask(__name__, static_folder=os.path.join(PROJECT_ROOT, 'Video2NeRF'))
+app = Flask(__name__, static_folder=VIDEO2NERF_DIR)
 CORS(app) # Enable CORS for all routes
 
-UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'uploads')
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(PROJECT_ROOT, 'uploads'))
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
+# Uploads are stored by content hash with their probed metadata; see uploads.py
+upload_manager = UploadManager(UPLOAD_FOLDER)
 
 # Base directory for storing NeRF datasets (frames, transforms.json, snapshots, videos)
-dataset_base_dir = os.path.join(PROJECT_ROOT, 'Video2NeRF', 'dataset', 'my_video') # Updated path
+dataset_base_dir = os.getenv("DATASET_DIR", os.path.join(VIDEO2NERF_DIR, 'dataset', 'my_video')) # Updated path
 if not os.path.exists(dataset_base_dir):
     os.makedirs(dataset_base_dir)
 
-PROCESSING_STATUS = {}
+# Pipeline parameters; everything here is part of the result cache key
+COLMAP_QUALITY = 'low'
+TRAIN_STEPS = 2000
+RENDER_SETTINGS = {
+    'fps': 30,
+    'width': 1280,
+    'height': 720,
+    'n_seconds': 5,
+    'num_frames': 60,
+}
+
+# Views closer than PRUNE_MIN_VIEW_DISTANCE to a kept one are dropped before
+# training (see prune_views.py); PRUNE_MAX_VIEWS caps the rest (0 = no cap)
+PRUNE_MIN_VIEW_DISTANCE = float(os.getenv("PRUNE_MIN_VIEW_DISTANCE", "0.02"))
+PRUNE_MAX_VIEWS = int(os.getenv("PRUNE_MAX_VIEWS", "0"))
+
+# 'chunked' splits the render across one run.py process per granted device slot
+# (RENDER_PROCESSES_PER_DEVICE per GPU); 'single' always uses one process. The
+# output is the same either way, so neither is part of the cache key.
+RENDER_MODE = os.getenv("RENDER_MODE", "chunked")
+RENDER_PROCESSES_PER_DEVICE = int(os.getenv("RENDER_PROCESSES_PER_DEVICE", "1"))
+RENDER_SEGMENT_RETRIES = int(os.getenv("RENDER_SEGMENT_RETRIES", "2"))
+
+# SIFT features and matches shared by all runs, keyed by frame content, so
+# reprocessing a video at another fps only extracts and matches the new frames.
+# An empty FEATURE_CACHE_PATH disables it.
+FEATURE_CACHE_PATH = os.getenv("FEATURE_CACHE_PATH", os.path.join(dataset_base_dir, 'feature_cache.db'))
+FEATURE_CACHE_MAX_GB = float(os.getenv("FEATURE_CACHE_MAX_GB", "20"))
+
+# Finished runs are reused for identical (video content, parameters) submissions
+RESULT_CACHE_MAX_BYTES = int(float(os.getenv("RESULT_CACHE_MAX_GB", "50")) * 1024 ** 3)
+result_cache = ResultCache(dataset_base_dir, RESULT_CACHE_MAX_BYTES)
+
+# Stage wall times, subprocess CPU/RSS and queue gauges, served at /metrics
+metrics = Metrics()
+
+# Per-quality extraction presets: sampling fps, frame count to aim for, and pixel
+# budget per frame. planner.py fits fps and frame width to each video's probed
+# length and resolution, so long or 4K clips stay near the same workload.
+QUALITY_PRESETS = {
+    'low': {'fps': 2, 'target_frames': 60, 'max_pixels': 960 * 540},
+    'normal': {'fps': 4, 'target_frames': 120, 'max_pixels': 1280 * 720},
+    'high': {'fps': 6, 'target_frames': 180, 'max_pixels': 1920 * 1080},
+}
+
+# Stage runtimes of finished jobs, regressed on their plans for /estimate_time
+# and the fit_minutes mode of /process_video
+runtime_model = RuntimeModel(os.getenv("TIMING_HISTORY", os.path.join(dataset_base_dir, 'timing_history.jsonl')))
+
+def on_stage_done(job, stage, seconds, outcome):
+    # Skipped stages only count as runs; their near-zero time would skew the histogram
+    metrics.observe_stage(stage.name, None if outcome == SKIPPED else seconds, outcome)
+    if outcome == 'ok':
+        task_info = task_store.get(job.job_id)
+        if task_info is not None and task_info.get('plan'):
+            runtime_model.record(stage.name, task_info['plan'], seconds)
+
+# video2nerf (frame extraction + COLMAP) runs in the CPU pool; training and
+# rendering share the GPU pool, which is a single slot by default
+job_scheduler = JobScheduler(
+    pool_sizes={
+        'cpu': int(os.getenv("SCHEDULER_CPU_WORKERS", "2")),
+        'gpu': int(os.getenv("SCHEDULER_GPU_WORKERS", "1")),
+    },
+    max_queued=int(os.getenv("SCHEDULER_MAX_QUEUED", "50")),
+    default_durations={'video2nerf': 600, 'train': 300, 'camera_path': 1, 'render': 120, 'mesh_export': 60, 'mesh_lod': 30},
+    stage_listener=on_stage_done,
+)
+ProcessSampler(metrics, job_scheduler.running_processes).start()
+
+# Statuses after which a task produces no further output; 'stopped' ends a run
+# limited with to_stage before rendering
+TERMINAL_STATUSES = ('completed', 'stopped', 'failed', 'training_failed', 'rendering_failed', 'cancelled')
+
+# Stages video2nerf.py runs itself; the rest are run from here
+VIDEO2NERF_STAGES = PIPELINE_STAGES[:4]
+
+# Task records and their output logs; SQLite by default so any server process
+# can answer /progress, /video_result and /export_model, and state survives restarts
+task_store = open_task_store(os.getenv("TASK_STORE", os.path.join(dataset_base_dir, 'tasks.db')))
+fail_orphaned_tasks(task_store, TERMINAL_STATUSES)
+
+# Wakes /progress subscribers as soon as a task produces output
+event_bus = EventBus()
+
+# Batch groups (POST /batch): member output is folded into the group's own log,
+# so /progress/<group_id> streams the whole batch
+job_groups = JobGroups(task_store, lambda *args, **kwargs: emit(*args, **kwargs), TERMINAL_STATUSES,
+                       on_member_done=lambda group_id, task_id, status: export_group_meshes(group_id, task_id, status))
+BATCH_MAX_VIDEOS = int(os.getenv("BATCH_MAX_VIDEOS", "500"))
+
+# Exported meshes, generated once per (snapshot, format, level of detail, marching
+# cubes settings) and evicted least-recently-used beyond MESH_CACHE_MAX_GB. Every
+# export is welded, decimated to its level of detail (see mesh_lod.py) and
+# quantized; ply is binary and glb uses 16-bit positions for the web viewer.
+MESH_CACHE_MAX_BYTES = int(float(os.getenv("MESH_CACHE_MAX_GB", "10")) * 1024 ** 3)
+mesh_cache = MeshCache(os.path.join(dataset_base_dir, 'mesh_cache'), MESH_CACHE_MAX_BYTES)
+MESH_FORMATS = ('obj', 'ply', 'glb')
+mimetypes.add_type('model/gltf-binary', '.glb')
+MESH_DEFAULT_RESOLUTION = 512
+MESH_DEFAULT_DENSITY_THRESH = 2.5
+
+# Stage commands of the pools listed in REMOTE_POOLS (e.g. "cpu,gpu") are leased to
+# worker.py processes instead of being run here; see remote_workers.py. The local
+# pool sizes still cap how many stages run at once, so raise SCHEDULER_*_WORKERS
+# to the number of workers. WORKER_TOKEN, if set, is required from workers.
+REMOTE_POOLS = [pool for pool in os.getenv("REMOTE_POOLS", "").split(',') if pool]
+WORKER_TOKEN = os.getenv("WORKER_TOKEN", "")
+lease_queue = LeaseQueue({
+    'dataset': dataset_base_dir,
+    'uploads': UPLOAD_FOLDER,
+    'python': VENV_PYTHON_PATH,
+    'instant_ngp': INSTANT_NGP_SCRIPTS,
+    'video2nerf': VIDEO2NERF_DIR,
+}, lease_seconds=float(os.getenv("WORKER_LEASE_SECONDS", "30")))
+
+def subprocess_env():
+    # Environment for instant-ngp subprocesses, with the CUDA bin directory on PATH
+    env = os.environ.copy()
+    cuda_bin_path = os.getenv("CUDA_BIN_PATH")
+    if cuda_bin_path:
+        env["PATH"] = cuda_bin_path + os.pathsep + env["PATH"] if env.get("PATH") else cuda_bin_path
+    return env
+
+def emit(task_id, line, progress=None, status=None, coalesce=False):
+    # Persist an output line together with the progress/status it reports, then
+    # push it to live subscribers. coalesce=True throttles high-rate PROGRESS lines.
+    entry = task_store.append_log(task_id, line, progress=progress, status=status)
+    if entry is not None:
+        event_bus.publish(task_id, entry, coalesce=coalesce)
+        if entry['status'] in TERMINAL_STATUSES:
+            event_bus.forget(task_id)
+        if job_groups.is_member(task_id):
+            job_groups.on_entry(task_id, entry, coalesce)
+    return entry
 
-# Queue for capturing script output
-output_queue = queue.Queue()
+def launch(task_id, pool, command, inputs=(), outputs=(), cwd=None, env=None):
+    # Starts a stage command here, or leases it to a remote worker when its pool is
+    # remote (`inputs`/`outputs` are what the worker has to download and upload).
+    # Either way the process reads the same and is registered for cancellation.
+    if pool in REMOTE_POOLS:
+        process = lease_queue.submit(task_id, pool, command, cwd, inputs, outputs)
+    else:
+        process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, env=env,
+                                   **NEW_PROCESS_GROUP)
+    job_scheduler.register_process(task_id, process)
+    return process
+
+# Progress once video2nerf.py reports "[Stages] Running|Skipping <stage>"
+VIDEO2NERF_STAGE_PROGRESS = {'frames': 20, 'sfm': 40, 'transforms': 70, 'prune': 85}
+VIDEO2NERF_STAGE_LINE = re.compile(r'\[Stages\] (?:Running|Skipping) (\w+)')
 
-def run_script_in_background(video_path, output_dir, fps, task_id, original_filename):
-    script_path = os.path.join(PROJECT_ROOT, 'Video2NeRF', 'video2nerf.py') # Updated path
+def run_script_in_background(video_path, output_dir, options, task_id, original_filename):
+    script_path = os.path.join(VIDEO2NERF_DIR, 'video2nerf.py') # Updated path
     command = [
         VENV_PYTHON_PATH, script_path,
         '--video_path', video_path,
         '--output_dir', output_dir,
-        '--fps', str(fps)
+        '--fps', str(options['fps']),
+        '--frame_width', str(options.get('frame_width', 0)),
+        '--frame_format', options.get('frame_format', 'jpg'),
+        '--colmap_quality', options['colmap_quality'],
+        '--frame_selection', options['frame_selection'],
+        '--target_frames', str(options['target_frames']),
+        '--sfm', options['sfm'],
+        '--converter', options['converter'],
+        '--prune_max_views', str(options.get('prune_max_views', 0)),
+        '--prune_min_distance', str(options.get('prune_min_distance', 0.0)),
     ]
+    if FEATURE_CACHE_PATH:
+        command += ['--feature_cache', FEATURE_CACHE_PATH, '--feature_cache_max_gb', str(FEATURE_CACHE_MAX_GB)]
+    if options.get('from_stage') in VIDEO2NERF_STAGES:
+        command += ['--from-stage', options['from_stage']]
+    if options.get('to_stage') in VIDEO2NERF_STAGES:
+        command += ['--to-stage', options['to_stage']]
     
-    PROCESSING_STATUS[task_id] = {'status': 'started', 'progress': 0, 'output': [], 'video_original_name': original_filename}
+    task_store.update(task_id, status='started', progress=0)
 
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    process = launch(task_id, 'cpu', command, inputs=[video_path, output_dir], outputs=[output_dir])
     
+    progress = 0
+    step_timings = {}
     for line in iter(process.stdout.readline, ''):
         print(f"[video2nerf] {line.strip()}") # Added logging for subprocess output
-        PROCESSING_STATUS[task_id]['output'].append(line.strip())
-        # Here you might parse the line to update a more meaningful progress
-        if "Extract frames" in line:
-            PROCESSING_STATUS[task_id]['progress'] = 20
-        elif "Run COLMAP automatic reconstruction" in line:
-            PROCESSING_STATUS[task_id]['progress'] = 40
-        elif "Export sparse model to text format" in line:
-            PROCESSING_STATUS[task_id]['progress'] = 60
-        elif "Run colmap2nerf.py" in line:
-            PROCESSING_STATUS[task_id]['progress'] = 80
+        if line.startswith("[Timing] "):
+            # "[Timing] <step> <seconds>s", reported by video2nerf.py after each step
+            try:
+                step, seconds = line.split()[1:3]
+                step_timings[step] = float(seconds.rstrip('s'))
+                metrics.observe_stage(step, step_timings[step])
+            except ValueError:
+                pass
+        elif line.startswith("[Prune] Summary: "):
+            try:
+                task_store.update(task_id, view_pruning=json.loads(line[len("[Prune] Summary: "):]))
+            except ValueError:
+                pass
+        # Only the stage name counts (the reason may mention other stages), and progress never goes back
+        stage_match = VIDEO2NERF_STAGE_LINE.match(line)
+        if stage_match:
+            progress = max(progress, VIDEO2NERF_STAGE_PROGRESS.get(stage_match.group(1), progress))
         elif "All done!" in line:
-            PROCESSING_STATUS[task_id]['progress'] = 100
-            PROCESSING_STATUS[task_id]['status'] = 'completed'
+            progress = 100
         
-        output_queue.put({'task_id': task_id, 'line': line.strip(), 'progress': PROCESSING_STATUS[task_id]['progress']})
+        emit(task_id, line.strip(), progress=progress)
 
     process.wait()
+    task_store.update(task_id, step_timings=step_timings)
     if process.returncode != 0:
-        PROCESSING_STATUS[task_id]['status'] = 'failed'
-        output_queue.put({'task_id': task_id, 'line': f"Script failed with exit code {process.returncode}", 'progress': PROCESSING_STATUS[task_id]['progress']})
-    else:
-        PROCESSING_STATUS[task_id]['status'] = 'video2nerf_completed'
-        output_queue.put({'task_id': task_id, 'line': "Video2NeRF completed successfully", 'progress': 100})
-
-        # Now, trigger NeRF training
-        train_nerf_model(output_dir, task_id)
+        emit(task_id, f"Script failed with exit code {process.returncode}", status='failed')
+        return False
+    emit(task_id, "Video2NeRF completed successfully", progress=100, status='video2nerf_completed')
+    return True
 
 def train_nerf_model(output_dir, task_id):
     # Revert changes related to DLL path management
-    run_script_path = os.path.join(PROJECT_ROOT, 'instant-ngp', 'scripts', 'run.py')
+    run_script_path = RUN_SCRIPT_PATH
     snapshot_path = os.path.join(output_dir, 'trained.ingp')
-    train_steps = 2000 # You might want to make this configurable
+    train_steps = TRAIN_STEPS
 
     train_command = [
         VENV_PYTHON_PATH, run_script_path,
@@ -94,9 +289,7 @@ def train_nerf_model(output_dir, task_id):
         '--save_snapshot', snapshot_path
     ]
 
-    PROCESSING_STATUS[task_id]['status'] = 'training_started'
-    PROCESSING_STATUS[task_id]['progress'] = 0
-    output_queue.put({'task_id': task_id, 'line': "NeRF training started", 'progress': 0, 'status': 'training_started'})
+    emit(task_id, "NeRF training started", progress=0, status='training_started')
 
     # Log the command for debugging
     # print(f"[NeRF Training] Scene path: {output_dir}")
@@ -113,158 +306,275 @@ def train_nerf_model(output_dir, task_id):
     #     print(f"[NeRF Training] WARNING: transforms.json NOT FOUND at: {transforms_json_path}")
     print(f"[NeRF Training] Executing command: {' '.join(train_command)}")
 
-    # Prepare environment for subprocess, explicitly including CUDA bin to PATH
-    env = os.environ.copy()
-    cuda_bin_path = os.getenv("CUDA_BIN_PATH")
-    if "PATH" in env:
-        env["PATH"] = f"{cuda_bin_path};{env["PATH"]}"
-    else:
-        env["PATH"] = cuda_bin_path
-
-    train_process = subprocess.Popen(train_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, env=env)
+    train_process = launch(task_id, 'gpu', train_command, inputs=[os.path.join(output_dir, "frames")], outputs=[snapshot_path],
+                           env=subprocess_env())
 
+    progress = 0
     for line in iter(train_process.stdout.readline, ''):
         print(f"[NeRF Training] {line.strip()}") # Added logging for subprocess output
-        PROCESSING_STATUS[task_id]['output'].append(line.strip())
         # Basic progress parsing for training
         if "PROGRESS" in line:
             try:
                 progress_str = line.split('%')[0].strip().split()[-1]
                 progress = int(progress_str)
-                PROCESSING_STATUS[task_id]['progress'] = progress
             except (ValueError, IndexError):
                 pass
-        output_queue.put({'task_id': task_id, 'line': line.strip(), 'progress': PROCESSING_STATUS[task_id]['progress'], 'status': 'training_in_progress'})
+        emit(task_id, line.strip(), progress=progress, status='training_in_progress', coalesce="PROGRESS" in line)
 
     train_process.wait()
     if train_process.returncode != 0:
-        PROCESSING_STATUS[task_id]['status'] = 'training_failed'
-        output_queue.put({'task_id': task_id, 'line': f"NeRF training failed with exit code {train_process.returncode}", 'progress': PROCESSING_STATUS[task_id]['progress'], 'status': 'training_failed'})
-    else:
-        PROCESSING_STATUS[task_id]['status'] = 'training_completed'
-        output_queue.put({'task_id': task_id, 'line': "NeRF training completed successfully", 'progress': 100, 'status': 'training_completed'})
-        PROCESSING_STATUS[task_id]['snapshot_path'] = snapshot_path
-        # After training, proceed to generate camera path
-        generate_camera_path(output_dir, task_id)
-
-def generate_camera_path(output_dir, task_id, num_frames=60, radius=1.5):
-    camera_path = {
-        "camera_path": [],
-        "render_fov": 45,
-        "render_width": 1280,
-        "render_height": 720,
-        "fps": 30,
-        "shutter_speed": 1000,
-        "exposure": 1.0
-    }
-
-    # Generate a circular path around the origin
-    for i in range(num_frames):
-        angle = 2 * math.pi * i / num_frames
-        x = radius * math.sin(angle)
-        y = radius * math.cos(angle)
-        # Add vertical oscillation
-        z = 0.5 + 0.2 * math.sin(4 * math.pi * i / num_frames) # Oscillation in Z-axis
-
-        # Camera position (add slight radius variation)
-        current_radius = radius + 0.1 * math.sin(2 * math.pi * i / num_frames)
-        position = np.array([current_radius * math.sin(angle), current_radius * math.cos(angle), z])
-
-        # Look-at point (origin)
-        look_at = np.array([0.0, 0.0, 0.0])
-
-        # Up vector (standard +Y or +Z depending on coordinate system)
-        up_vector = np.array([0.0, 0.0, 1.0]) # Assuming Z-up
-
-        # Calculate rotation matrix
-        # Z-axis of camera points from position to look_at
-        camera_z = (look_at - position)
-        camera_z = camera_z / np.linalg.norm(camera_z)
-
-        # X-axis of camera is cross product of up and camera_z
-        camera_x = np.cross(up_vector, camera_z)
-        camera_x = camera_x / np.linalg.norm(camera_x)
-
-        # Y-axis of camera is cross product of camera_z and camera_x
-        camera_y = np.cross(camera_z, camera_x)
-        camera_y = camera_y / np.linalg.norm(camera_y)
+        emit(task_id, f"NeRF training failed with exit code {train_process.returncode}", status='training_failed')
+        return False
+    task_store.update(task_id, snapshot_path=snapshot_path)
+    emit(task_id, "NeRF training completed successfully", progress=100, status='training_completed')
+    return True
 
-        # Construct 3x3 rotation matrix (camera-to-world)
-        R = np.vstack([camera_x, camera_y, camera_z]).T
+def generate_camera_path(output_dir, task_id, num_frames=RENDER_SETTINGS['num_frames'], mode='orbit'):
+    # Orbit fitted to the reconstructed cameras ('orbit') or a spline through the
+    # input trajectory ('spline'); see camera_path.py
+    transforms_path = os.path.join(output_dir, "frames", "transforms.json")
+    matrices = build_camera_path(transforms_path, num_frames, mode=mode)
 
-        # Construct 4x4 transformation matrix (camera-to-world)
-        transform_matrix = np.eye(4)
-        transform_matrix[:3, :3] = R
-        transform_matrix[:3, 3] = position
-
-        camera_path["camera_path"].append({
-            "camera_to_world": transform_matrix.tolist()
-        })
-    
     camera_path_file = os.path.join(output_dir, "base_cam.json")
-    with open(camera_path_file, 'w') as f:
-        json.dump(camera_path, f, indent=4)
+    write_camera_path(camera_path_file, matrices, RENDER_SETTINGS['width'], RENDER_SETTINGS['height'], RENDER_SETTINGS['fps'])
     
-    PROCESSING_STATUS[task_id]['camera_path_file'] = camera_path_file
-    PROCESSING_STATUS[task_id]['status'] = 'camera_path_generated'
-    output_queue.put({'task_id': task_id, 'line': "Camera path generated successfully", 'progress': 100, 'status': 'camera_path_generated'})
-
-    # After camera path generation, proceed to video rendering
-    render_nerf_video(PROCESSING_STATUS[task_id]['snapshot_path'], camera_path_file, output_dir, task_id)
-
-def render_nerf_video(snapshot_path, camera_path_file, output_dir, task_id):
-    run_script_path = os.path.join(PROJECT_ROOT, 'instant-ngp', 'scripts', 'run.py')
-    output_video_path = os.path.join(output_dir, 'output_video.mp4')
-    video_fps = 30 # From base_cam.json, but can be configured
-    width = 1280 # From base_cam.json, but can be configured
-    height = 720 # From base_cam.json, but can be configured
+    task_store.update(task_id, camera_path_file=camera_path_file)
+    emit(task_id, "Camera path generated successfully", progress=100, status='camera_path_generated')
+    return True
 
-    render_command = [
-        VENV_PYTHON_PATH, run_script_path,
+def render_command(snapshot_path, camera_path_file, output_video_path, frame_range=None):
+    command = [
+        VENV_PYTHON_PATH, RUN_SCRIPT_PATH,
         snapshot_path,
         '--n_steps', '0', # Explicitly set n_steps to 0 to prevent training during rendering
         '--video_camera_path', camera_path_file,
-        '--video_n_seconds', '5', # Render a 5-second video
-        '--video_fps', str(video_fps),
-        '--width', str(width),
-        '--height', str(height),
+        '--video_n_seconds', str(RENDER_SETTINGS['n_seconds']),
+        '--video_fps', str(RENDER_SETTINGS['fps']),
+        '--width', str(RENDER_SETTINGS['width']),
+        '--height', str(RENDER_SETTINGS['height']),
         '--video_output', output_video_path
     ]
+    if frame_range is not None:
+        # Frames outside the range are skipped, but the path is still timed over the whole video
+        command += ['--video_render_range', str(frame_range[0]), str(frame_range[1])]
+    return command
 
-    PROCESSING_STATUS[task_id]['status'] = 'rendering_started'
-    PROCESSING_STATUS[task_id]['progress'] = 0
-    output_queue.put({'task_id': task_id, 'line': "Video rendering started", 'progress': 0, 'status': 'rendering_started'})
+def parse_progress(line, progress):
+    if "PROGRESS" in line:
+        try:
+            return int(line.split('%')[0].strip().split()[-1])
+        except (ValueError, IndexError):
+            pass
+    return progress
 
-    render_process = subprocess.Popen(render_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+def render_nerf_video(snapshot_path, camera_path_file, output_dir, task_id):
+    output_video_path = os.path.join(output_dir, 'output_video.mp4')
 
+    # One process per device slot the scheduler grants this stage; a single slot
+    # (or RENDER_MODE=single) renders the whole path in one run.py process as before
+    devices = detect_render_devices()
+    workers = 1 if RENDER_MODE == 'single' else job_scheduler.fan_out('gpu', len(devices) * RENDER_PROCESSES_PER_DEVICE)
+    if 'gpu' in REMOTE_POOLS:
+        # Segments are leased one by one, so split across the connected GPU workers instead
+        devices = [None]
+        workers = 1 if RENDER_MODE == 'single' else max(1, lease_queue.live_workers('gpu'))
+    segments = plan_segments(RENDER_SETTINGS['n_seconds'] * RENDER_SETTINGS['fps'], workers)
+
+    emit(task_id, "Video rendering started", progress=0, status='rendering_started')
+    if len(segments) == 1:
+        ok = render_single(snapshot_path, camera_path_file, output_video_path, task_id)
+    else:
+        ok = render_segmented(snapshot_path, camera_path_file, output_dir, output_video_path, task_id, segments, devices)
+    if not ok:
+        return False
+    # Record the video before announcing completion so clients can fetch it right away
+    task_store.update(task_id, output_video_path=output_video_path)
+    emit(task_id, "Video rendering completed successfully", progress=100, status='completed') # Final status for the entire process
+    print(f"Rendered video saved to: {output_video_path}")
+    return True
+
+def render_single(snapshot_path, camera_path_file, output_video_path, task_id):
+    # A stale video must not pass for this run's
+    if os.path.exists(output_video_path):
+        os.remove(output_video_path)
+    # run.py encodes from ./tmp, which must not be shared with other jobs' renders
+    render_process = launch(task_id, 'gpu', render_command(snapshot_path, camera_path_file, output_video_path),
+                            inputs=[snapshot_path, camera_path_file], outputs=[output_video_path], cwd=os.path.dirname(output_video_path),
+                            env=subprocess_env())
+
+    progress = 0
     for line in iter(render_process.stdout.readline, ''):
         print(f"[NeRF Rendering] {line.strip()}") # Added logging for subprocess output
-        PROCESSING_STATUS[task_id]['output'].append(line.strip())
-        if "PROGRESS" in line:
-            try:
-                progress_str = line.split('%')[0].strip().split()[-1]
-                progress = int(progress_str)
-                PROCESSING_STATUS[task_id]['progress'] = progress
-            except (ValueError, IndexError):
-                pass
-        output_queue.put({'task_id': task_id, 'line': line.strip(), 'progress': PROCESSING_STATUS[task_id]['progress'], 'status': 'rendering_in_progress'})
+        progress = parse_progress(line, progress)
+        emit(task_id, line.strip(), progress=progress, status='rendering_in_progress', coalesce="PROGRESS" in line)
 
     render_process.wait()
     if render_process.returncode != 0:
-        PROCESSING_STATUS[task_id]['status'] = 'rendering_failed'
-        output_queue.put({'task_id': task_id, 'line': f"Video rendering failed with exit code {render_process.returncode}", 'progress': PROCESSING_STATUS[task_id]['progress'], 'status': 'rendering_failed'})
-    else:
-        PROCESSING_STATUS[task_id]['status'] = 'completed' # Final status for the entire process
-        output_queue.put({'task_id': task_id, 'line': "Video rendering completed successfully", 'progress': 100, 'status': 'completed'})
-        PROCESSING_STATUS[task_id]['output_video_path'] = output_video_path
-        print(f"Rendered video saved to: {output_video_path}")
+        emit(task_id, f"Video rendering failed with exit code {render_process.returncode}", status='rendering_failed')
+        return False
+    # run.py ignores the exit status of its ffmpeg call
+    if not os.path.exists(output_video_path):
+        emit(task_id, "Video rendering produced no video", status='rendering_failed')
+        return False
+    shutil.rmtree(os.path.join(os.path.dirname(output_video_path), 'tmp'), ignore_errors=True)
+    return True
+
+def render_segmented(snapshot_path, camera_path_file, output_dir, output_video_path, task_id, segments, devices):
+    # Renders every frame range in its own run.py process, retrying a failed range
+    # up to RENDER_SEGMENT_RETRIES times without touching the others, then joins them
+    segments_dir = os.path.join(output_dir, SEGMENTS_DIR)
+    shutil.rmtree(segments_dir, ignore_errors=True)
+    print(f"[NeRF Rendering] Splitting {segments[-1][1] + 1} frames into {len(segments)} segments on devices {devices}")
+    emit(task_id, f"Rendering in {len(segments)} parallel segments", progress=0, status='rendering_in_progress')
+
+    lock = threading.Lock()
+    segment_progress = [0] * len(segments)
+    failed = []
+
+    def render_segment(index):
+        start, end = segments[index]
+        device = devices[index % len(devices)]
+        path = segment_path(output_dir, index)
+        pattern = frame_pattern(output_dir, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        env = subprocess_env()
+        if device is not None:
+            env['CUDA_VISIBLE_DEVICES'] = device
+        for attempt in range(RENDER_SEGMENT_RETRIES + 1):
+            if job_scheduler.is_cancelled(task_id):
+                break
+            if attempt:
+                emit(task_id, f"[segment {index}] Retrying frames {start}-{end} (attempt {attempt + 1})")
+            # run.py saves the frames of the range to the pattern; they are encoded below
+            process = launch(task_id, 'gpu', render_command(snapshot_path, camera_path_file, pattern, (start, end)),
+                             inputs=[snapshot_path, camera_path_file], outputs=[os.path.dirname(path)], cwd=os.path.dirname(path), env=env)
+            progress = 0
+            for line in iter(process.stdout.readline, ''):
+                print(f"[NeRF Rendering {index}] {line.strip()}")
+                progress = parse_progress(line, progress)
+                with lock:
+                    segment_progress[index] = progress
+                    overall = aggregate_progress(segment_progress, segments)
+                emit(task_id, f"[segment {index}] {line.strip()}", progress=overall, status='rendering_in_progress', coalesce="PROGRESS" in line)
+            process.wait()
+            missing = missing_frames(pattern, start, end) if process.returncode == 0 else None
+            if missing:
+                emit(task_id, f"[segment {index}] Rendering frames {start}-{end} left {len(missing)} frames missing, from {missing[0]}")
+                continue
+            if process.returncode == 0:
+                result = encode_frames(pattern, start, end, RENDER_SETTINGS['fps'], path)
+                if result.returncode == 0:
+                    with lock:
+                        segment_progress[index] = 100
+                    return
+                emit(task_id, f"[segment {index}] Encoding frames {start}-{end} failed: {result.stderr.strip()}")
+                continue
+            emit(task_id, f"[segment {index}] Rendering frames {start}-{end} failed with exit code {process.returncode}")
+        with lock:
+            failed.append(index)
+
+    threads = [threading.Thread(target=render_segment, args=(i,), daemon=True) for i in range(len(segments))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if failed:
+        emit(task_id, f"Video rendering failed for segments {sorted(failed)}", status='rendering_failed')
+        return False
+    result = concat_segments([segment_path(output_dir, i) for i in range(len(segments))], output_video_path)
+    if result.returncode != 0:
+        emit(task_id, f"Joining rendered segments failed: {result.stderr.strip()}", status='rendering_failed')
+        return False
+    shutil.rmtree(segments_dir, ignore_errors=True)
+    return True
+
+def run_checkpointed(output_dir, task_id, stage, forced, skip_fields, skip_status):
+    # Runs one of the stages after video2nerf unless its manifest (see
+    # pipeline_stages.py) shows the previous result in output_dir is still valid
+    if not forced:
+        reason = check_stage(output_dir, stage)
+        if reason is None:
+            task_store.update(task_id, **skip_fields)
+            emit(task_id, f"Skipping {stage.name}: previous result is up to date", progress=100, status=skip_status)
+            return SKIPPED
+    clear_manifest(output_dir, stage.name)
+    started = time.time()
+    # These stage functions return False on failure rather than raising (see PipelineStage)
+    if not stage.fn():
+        return False
+    record_stage(output_dir, stage, time.time() - started)
+    return True
+
+def build_pipeline_stages(video_path, output_dir, options, task_id, original_filename):
+    start, end = stage_range(PIPELINE_STAGES, options.get('from_stage'), options.get('to_stage'))
+    forced = options.get('from_stage') is not None
+    frames_pattern = frame_glob(os.path.join(output_dir, 'frames'), options.get('frame_format', 'jpg'))
+    transforms_path = os.path.join(output_dir, 'frames', 'transforms.json')
+    snapshot_path = os.path.join(output_dir, 'trained.ingp')
+    camera_path_file = os.path.join(output_dir, 'base_cam.json')
+    output_video_path = os.path.join(output_dir, 'output_video.mp4')
+
+    checkpointed = {
+        'train': (
+            PipelineStage('train', [frames_pattern, transforms_path], [snapshot_path], {'train_steps': TRAIN_STEPS},
+                          lambda: train_nerf_model(output_dir, task_id)),
+            {'snapshot_path': snapshot_path}, 'training_completed'),
+        'camera_path': (
+            PipelineStage('camera_path', [transforms_path], [camera_path_file], {'mode': options['camera_path'], 'render': RENDER_SETTINGS},
+                          lambda: generate_camera_path(output_dir, task_id, mode=options['camera_path'])),
+            {'camera_path_file': camera_path_file}, 'camera_path_generated'),
+        'render': (
+            PipelineStage('render', [snapshot_path, camera_path_file], [output_video_path], {'render': RENDER_SETTINGS},
+                          lambda: render_nerf_video(snapshot_path, camera_path_file, output_dir, task_id)),
+            {'output_video_path': output_video_path}, 'completed'),
+    }
+
+    stages = []
+    if start < len(VIDEO2NERF_STAGES):
+        stages.append(Stage('video2nerf', 'cpu', lambda job: run_script_in_background(video_path, output_dir, options, task_id, original_filename)))
+    for name, (stage, skip_fields, skip_status) in checkpointed.items():
+        if start <= PIPELINE_STAGES.index(name) <= end:
+            stages.append(Stage(name, 'gpu', lambda job, stage=stage, skip_fields=skip_fields, skip_status=skip_status:
+                                run_checkpointed(output_dir, task_id, stage, forced, skip_fields, skip_status)))
+    return stages
+
+def on_pipeline_done(job, output_dir, cache_key, original_filename, to_stage=None):
+    task = task_store.get(job.job_id)
+    task_store.update(job.job_id,
+                      stage_timings={name: round(seconds, 2) for name, seconds in job.stage_timings.items()},
+                      stage_resources=metrics.pop_job_usage(job.job_id))
+    if job.state == 'cancelled':
+        emit(job.job_id, "Processing cancelled", status='cancelled')
+    elif job.state == 'failed' and task['status'] not in TERMINAL_STATUSES:
+        emit(job.job_id, "Processing failed", status='failed')
+    elif job.state == 'completed' and task['status'] not in TERMINAL_STATUSES:
+        emit(job.job_id, f"Stopped after stage {to_stage}", progress=100, status='stopped')
+    if cache_key is not None:
+        succeeded = job.state == 'completed' and task['status'] == 'completed'
+        result_cache.finish(cache_key, output_dir if succeeded else None, {'video_original_name': original_filename})
+
+def register_cached_result(task_id, output_dir, original_filename):
+    task_store.create(
+        task_id, 'completed',
+        progress=100,
+        video_original_name=original_filename,
+        transforms_path=os.path.join(output_dir, 'frames', 'transforms.json'),
+        snapshot_path=os.path.join(output_dir, 'trained.ingp'),
+        camera_path_file=os.path.join(output_dir, 'base_cam.json'),
+        output_video_path=os.path.join(output_dir, 'output_video.mp4'),
+        cache_hit=True,
+    )
+    emit(task_id, "Reusing cached result for identical video and settings")
+    print(f"[Result Cache] Task {task_id} served from cache: {output_dir}")
 
 @app.route('/video_result/<task_id>')
 def serve_rendered_video(task_id):
-    if task_id not in PROCESSING_STATUS or 'output_video_path' not in PROCESSING_STATUS[task_id]:
+    task_info = task_store.get(task_id)
+    if task_info is None or 'output_video_path' not in task_info:
         return "Video not found or still processing", 404
     
-    video_path = PROCESSING_STATUS[task_id]['output_video_path']
+    video_path = task_info['output_video_path']
     video_dir = os.path.dirname(video_path)
     video_filename = os.path.basename(video_path)
 
@@ -282,119 +592,785 @@ def serve_index():
 def serve_static(path):
     return send_from_directory(app.static_folder, path)
 
+def upload_response(info):
+    # process_video takes the stored (content-addressed) name as `filename`
+    if info.get('complete'):
+        return jsonify({
+            'message': 'Video uploaded successfully',
+            'upload_id': info['upload_id'],
+            'filename': info['stored_name'],
+            'original_filename': info['filename'],
+            'content_hash': info['content_hash'],
+            'metadata': info['metadata'],
+            'offset': info['size'],
+            'size': info['size'],
+            'complete': True,
+        }), 200
+    return jsonify(info), 200
+
+def upload_error(e):
+    body = {'error': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
 @app.route('/upload_video', methods=['POST'])
 def upload_video():
+    # Single-request upload, kept for simple clients; streams through the same path as /uploads
     if 'video' not in request.files:
         return jsonify({'error': 'No video file part'}), 400
     file = request.files['video']
     if file.filename == '':
         return jsonify({'error': 'No selected video file'}), 400
-    if file:
-        filename = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(filename)
-        return jsonify({'message': 'Video uploaded successfully', 'filename': filename}), 200
+    file.stream.seek(0, os.SEEK_END)
+    size = file.stream.tell()
+    file.stream.seek(0)
+    try:
+        upload = upload_manager.create(file.filename, size)
+        return upload_response(upload_manager.append(upload['upload_id'], 0, file.stream))
+    except UploadError as e:
+        return upload_error(e)
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json() or {}
+    try:
+        return jsonify(upload_manager.create(data.get('filename'), data.get('size'))), 201
+    except (UploadError, ValueError, TypeError) as e:
+        return upload_error(e if isinstance(e, UploadError) else UploadError(str(e)))
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    try:
+        return jsonify(upload_manager.status(upload_id))
+    except UploadError as e:
+        return upload_error(e)
+
+@app.route('/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+def upload_chunk(upload_id):
+    # Raw chunk body; Upload-Offset says where it starts (must be the current offset)
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header required'}), 400
+    try:
+        return upload_response(upload_manager.append(upload_id, offset, request.stream, request.content_length))
+    except UploadError as e:
+        return upload_error(e)
+
+def parse_fit_minutes(data):
+    # Time budget in seconds from the request's fit_minutes, or None when absent
+    minutes = data.get('fit_minutes')
+    if minutes in (None, ''):
+        return None
+    try:
+        minutes = float(minutes)
+    except (TypeError, ValueError):
+        raise ValueError('fit_minutes must be a number')
+    if minutes <= 0:
+        raise ValueError('fit_minutes must be positive')
+    return minutes * 60
+
+def plan_for(video_metadata, quality, frame_selection, fit_seconds=None):
+    # Extraction plan for a quality preset, shrunk to fit fit_seconds if given; returns (plan, fits)
+    preset = QUALITY_PRESETS.get(quality, QUALITY_PRESETS['normal'])
+    if fit_seconds is None:
+        return plan_extraction(video_metadata, preset['fps'], preset['target_frames'], preset['max_pixels'], frame_selection), True
+    return fit_plan(runtime_model, video_metadata, preset['fps'], preset['target_frames'], preset['max_pixels'], frame_selection, fit_seconds)
+
+@app.route('/estimate_time', methods=['POST'])
+def estimate_time():
+    # Predicted runtime per stage for processing an uploaded video, and the plan it assumes
+    data = request.get_json() or {}
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({'error': 'Missing filename'}), 400
+    frame_selection = data.get('frame_selection', 'keyframes')
+    if frame_selection not in ('fps', 'keyframes'):
+        return jsonify({'error': 'frame_selection must be "fps" or "keyframes"'}), 400
+    try:
+        fit_seconds = parse_fit_minutes(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    video_path = os.path.join(UPLOAD_FOLDER, os.path.basename(filename))
+    if not os.path.exists(video_path):
+        return jsonify({'error': 'Uploaded video not found'}), 404
+
+    upload_info = upload_manager.info(video_path)
+    video_metadata = upload_info['metadata'] if upload_info else probe_video(video_path)
+    plan, fits = plan_for(video_metadata, data.get('quality'), frame_selection, fit_seconds)
+    stages = runtime_model.predict(plan)
+    total = sum(stages.values())
+    response = {
+        'estimated_seconds': round(total),
+        'estimated_minutes': round(total / 60, 1),
+        'stages': stages,
+        'plan': plan,
+        'history_samples': runtime_model.sample_counts(),
+    }
+    if fit_seconds is not None:
+        response['fits'] = fits
+    return jsonify(response)
 
 @app.route('/process_video', methods=['POST'])
 def process_video():
-    data = request.get_json()
+    body, status = queue_video(request.get_json() or {})
+    return jsonify(body), status
+
+def queue_video(data, group_id=None):
+    # Validates and queues one processing request; returns (response body, HTTP status).
+    # With group_id the task joins that batch group (see /batch).
+
+    # Optional stage window: rerun from `from_stage` (even if still valid), stop after `to_stage`
+    from_stage = data.get('from_stage')
+    to_stage = data.get('to_stage')
+    try:
+        stage_range(PIPELINE_STAGES, from_stage, to_stage)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    if data.get('resume_task_id'):
+        return resume_video_processing(data['resume_task_id'], from_stage, to_stage, int(data.get('priority', 0)), group_id)
+
     filename = data.get('filename')
     quality = data.get('quality')
 
     if not filename or not quality:
-        return jsonify({'error': 'Missing filename or quality'}), 400
+        return {'error': 'Missing filename or quality'}, 400
 
     video_path = os.path.join(UPLOAD_FOLDER, os.path.basename(filename)) # Ensure filename is just the name, not full path
-    
-    # Map quality to FPS
-    fps_map = {
-        'low': 2,
-        'normal': 4,
-        'high': 6
+
+    # Keyframe mode scores candidates sampled at a multiple of the planned fps and
+    # keeps the sharpest, well-spaced target_frames of them
+    frame_selection = data.get('frame_selection', 'keyframes')
+    if frame_selection not in ('fps', 'keyframes'):
+        return {'error': 'frame_selection must be "fps" or "keyframes"'}, 400
+    try:
+        fit_seconds = parse_fit_minutes(data)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    # JPEG by default; PNG is lossless, 'raw' (BMP) costs nothing to decode but is ~10x larger
+    frame_format = data.get('frame_format', 'jpg')
+    if frame_format not in FRAME_FORMATS:
+        return {'error': f"frame_format must be one of {', '.join(sorted(FRAME_FORMATS))}"}, 400
+
+    # Sequential matching suits ordered video frames; 'automatic' is the one-shot fallback
+    sfm = data.get('sfm', 'sequential')
+    if sfm not in ('sequential', 'automatic'):
+        return {'error': 'sfm must be "sequential" or "automatic"'}, 400
+
+    camera_path_mode = data.get('camera_path', 'orbit')
+    if camera_path_mode not in ('orbit', 'spline'):
+        return {'error': 'camera_path must be "orbit" or "spline"'}, 400
+
+    # Training view budget after pose-based pruning; 0 keeps every non-redundant view
+    try:
+        prune_max_views = int(data.get('max_views', PRUNE_MAX_VIEWS))
+    except (TypeError, ValueError):
+        return {'error': 'max_views must be an integer'}, 400
+    if prune_max_views < 0:
+        return {'error': 'max_views must not be negative'}, 400
+
+    if not os.path.exists(video_path):
+        return {'error': 'Uploaded video not found'}, 404
+
+    # Uploads made through upload_manager carry their original name, hash and probe metadata
+    upload_info = upload_manager.info(video_path)
+    video_metadata = upload_info['metadata'] if upload_info else probe_video(video_path)
+    plan, fits = plan_for(video_metadata, quality, frame_selection, fit_seconds)
+
+    options = {
+        'fps': plan['fps'],
+        'frame_width': plan['frame_width'],
+        'frame_format': frame_format,
+        'colmap_quality': COLMAP_QUALITY,
+        'frame_selection': frame_selection,
+        'target_frames': plan['target_frames'],
+        'sfm': sfm,
+        'converter': 'native',
+        'camera_path': camera_path_mode,
+        'prune_max_views': prune_max_views,
+        'prune_min_distance': PRUNE_MIN_VIEW_DISTANCE,
     }
-    fps = fps_map.get(quality, 4) # Default to normal if not found
 
-    # Create a unique output directory for each processing task
     task_id = str(uuid.uuid4())
+    original_filename = data.get('original_filename') or (upload_info['filename'] if upload_info else os.path.basename(filename))
+
+    # Identical content + identical pipeline parameters means an identical result
+    cache_params = {
+        'options': options,
+        'train_steps': TRAIN_STEPS,
+        'render': RENDER_SETTINGS,
+    }
+    content_hash = upload_info['content_hash'] if upload_info else hash_file(video_path)
+    cache_key = make_cache_key(content_hash, cache_params)
+
+    # A partial run never produces a complete result, so it neither reads nor fills the cache
+    partial = to_stage not in (None, 'render')
+    cached = None if partial else result_cache.lookup(cache_key)
+    if cached is not None:
+        register_cached_result(task_id, cached['output_dir'], original_filename)
+        if group_id is not None:
+            job_groups.add_member(group_id, task_id, original_filename)
+        return {'message': 'Video already processed, returning cached result', 'task_id': task_id, 'cached': True}, 200
+
+    leader_task_id = None if partial else result_cache.begin(cache_key, task_id)
+    if leader_task_id is not None:
+        # Same video and settings already running: follow that run instead of starting another
+        if group_id is not None:
+            job_groups.add_member(group_id, leader_task_id, original_filename)
+        return {'message': 'Identical video is already processing', 'task_id': leader_task_id, 'deduplicated': True}, 200
+
+    # Create a unique output directory for each processing task
     output_base_name = os.path.splitext(os.path.basename(video_path))[0]
     specific_output_dir = os.path.join(dataset_base_dir, output_base_name + '_' + task_id)
     os.makedirs(specific_output_dir, exist_ok=True)
 
-    threading.Thread(target=run_script_in_background, args=(video_path, specific_output_dir, fps, task_id, os.path.basename(filename))).start()
-    
-    return jsonify({'message': 'Video processing started', 'task_id': task_id}), 200
+    # The plan goes with the task so its stage timings can train the runtime model
+    record = {'video_metadata': video_metadata, 'plan': plan, 'estimated_seconds': round(sum(runtime_model.predict(plan).values()))}
+    if fit_seconds is not None:
+        record['fit_seconds'] = fit_seconds
+        record['plan_fits'] = fits
+    return submit_pipeline(task_id, video_path, specific_output_dir, options, original_filename,
+                           None if partial else cache_key, cache_key, from_stage, to_stage, int(data.get('priority', 0)),
+                           record, group_id)
+
+def submit_pipeline(task_id, video_path, output_dir, options, original_filename, leader_cache_key, cache_key, from_stage, to_stage, priority,
+                    record=None, group_id=None):
+    # leader_cache_key is set when this task leads the result cache entry and must finish it
+    # The output directory, options and cache key are kept so the run can be resumed later;
+    # `record` holds further fields for the task record (probe metadata, plan)
+    task_store.create(task_id, 'queued', progress=0, video_original_name=original_filename, owner=process_owner(),
+                      video_path=video_path, output_dir=output_dir, options=options, cache_key=cache_key, group_id=group_id,
+                      **(record or {}))
+    stage_options = dict(options, from_stage=from_stage, to_stage=to_stage)
+    if group_id is not None:
+        job_groups.add_member(group_id, task_id, original_filename)
+
+    try:
+        admission = job_scheduler.submit(
+            task_id,
+            build_pipeline_stages(video_path, output_dir, stage_options, task_id, original_filename),
+            priority=priority,
+            on_done=lambda job: on_pipeline_done(job, output_dir, leader_cache_key, original_filename, to_stage),
+            group=group_id,
+        )
+    except QueueFullError as e:
+        if group_id is not None:
+            job_groups.remove_member(group_id, task_id)
+        task_store.delete(task_id)
+        if leader_cache_key is not None:
+            result_cache.finish(leader_cache_key)
+        return {'error': str(e)}, 503
+
+    return {'message': 'Video processing queued', 'task_id': task_id, **admission}, 200
+
+def resume_video_processing(resume_task_id, from_stage, to_stage, priority, group_id=None):
+    # Rerun a finished or failed task in its own output directory with its original
+    # settings; stages whose checkpoints are still valid are skipped
+    previous = task_store.get(resume_task_id)
+    if previous is None:
+        return {'error': 'Task to resume not found'}, 404
+    if 'output_dir' not in previous or not os.path.isdir(previous['output_dir']):
+        return {'error': 'Task to resume has no output directory'}, 400
+    resumed_by = task_store.get(previous.get('resumed_by')) if previous.get('resumed_by') else None
+    if previous['status'] not in TERMINAL_STATUSES or (resumed_by is not None and resumed_by['status'] not in TERMINAL_STATUSES):
+        return {'error': 'Task to resume is still running'}, 409
+    if from_stage in (None, *VIDEO2NERF_STAGES) and not os.path.exists(previous['video_path']):
+        return {'error': 'Uploaded video not found'}, 404
+
+    task_id = str(uuid.uuid4())
+    cache_key = previous.get('cache_key')
+    leader_cache_key = None
+    if cache_key is not None and to_stage in (None, 'render') and result_cache.begin(cache_key, task_id) is None:
+        leader_cache_key = cache_key
+    task_store.update(resume_task_id, resumed_by=task_id)
+    return submit_pipeline(task_id, previous['video_path'], previous['output_dir'], previous['options'], previous['video_original_name'],
+                           leader_cache_key, cache_key, from_stage, to_stage, priority, {'video_metadata': previous.get('video_metadata')},
+                           group_id)
+
+@app.route('/cancel/<task_id>', methods=['POST'])
+def cancel_task(task_id):
+    if not task_store.exists(task_id):
+        return jsonify({'error': 'Task not found.'}), 404
+    if not job_scheduler.cancel(task_id):
+        return jsonify({'error': 'Task is not queued or running.'}), 409
+    return jsonify({'message': 'Task cancelled', 'task_id': task_id}), 200
+
+@app.route('/queue')
+def queue_status():
+    return jsonify(job_scheduler.snapshot())
+
+@app.route('/queue/<task_id>')
+def queue_position(task_id):
+    admission = job_scheduler.position(task_id)
+    if admission is None:
+        return jsonify({'error': 'Task is not queued or running.'}), 404
+    return jsonify(admission)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(job_scheduler.snapshot()), mimetype='text/plain; version=0.0.4')
+
+@app.route('/timings/<task_id>')
+def task_timings(task_id):
+    # Where a task's time went: scheduler stages, the steps inside video2nerf.py,
+    # and CPU / peak memory of each stage's subprocesses
+    task_info = task_store.get(task_id)
+    if task_info is None:
+        return jsonify({'error': 'Task not found.'}), 404
+    return jsonify({
+        'task_id': task_id,
+        'status': task_info['status'],
+        'stage_timings': task_info.get('stage_timings', {}),
+        'step_timings': task_info.get('step_timings', {}),
+        'stage_resources': task_info.get('stage_resources', {}),
+        # Training views kept after pruning, which training time scales with
+        'view_pruning': task_info.get('view_pruning'),
+        # Extraction plan and the runtime predicted for it at submission
+        'plan': task_info.get('plan'),
+        'estimated_seconds': task_info.get('estimated_seconds'),
+    })
 
 @app.route('/progress/<task_id>')
 def get_progress(task_id):
-    def generate_progress():
-        last_progress_line_idx = 0
-        while True:
-            if task_id in PROCESSING_STATUS:
-                current_status = PROCESSING_STATUS[task_id]
-                new_output_lines = current_status['output'][last_progress_line_idx:]
-                for line in new_output_lines:
-                    yield f"data: {json.dumps({'line': line, 'progress': current_status['progress'], 'status': current_status['status']})}\n\n"
-                last_progress_line_idx = len(current_status['output'])
-
-                if current_status['status'] in ['completed', 'failed']:
-                    yield f"data: {json.dumps({'line': 'Processing finished.', 'progress': current_status['progress'], 'status': current_status['status']})}\n\n"
-                    break
-            time.sleep(1) # Poll every second
-    return Response(generate_progress(), mimetype='text/event-stream')
+    task_info = task_store.get(task_id)
+    if task_info is None:
+        return jsonify({'error': 'Task not found.'}), 404
+
+    # EventSource sends Last-Event-ID when it reconnects; resume right after it
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', '-1'))
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = -1
+
+    is_local = task_info.get('owner') == process_owner()
+    stream = sse_stream(task_store, event_bus, task_id, last_event_id, TERMINAL_STATUSES, is_local)
+    return Response(stream, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def generate_raw_mesh(job, snapshot_path, raw_key, mesh_key, resolution, density_thresh):
+    # Marching cubes on the GPU; skipped when the raw mesh is already cached
+    if mesh_cache.lookup(raw_key, 'ply') is not None:
+        return SKIPPED
+    mesh_cache.mark_running(mesh_key)
+    raw_path = mesh_cache.mesh_path(raw_key, 'ply')
+    # Write next to the final path and rename, so a half-written mesh is never used;
+    # named after the export so two exports needing the same raw mesh never share it
+    partial_path = os.path.join(mesh_cache.cache_dir, f"{raw_key}.{mesh_key[:16]}.partial.ply")
+    run_script_path = RUN_SCRIPT_PATH
+
+    mesh_command = [
+        VENV_PYTHON_PATH, run_script_path,
+        '--load_snapshot', snapshot_path,
+        '--save_mesh', partial_path,
+        '--marching_cubes_res', str(resolution),
+        '--marching_cubes_density_thresh', str(density_thresh)
+    ]
+    print(f"[Mesh Export] Executing command: {' '.join(mesh_command)}")
+
+    mesh_process = launch(job.job_id, 'gpu', mesh_command, inputs=[snapshot_path], outputs=[partial_path], env=subprocess_env())
+    output, _ = mesh_process.communicate()
+
+    if mesh_process.returncode != 0 or not os.path.exists(partial_path):
+        print(f"[Mesh Export] Error running marching cubes: {output}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        mesh_cache.finish(mesh_key, error=f"Failed to generate mesh: {output[-2000:]}")
+        return False
+    os.replace(partial_path, raw_path)
+    mesh_cache.finish(raw_key, raw_path)
+    print(f"[Mesh Export] Generated raw mesh: {raw_path}")
+    return True
+
+def generate_mesh_lod(job, raw_key, mesh_key, format, lod):
+    # Weld, decimate, quantize and write the requested format on the CPU
+    mesh_cache.mark_running(mesh_key)
+    raw_path = mesh_cache.lookup(raw_key, 'ply')
+    if raw_path is None:
+        mesh_cache.finish(mesh_key, error='Raw mesh was evicted before it could be processed')
+        return False
+    mesh_path = mesh_cache.mesh_path(mesh_key, format)
+    partial_path = os.path.join(mesh_cache.cache_dir, f"{mesh_key}.partial.{format}")
+    try:
+        stats = build_lod(raw_path, partial_path, format, LOD_TRIANGLES[lod])
+    except (ValueError, KeyError, OSError) as e:
+        print(f"[Mesh Export] Error building {format} mesh (lod {lod}): {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        mesh_cache.finish(mesh_key, error=f"Failed to build {format} mesh: {e}")
+        return False
+    os.replace(partial_path, mesh_path)
+    mesh_cache.finish(mesh_key, mesh_path)
+    print(f"[Mesh Export] Successfully generated {format} mesh (lod {lod}): {mesh_path} {stats}")
+    return True
+
+def on_mesh_done(job, mesh_key, format):
+    metrics.pop_job_usage(job.job_id)
+    if job.state == 'cancelled':
+        mesh_cache.finish(mesh_key, error='Mesh export cancelled')
+    elif job.state == 'failed' and mesh_cache.status(mesh_key, format)['state'] != 'failed':
+        # The stage raised before it could record why
+        mesh_cache.finish(mesh_key, error='Mesh export failed')
+
+def submit_mesh_export(snapshot_path, mesh_key, format, resolution, density_thresh, lod, on_done=None, group=None):
+    # Queues marching cubes (skipped when the raw mesh is cached) and the LOD build for
+    # a mesh_key the caller has begun in mesh_cache; raises QueueFullError
+    raw_key = make_mesh_key(snapshot_path, 'raw', resolution, density_thresh)
+
+    def finished(job):
+        on_mesh_done(job, mesh_key, format)
+        if on_done is not None:
+            on_done(job)
+
+    job_scheduler.submit(
+        'mesh-' + mesh_key,
+        [Stage('mesh_export', 'gpu', lambda job: generate_raw_mesh(job, snapshot_path, raw_key, mesh_key, resolution, density_thresh)),
+         Stage('mesh_lod', 'cpu', lambda job: generate_mesh_lod(job, raw_key, mesh_key, format, lod))],
+        on_done=finished,
+        group=group,
+    )
 
 @app.route('/export_model/<task_id>/<format>')
 def export_model(task_id, format):
-    if task_id not in PROCESSING_STATUS:
+    task_info = task_store.get(task_id)
+    if task_info is None:
         return jsonify({'error': 'Task not found.'}), 404
 
-    task_info = PROCESSING_STATUS[task_id]
-    output_dir = os.path.dirname(task_info['snapshot_path'])
     original_filename_stem = os.path.splitext(task_info['video_original_name'])[0]
+    snapshot_path = task_info.get('snapshot_path')
 
     if format == 'ingp':
-        ingp_path = task_info.get('snapshot_path')
-        if not ingp_path or not os.path.exists(ingp_path):
+        if not snapshot_path or not os.path.exists(snapshot_path):
             return jsonify({'error': 'INGP snapshot not found.'}), 404
-        return send_from_directory(os.path.dirname(ingp_path), os.path.basename(ingp_path), as_attachment=True, download_name=f"{original_filename_stem}.ingp")
-    elif format in ['obj', 'ply']:
-        snapshot_path = task_info.get('snapshot_path')
+        return send_from_directory(os.path.dirname(snapshot_path), os.path.basename(snapshot_path), as_attachment=True, download_name=f"{original_filename_stem}.ingp")
+    elif format in MESH_FORMATS:
         if not snapshot_path or not os.path.exists(snapshot_path):
             return jsonify({'error': 'NeRF snapshot not found for mesh export.'}), 404
+        try:
+            resolution = int(request.args.get('resolution', MESH_DEFAULT_RESOLUTION))
+            density_thresh = float(request.args.get('density_thresh', MESH_DEFAULT_DENSITY_THRESH))
+            # 0 is full resolution; higher levels have fewer triangles (LOD_TRIANGLES)
+            lod = int(request.args.get('lod', 0))
+        except ValueError:
+            return jsonify({'error': 'resolution and lod must be integers and density_thresh a number'}), 400
+        if not 16 <= resolution <= 2048:
+            return jsonify({'error': 'resolution must be between 16 and 2048'}), 400
+        if not 0 <= lod < len(LOD_TRIANGLES):
+            return jsonify({'error': f'lod must be between 0 and {len(LOD_TRIANGLES) - 1}'}), 400
 
-        temp_mesh_filename = f"{original_filename_stem}.{format}"
-        temp_mesh_path = os.path.join(output_dir, temp_mesh_filename)
-
-        run_script_path = os.path.join(PROJECT_ROOT, 'instant-ngp', 'scripts', 'run.py')
-        
-        # Prepare environment for subprocess, explicitly including CUDA bin to PATH
-        env = os.environ.copy()
-        cuda_bin_path = os.getenv("CUDA_BIN_PATH")
-        if "PATH" in env:
-            env["PATH"] = f"{cuda_bin_path};{env["PATH"]}"
-        else:
-            env["PATH"] = cuda_bin_path
-
-        mesh_command = [
-            VENV_PYTHON_PATH, run_script_path,
-            '--load_snapshot', snapshot_path,
-            '--save_mesh', temp_mesh_path,
-            '--marching_cubes_res', '512', # Higher resolution for better mesh quality
-            '--marching_cubes_density_thresh', '2.5' # Default density threshold
-        ]
+        mesh_key = make_mesh_key(snapshot_path, format, resolution, density_thresh, lod)
+        mesh_path = mesh_cache.lookup(mesh_key, format)
+        if mesh_path is not None:
+            download_name = f"{original_filename_stem}_lod{lod}.{format}" if lod else f"{original_filename_stem}.{format}"
+            return send_from_directory(os.path.dirname(mesh_path), os.path.basename(mesh_path), as_attachment=True, download_name=download_name)
 
-        try:
-            subprocess.run(mesh_command, check=True, capture_output=True, text=True, env=env)
-            print(f"[Mesh Export] Successfully generated {format} mesh: {temp_mesh_path}")
-            return send_from_directory(output_dir, temp_mesh_filename, as_attachment=True, download_name=temp_mesh_filename)
-        except subprocess.CalledProcessError as e:
-            print(f"[Mesh Export] Error generating {format} mesh: {e.stderr}")
-            return jsonify({'error': f'Failed to generate {format} mesh: {e.stderr}'}), 500
-        finally:
-            # Clean up the temporary mesh file
-            if os.path.exists(temp_mesh_path):
-                os.remove(temp_mesh_path)
-                print(f"[Mesh Export] Cleaned up temporary mesh file: {temp_mesh_path}")
+        # Not generated yet: start (or join) a background export and hand back a handle to poll
+        export_id = f"{format}-{mesh_key}"
+        if mesh_cache.begin(mesh_key):
+            try:
+                submit_mesh_export(snapshot_path, mesh_key, format, resolution, density_thresh, lod)
+            except QueueFullError as e:
+                mesh_cache.abandon(mesh_key)
+                return jsonify({'error': str(e)}), 503
+        return jsonify({
+            'message': f'{format.upper()} export started',
+            'export_id': export_id,
+            'status_url': f'/export_status/{export_id}',
+            'download_url': request.full_path.rstrip('?'),
+        }), 202
     else:
         return jsonify({'error': 'Unsupported export format.'}), 400
 
+@app.route('/export_status/<export_id>')
+def export_status(export_id):
+    format, _, mesh_key = export_id.partition('-')
+    if format not in MESH_FORMATS or not mesh_key:
+        return jsonify({'error': 'Unknown export.'}), 404
+    status = mesh_cache.status(mesh_key, format)
+    if status['state'] == 'queued':
+        status.update(job_scheduler.position('mesh-' + mesh_key) or {})
+    return jsonify({'export_id': export_id, **status})
+
+def parse_mesh_specs(specs):
+    # [{'format': 'glb', 'lod': 2}, ...] -> [('glb', 2), ...]; raises ValueError
+    parsed = []
+    for spec in specs or []:
+        format = spec.get('format') if isinstance(spec, dict) else None
+        if format not in MESH_FORMATS:
+            raise ValueError(f"mesh format must be one of {', '.join(MESH_FORMATS)}")
+        try:
+            lod = int(spec.get('lod', 0))
+        except (TypeError, ValueError):
+            raise ValueError('mesh lod must be an integer')
+        if not 0 <= lod < len(LOD_TRIANGLES):
+            raise ValueError(f'mesh lod must be between 0 and {len(LOD_TRIANGLES) - 1}')
+        parsed.append((format, lod))
+    return parsed
+
+def export_group_meshes(group_id, task_id, status):
+    # Once a member finishes, export the meshes its batch asked for; the group stays
+    # open until the exports it started are done
+    group = task_store.get(group_id)
+    task_info = task_store.get(task_id)
+    if status != 'completed' or not group or not group.get('meshes') or not task_info:
+        return
+    snapshot_path = task_info.get('snapshot_path')
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return
+    for format, lod in group['meshes']:
+        mesh_key = make_mesh_key(snapshot_path, format, MESH_DEFAULT_RESOLUTION, MESH_DEFAULT_DENSITY_THRESH, lod)
+        if mesh_cache.lookup(mesh_key, format) is not None or not mesh_cache.begin(mesh_key):
+            continue
+        name = task_info['video_original_name']
+        job_groups.hold(group_id, mesh_key)
+        try:
+            submit_mesh_export(snapshot_path, mesh_key, format, MESH_DEFAULT_RESOLUTION, MESH_DEFAULT_DENSITY_THRESH, lod,
+                               on_done=lambda job, mesh_key=mesh_key, format=format, lod=lod, name=name: job_groups.release(
+                                   group_id, mesh_key, f"[{name}] {format} mesh (lod {lod}) {'ready' if job.state == 'completed' else job.state}"),
+                               group=group_id)
+        except QueueFullError as e:
+            mesh_cache.abandon(mesh_key)
+            job_groups.release(group_id, mesh_key, f"[{name}] {format} mesh (lod {lod}) not queued: {e}")
+
+def batch_items():
+    # (items, shared fields) from a JSON manifest, or from a multipart upload of
+    # several `videos` files with the shared fields as a JSON `manifest` form field
+    if request.files:
+        try:
+            manifest = json.loads(request.form.get('manifest') or '{}')
+        except ValueError:
+            raise UploadError('manifest must be JSON')
+        items = []
+        for file in request.files.getlist('videos'):
+            file.stream.seek(0, os.SEEK_END)
+            size = file.stream.tell()
+            file.stream.seek(0)
+            upload = upload_manager.create(file.filename, size)
+            info = upload_manager.append(upload['upload_id'], 0, file.stream)
+            items.append({'filename': info['stored_name'], 'original_filename': info['filename']})
+        if not isinstance(manifest, dict):
+            raise UploadError('manifest must be a JSON object')
+        return items, manifest
+    manifest = request.get_json(silent=True) or {}
+    if not isinstance(manifest, dict):
+        raise UploadError('manifest must be a JSON object')
+    return manifest.get('videos'), manifest
+
+@app.route('/batch', methods=['POST'])
+def submit_batch():
+    # Queues many videos as one group: shared `params` (any /process_video field) with
+    # per-video overrides, an optional `meshes` list ({format, lod}) exported for every
+    # finished video, one progress stream and one streamed archive for all outputs
+    try:
+        items, manifest = batch_items()
+    except UploadError as e:
+        return upload_error(e)
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'videos must be a non-empty list'}), 400
+    if len(items) > BATCH_MAX_VIDEOS:
+        return jsonify({'error': f'At most {BATCH_MAX_VIDEOS} videos per batch'}), 400
+    if not all(isinstance(item, dict) and item.get('filename') for item in items):
+        return jsonify({'error': 'every video needs a filename'}), 400
+    params = manifest.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    try:
+        meshes = parse_mesh_specs(manifest.get('meshes'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Admit the batch as a whole or not at all (cached and deduplicated videos need no slot)
+    if len(items) > job_scheduler.free_slots():
+        return jsonify({'error': f'Job queue cannot take {len(items)} more jobs right now'}), 503
+
+    group_id = 'group-' + str(uuid.uuid4())
+    job_groups.create(group_id, owner=process_owner(), params=params, meshes=meshes, video_count=len(items))
+    members = []
+    for item in items:
+        data = dict(params, priority=manifest.get('priority', 0))
+        data.update(item)
+        body, status = queue_video(data, group_id)
+        member = {'filename': item['filename'], 'name': data.get('original_filename') or item['filename'], 'task_id': body.get('task_id')}
+        for field in ('cached', 'deduplicated', 'error'):
+            if field in body:
+                member[field] = body[field]
+        if member['task_id'] is None:
+            job_groups.reject(group_id)
+        members.append(member)
+    job_groups.seal(group_id, members)
+    print(f"[Batch] Group {group_id}: {sum(1 for m in members if m['task_id'])} of {len(members)} videos queued")
+    return jsonify({
+        'group_id': group_id,
+        'members': members,
+        'progress_url': f'/progress/{group_id}',
+        'status_url': f'/group/{group_id}',
+        'archive_url': f'/group/{group_id}/archive',
+    }), 200
+
+def get_group(group_id):
+    group = task_store.get(group_id)
+    return group if group is not None and group.get('kind') == 'group' else None
+
+@app.route('/group/<group_id>')
+def group_status(group_id):
+    group = get_group(group_id)
+    if group is None:
+        return jsonify({'error': 'Group not found.'}), 404
+    members = []
+    for member in group.get('members', []):
+        task = task_store.get(member['task_id']) if member.get('task_id') else None
+        members.append(dict(member, status=task['status'] if task else 'rejected', progress=task['progress'] if task else 0))
+    return jsonify({'group_id': group_id, 'status': group['status'], 'progress': group['progress'], 'members': members})
+
+@app.route('/group/<group_id>/cancel', methods=['POST'])
+def cancel_group(group_id):
+    group = get_group(group_id)
+    if group is None:
+        return jsonify({'error': 'Group not found.'}), 404
+    cancelled = [m['task_id'] for m in group.get('members', []) if m.get('task_id') and job_scheduler.cancel(m['task_id'])]
+    return jsonify({'message': 'Group cancelled', 'group_id': group_id, 'cancelled': cancelled}), 200
+
+def group_archive_entries(group, include):
+    # (name in archive, path) of every finished output of the group's members,
+    # one folder per video, plus a manifest.json describing them
+    entries = []
+    manifest = {'group_id': group['task_id'], 'status': group['status'], 'videos': []}
+    files = {}
+    for index, member in enumerate(group.get('members', []), 1):
+        task = task_store.get(member['task_id']) if member.get('task_id') else None
+        record = {'name': member['name'], 'task_id': member.get('task_id'), 'status': task['status'] if task else 'rejected', 'files': []}
+        manifest['videos'].append(record)
+        if task is None:
+            continue
+        if member['task_id'] in files:
+            # Deduplicated video: its outputs are those of the identical one already listed
+            record['files'] = files[member['task_id']]
+            continue
+        files[member['task_id']] = record['files']
+        stem = os.path.splitext(os.path.basename(member['name']))[0]
+        folder = f"{index:03d}_{stem}"
+        outputs = []
+        if 'snapshot' in include:
+            outputs.append((task.get('snapshot_path'), f"{stem}.ingp"))
+        if 'video' in include:
+            outputs.append((task.get('output_video_path'), f"{stem}.mp4"))
+        snapshot_path = task.get('snapshot_path')
+        if 'mesh' in include and snapshot_path and os.path.exists(snapshot_path):
+            for format, lod in group.get('meshes') or []:
+                mesh_key = make_mesh_key(snapshot_path, format, MESH_DEFAULT_RESOLUTION, MESH_DEFAULT_DENSITY_THRESH, lod)
+                outputs.append((mesh_cache.lookup(mesh_key, format), f"{stem}_lod{lod}.{format}" if lod else f"{stem}.{format}"))
+        for path, name in outputs:
+            if path and os.path.exists(path):
+                entries.append((f"{folder}/{name}", path))
+                record['files'].append(f"{folder}/{name}")
+    return [('manifest.json', json.dumps(manifest, indent=2).encode())] + entries
+
+@app.route('/group/<group_id>/archive')
+def group_archive(group_id):
+    # Everything the group has produced so far, zipped on the fly (nothing is staged on disk)
+    group = get_group(group_id)
+    if group is None:
+        return jsonify({'error': 'Group not found.'}), 404
+    include = set(request.args.get('include', 'snapshot,video,mesh').split(','))
+    entries = group_archive_entries(group, include)
+    return Response(stream_zip(entries), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{group_id}.zip"', 'X-Accel-Buffering': 'no'})
+
+def worker_denied():
+    # Error response for worker requests without the shared WORKER_TOKEN, else None
+    if WORKER_TOKEN and request.headers.get('Authorization') != f'Bearer {WORKER_TOKEN}':
+        return jsonify({'error': 'Invalid worker token'}), 401
+    return None
+
+def sync_path(path):
+    # The real path of `path` if it lies in a root workers may transfer, else None
+    if not path:
+        return None
+    _, root = map_path(os.path.abspath(path), lease_queue.roots, lease_queue.roots)
+    if root not in SYNC_ROOTS:
+        return None
+    real = os.path.realpath(path)
+    base = os.path.realpath(lease_queue.roots[root])
+    return real if real == base or real.startswith(base + os.sep) else None
+
+@app.route('/workers', methods=['GET'])
+def workers_status():
+    return jsonify(dict(lease_queue.snapshot(), remote_pools=REMOTE_POOLS))
+
+@app.route('/workers/lease', methods=['POST'])
+def worker_lease():
+    # Long poll: a command for one of the worker's pools, or 204 after `wait` seconds
+    denied = worker_denied()
+    if denied:
+        return denied
+    data = request.get_json() or {}
+    worker_id = data.get('worker_id')
+    pools = data.get('pools') or list(job_scheduler.pool_sizes)
+    if not worker_id:
+        return jsonify({'error': 'worker_id is required'}), 400
+    try:
+        wait = min(max(float(data.get('wait', 0)), 0.0), 25.0)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'wait must be a number'}), 400
+    lease = lease_queue.lease(worker_id, pools, wait, data.get('info'))
+    if lease is None:
+        return '', 204
+    return jsonify(lease), 200
+
+@app.route('/workers/leases/<lease_id>/heartbeat', methods=['POST'])
+def worker_heartbeat(lease_id):
+    # Extends the lease and carries the command's new output lines
+    denied = worker_denied()
+    if denied:
+        return denied
+    data = request.get_json() or {}
+    action = lease_queue.heartbeat(lease_id, [str(line) for line in data.get('lines', [])])
+    if action is None:
+        return jsonify({'error': 'Lease expired or unknown'}), 409
+    return jsonify({'action': action}), 200
+
+@app.route('/workers/leases/<lease_id>/complete', methods=['POST'])
+def worker_complete(lease_id):
+    # Outputs are uploaded first; `deleted` lists output files the run removed
+    denied = worker_denied()
+    if denied:
+        return denied
+    data = request.get_json() or {}
+    try:
+        returncode = int(data.get('returncode'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'returncode must be an integer'}), 400
+    deleted = [path for path in (sync_path(p) for p in data.get('deleted', [])) if path]
+    if not lease_queue.complete(lease_id, returncode, [str(line) for line in data.get('lines', [])], deleted):
+        return jsonify({'error': 'Lease expired or unknown'}), 409
+    return jsonify({'message': 'Completed'}), 200
+
+@app.route('/workers/files', methods=['GET'])
+def worker_download():
+    denied = worker_denied()
+    if denied:
+        return denied
+    path = sync_path(request.args.get('path'))
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'File not found'}), 404
+    return send_from_directory(os.path.dirname(path), os.path.basename(path), as_attachment=True, max_age=0)
+
+@app.route('/workers/leases/<lease_id>/files', methods=['PUT'])
+def worker_upload(lease_id):
+    # One output file of the lease; written next to its final path, then renamed
+    denied = worker_denied()
+    if denied:
+        return denied
+    path = sync_path(request.args.get('path'))
+    if path is None or not lease_queue.output_allowed(lease_id, path):
+        return jsonify({'error': 'Not an output of this lease'}), 403
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = f"{path}.{lease_id[:8]}.upload"
+    with open(partial_path, 'wb') as f:
+        shutil.copyfileobj(request.stream, f, 1024 * 1024)
+    os.replace(partial_path, path)
+    return jsonify({'path': path, 'size': os.path.getsize(path), 'mtime': os.path.getmtime(path)}), 200
+
 if __name__ == '__main__':
     app.run(debug=True)
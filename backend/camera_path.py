@@ -0,0 +1,153 @@
+import os
+import json
+import numpy as np
+
+# ===========================
+# Render camera paths
+# ===========================
+# Builds the base_cam.json camera path for rendering. Instead of orbiting the
+# origin at a fixed radius, the orbit's center, radius, height and up vector
+# are fitted to the reconstructed cameras in transforms.json; alternatively the
+# path follows the input trajectory through a Catmull-Rom spline. All frames
+# are computed in one batched NumPy pass.
+#
+# Output matrices keep the convention base_cam.json has always used: the
+# camera's z axis points from the camera towards what it looks at.
+
+# Fallback when there are no usable poses: the original fixed orbit around the origin
+DEFAULT_RADIUS = 1.5
+DEFAULT_HEIGHT = 0.5
+# Radius wobble and vertical oscillation, relative to the orbit radius
+RADIUS_WOBBLE = 0.1 / 1.5
+HEIGHT_WOBBLE = 0.2 / 1.5
+
+
+def _normalize(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def load_poses(transforms_path):
+    # camera-to-world matrices from transforms.json, in frame (file name) order
+    with open(transforms_path, 'r') as f:
+        transforms = json.load(f)
+    frames = sorted(transforms.get('frames', []), key=lambda frame: frame['file_path'])
+    if not frames:
+        return np.zeros((0, 4, 4))
+    return np.array([frame['transform_matrix'] for frame in frames], dtype=np.float64)
+
+
+def look_at(positions, targets, up):
+    # positions/targets: (N, 3) (targets may be (3,)); up: (3,) or (N, 3) -> (N, 4, 4)
+    positions = np.asarray(positions, dtype=np.float64)
+    z = _normalize(np.broadcast_to(targets, positions.shape) - positions)
+    x = np.cross(np.broadcast_to(up, positions.shape), z)
+    # Looking straight along the up vector leaves x undefined; pick any perpendicular
+    degenerate = np.linalg.norm(x, axis=-1) < 1e-8
+    if np.any(degenerate):
+        x[degenerate] = np.cross(z[degenerate], np.array([1.0, 0.0, 0.0]))
+    x = _normalize(x)
+    y = np.cross(z, x)
+
+    matrices = np.tile(np.eye(4), (len(positions), 1, 1))
+    matrices[:, :3, 0] = x
+    matrices[:, :3, 1] = y
+    matrices[:, :3, 2] = z
+    matrices[:, :3, 3] = positions
+    return matrices
+
+
+def fit_orbit(c2w):
+    # Orbit parameters from transforms.json poses (OpenGL convention: cameras look along -z)
+    origins = c2w[:, :3, 3]
+    directions = _normalize(-c2w[:, :3, 2])
+
+    # Point closest (least squares) to every camera's optical axis
+    projectors = np.eye(3)[None, :, :] - directions[:, :, None] * directions[:, None, :]
+    center = np.linalg.lstsq(projectors.sum(axis=0), np.einsum('nij,nj->i', projectors, origins), rcond=None)[0]
+
+    up = _normalize(c2w[:, :3, 1].sum(axis=0))
+    offsets = origins - center
+    heights = offsets @ up
+    planar = offsets - heights[:, None] * up
+    return {
+        'center': center,
+        'up': up,
+        'radius': float(np.median(np.linalg.norm(planar, axis=1))),
+        'height': float(np.median(heights)),
+        'start': planar[0],
+    }
+
+
+def orbit_path(num_frames, center, up, radius, height, start=None):
+    # Full circle around `center` in the plane perpendicular to `up`, starting at
+    # the azimuth of `start`, with the same radius/height wobble as always
+    up = _normalize(np.asarray(up, dtype=np.float64))
+    reference = start if start is not None and np.linalg.norm(start) > 1e-8 else np.cross(up, [1.0, 0.0, 0.0])
+    if np.linalg.norm(reference) < 1e-8:
+        reference = np.cross(up, [0.0, 1.0, 0.0])
+    a = _normalize(reference - (reference @ up) * up)
+    b = np.cross(up, a)
+
+    angles = 2 * np.pi * np.arange(num_frames) / num_frames
+    radii = radius * (1 + RADIUS_WOBBLE * np.sin(angles))
+    heights = height + HEIGHT_WOBBLE * radius * np.sin(2 * angles)
+    positions = (center[None, :]
+                 + radii[:, None] * (np.cos(angles)[:, None] * a + np.sin(angles)[:, None] * b)
+                 + heights[:, None] * up)
+    return look_at(positions, center, up)
+
+
+def _catmull_rom(points, t):
+    # Uniform Catmull-Rom through `points` (K, D) evaluated at parameters t in [0, K-1]
+    padded = np.concatenate([2 * points[:1] - points[1:2], points, 2 * points[-1:] - points[-2:-1]])
+    segment = np.clip(np.floor(t).astype(np.int64), 0, len(points) - 2)
+    u = (t - segment)[:, None]
+    p0, p1, p2, p3 = padded[segment], padded[segment + 1], padded[segment + 2], padded[segment + 3]
+    return 0.5 * ((2 * p1) + (-p0 + p2) * u + (2 * p0 - 5 * p1 + 4 * p2 - p3) * u ** 2 + (-p0 + 3 * p1 - 3 * p2 + p3) * u ** 3)
+
+
+def spline_path(c2w, num_frames):
+    # Smooth path through the input camera trajectory, sampled evenly by arc length
+    positions = c2w[:, :3, 3]
+    forwards = _normalize(-c2w[:, :3, 2])
+    ups = c2w[:, :3, 1]
+    if len(positions) < 2:
+        return look_at(np.repeat(positions, num_frames, axis=0), positions + forwards, ups.mean(axis=0))
+
+    # Reparameterize by cumulative chord length so the speed is constant
+    chord = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(positions, axis=0), axis=1))])
+    if chord[-1] <= 0:
+        t = np.linspace(0, len(positions) - 1, num_frames)
+    else:
+        t = np.interp(np.linspace(0, chord[-1], num_frames), chord, np.arange(len(positions)))
+
+    sampled_positions = _catmull_rom(positions, t)
+    sampled_forwards = _normalize(_catmull_rom(forwards, t))
+    sampled_ups = _normalize(_catmull_rom(ups, t))
+    return look_at(sampled_positions, sampled_positions + sampled_forwards, sampled_ups)
+
+
+def build_camera_path(transforms_path, num_frames, mode='orbit'):
+    c2w = load_poses(transforms_path) if transforms_path and os.path.exists(transforms_path) else np.zeros((0, 4, 4))
+    if len(c2w) == 0:
+        print("[Camera Path] No camera poses available, orbiting the origin")
+        return orbit_path(num_frames, np.zeros(3), np.array([0.0, 0.0, 1.0]), DEFAULT_RADIUS, DEFAULT_HEIGHT)
+    if mode == 'spline':
+        return spline_path(c2w, num_frames)
+    orbit = fit_orbit(c2w)
+    print(f"[Camera Path] Orbit center {np.round(orbit['center'], 3).tolist()}, radius {orbit['radius']:.3f}, height {orbit['height']:.3f}")
+    return orbit_path(num_frames, orbit['center'], orbit['up'], orbit['radius'], orbit['height'], orbit['start'])
+
+
+def write_camera_path(camera_path_file, matrices, width, height, fps, fov=45):
+    camera_path = {
+        "camera_path": [{"camera_to_world": matrix} for matrix in matrices.tolist()],
+        "render_fov": fov,
+        "render_width": width,
+        "render_height": height,
+        "fps": fps,
+        "shutter_speed": 1000,
+        "exposure": 1.0
+    }
+    with open(camera_path_file, 'w') as f:
+        json.dump(camera_path, f, indent=4)
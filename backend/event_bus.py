@@ -0,0 +1,146 @@
+import json
+import time
+import threading
+from collections import deque
+
+# Per-task publish/subscribe for progress events. Publishers (the pipeline
+# stages) push log entries as they are written to the task store; every SSE
+# subscriber of that task is woken immediately instead of polling.
+#
+# The task store stays the source of truth: subscribers replay from it on
+# connect (Last-Event-ID resume), when their bounded buffer overflowed, and
+# for tasks run by another server process, which this bus never sees.
+
+SUBSCRIBER_BUFFER = 256
+PROGRESS_INTERVAL = 0.5   # Seconds between coalesced PROGRESS updates per task
+HEARTBEAT_INTERVAL = 15.0 # Seconds of silence before a keep-alive comment is sent
+REMOTE_POLL_INTERVAL = 2.0
+
+
+class Subscription:
+    def __init__(self, task_id, buffer_size):
+        self.task_id = task_id
+        self.overflowed = False
+        self._entries = deque()
+        self._buffer_size = buffer_size
+        self._cond = threading.Condition()
+
+    def push(self, entry):
+        with self._cond:
+            if len(self._entries) >= self._buffer_size:
+                # Slow client: drop what we hold and let it catch up from the store
+                self._entries.clear()
+                self.overflowed = True
+            else:
+                self._entries.append(entry)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        # Returns (entries, overflowed); both empty/False when the timeout expired
+        with self._cond:
+            if not self._entries and not self.overflowed:
+                self._cond.wait(timeout)
+            entries = list(self._entries)
+            self._entries.clear()
+            overflowed, self.overflowed = self.overflowed, False
+            return entries, overflowed
+
+
+class EventBus:
+    def __init__(self, buffer_size=SUBSCRIBER_BUFFER, progress_interval=PROGRESS_INTERVAL):
+        self.buffer_size = buffer_size
+        self.progress_interval = progress_interval
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        # task_id -> (time of last coalesced publish, pending entry or None)
+        self._coalesce = {}
+
+    def subscribe(self, task_id):
+        subscription = Subscription(task_id, self.buffer_size)
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.task_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.task_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, task_id, entry, coalesce=False):
+        # coalesce=True marks high-rate updates (training/render PROGRESS lines):
+        # at most one per progress_interval is delivered, always the latest
+        now = time.monotonic()
+        with self._lock:
+            last_sent, pending = self._coalesce.get(task_id, (0.0, None))
+            if coalesce and now - last_sent < self.progress_interval:
+                self._coalesce[task_id] = (last_sent, entry)
+                return
+            deliver = [entry]
+            if not coalesce and pending is not None:
+                # Flush the held-back progress update first so ordering is preserved
+                deliver.insert(0, pending)
+            self._coalesce[task_id] = (now if coalesce else last_sent, None)
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for subscription in subscribers:
+            for item in deliver:
+                subscription.push(item)
+
+    def forget(self, task_id):
+        with self._lock:
+            self._coalesce.pop(task_id, None)
+
+
+def format_sse(entry):
+    payload = {'line': entry['line'], 'progress': entry['progress'], 'status': entry['status']}
+    return f"id: {entry['offset']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def sse_stream(task_store, event_bus, task_id, last_event_id, terminal_statuses, is_local):
+    # Generator behind GET /progress/<task_id>. `is_local` tells whether this
+    # process runs the task (and so publishes its events on event_bus).
+    subscription = event_bus.subscribe(task_id)
+    try:
+        yield "retry: 3000\n\n"
+        last_offset = last_event_id
+        last_sent = time.monotonic()
+        replay = True
+        while True:
+            if replay:
+                entries = task_store.read_log(task_id, after=last_offset)
+                if not entries:
+                    # Caught up with the store: finish if the task is done, else go back to waiting
+                    replay = False
+                    task = task_store.get(task_id)
+                    if task is None:
+                        return
+                    if task['status'] in terminal_statuses and last_offset >= task['log_length'] - 1:
+                        yield f"data: {json.dumps({'line': 'Processing finished.', 'progress': task['progress'], 'status': task['status']})}\n\n"
+                        return
+                    if time.monotonic() - last_sent >= HEARTBEAT_INTERVAL:
+                        yield ": keep-alive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+            else:
+                entries, overflowed = subscription.wait(HEARTBEAT_INTERVAL if is_local else REMOTE_POLL_INTERVAL)
+                if overflowed or not is_local or not entries:
+                    replay = True
+                    continue
+
+            for entry in entries:
+                if entry['offset'] <= last_offset:
+                    continue
+                yield format_sse(entry)
+                last_offset = entry['offset']
+                last_sent = time.monotonic()
+                if entry['status'] in terminal_statuses:
+                    yield f"data: {json.dumps({'line': 'Processing finished.', 'progress': entry['progress'], 'status': entry['status']})}\n\n"
+                    return
+    finally:
+        event_bus.unsubscribe(subscription)
@@ -0,0 +1,160 @@
+import time
+import threading
+
+# Batch submissions: pipeline tasks submitted together under one group id.
+# The group has a task record of its own, and its log interleaves the members'
+# output lines, each prefixed with the member's name, so the SSE stream of
+# /progress (with Last-Event-ID resume) works for the group unchanged. High-rate
+# progress lines are forwarded at most once per GROUP_PROGRESS_INTERVAL per
+# group. The group's progress is the mean of its members', and it ends once it
+# is sealed (all members submitted), every member has ended and no follow-up
+# work it holds (mesh exports) is pending: 'completed' if all members
+# succeeded, 'failed' otherwise.
+
+GROUP_PROGRESS_INTERVAL = 1.0
+SUCCESS_STATUSES = ('completed', 'stopped')
+
+
+class JobGroups:
+    def __init__(self, task_store, emit, terminal_statuses, on_member_done=None):
+        self.task_store = task_store
+        # emit(task_id, line, progress=None, status=None, coalesce=False), as in app.py
+        self.emit = emit
+        self.terminal_statuses = terminal_statuses
+        # Called as on_member_done(group_id, task_id, status) once per finished member
+        self.on_member_done = on_member_done
+        self._lock = threading.Lock()
+        self._member_groups = {}   # task_id -> set of group ids
+        self._groups = {}          # group_id -> member names, progress and status
+
+    def create(self, group_id, **fields):
+        self.task_store.create(group_id, 'running', progress=0, kind='group', **fields)
+        with self._lock:
+            self._groups[group_id] = {'names': {}, 'progress': {}, 'status': {}, 'done': set(), 'rejected': 0,
+                                      'pending': set(), 'sealed': False, 'last_progress': 0.0}
+
+    def add_member(self, group_id, task_id, name):
+        # Register before the member's job is submitted so none of its output is
+        # missed; members that already exist (cached or deduplicated) join as they are
+        with self._lock:
+            group = self._groups[group_id]
+            # A deduplicated video joins under the name of the first one that ran
+            group['names'].setdefault(task_id, name)
+            self._member_groups.setdefault(task_id, set()).add(group_id)
+            task = self.task_store.get(task_id)
+            group['progress'][task_id] = task['progress'] if task else 0
+            group['status'][task_id] = task['status'] if task else 'queued'
+        if task is not None and task['status'] in self.terminal_statuses:
+            self._member_finished(group_id, task_id, task['status'])
+
+    def remove_member(self, group_id, task_id):
+        # The member could not be submitted after all; it counts as rejected
+        with self._lock:
+            group = self._groups[group_id]
+            for field in ('names', 'progress', 'status'):
+                group[field].pop(task_id, None)
+            group['rejected'] += 1
+            self._forget_locked(group_id, task_id)
+
+    def reject(self, group_id):
+        with self._lock:
+            self._groups[group_id]['rejected'] += 1
+
+    def seal(self, group_id, members):
+        # All members are submitted; `members` is the per-item summary kept with the group
+        self.task_store.update(group_id, members=members)
+        with self._lock:
+            group = self._groups[group_id]
+            group['sealed'] = True
+            line = f"Group queued: {len(group['names'])} tasks, {group['rejected']} rejected"
+            progress = self._progress(group)
+        self.emit(group_id, line, progress=progress, status='running')
+        self._finish_if_done(group_id)
+
+    def is_member(self, task_id):
+        with self._lock:
+            return task_id in self._member_groups
+
+    def hold(self, group_id, key):
+        # Keeps the group open until release(group_id, key)
+        with self._lock:
+            group = self._groups.get(group_id)
+            if group is None:
+                return False
+            group['pending'].add(key)
+            return True
+
+    def release(self, group_id, key, line=None):
+        with self._lock:
+            group = self._groups.get(group_id)
+            if group is None:
+                return
+            group['pending'].discard(key)
+            progress = self._progress(group)
+        if line:
+            self.emit(group_id, line, progress=progress, status='running')
+        self._finish_if_done(group_id)
+
+    def on_entry(self, task_id, entry, coalesce=False):
+        # Fold one of a member's log entries into its groups' logs
+        with self._lock:
+            group_ids = list(self._member_groups.get(task_id, ()))
+        for group_id in group_ids:
+            with self._lock:
+                group = self._groups.get(group_id)
+                if group is None or task_id not in group['names']:
+                    continue
+                group['progress'][task_id] = entry['progress']
+                group['status'][task_id] = entry['status']
+                finished = entry['status'] in self.terminal_statuses
+                now = time.monotonic()
+                if coalesce and not finished and now - group['last_progress'] < GROUP_PROGRESS_INTERVAL:
+                    continue
+                if coalesce:
+                    group['last_progress'] = now
+                line = f"[{group['names'][task_id]}] {entry['line']}"
+                progress = self._progress(group)
+            self.emit(group_id, line, progress=progress, status='running', coalesce=coalesce)
+            if finished:
+                self._member_finished(group_id, task_id, entry['status'])
+                self._finish_if_done(group_id)
+
+    def _member_finished(self, group_id, task_id, status):
+        with self._lock:
+            group = self._groups.get(group_id)
+            if group is None or task_id in group['done']:
+                return
+            group['done'].add(task_id)
+        if self.on_member_done is not None:
+            try:
+                self.on_member_done(group_id, task_id, status)
+            except Exception as e:
+                print(f"[Job Groups] on_member_done for {task_id} raised: {e}")
+
+    def _progress(self, group):
+        total = len(group['names']) + group['rejected']
+        if not total:
+            return 100
+        done = sum(100 if group['status'][task_id] in self.terminal_statuses else group['progress'][task_id]
+                   for task_id in group['names'])
+        return int((done + 100 * group['rejected']) / total)
+
+    def _forget_locked(self, group_id, task_id):
+        groups = self._member_groups.get(task_id)
+        if groups is not None:
+            groups.discard(group_id)
+            if not groups:
+                del self._member_groups[task_id]
+
+    def _finish_if_done(self, group_id):
+        with self._lock:
+            group = self._groups.get(group_id)
+            if group is None or not group['sealed'] or group['pending'] or len(group['done']) < len(group['names']):
+                return
+            del self._groups[group_id]
+            for task_id in group['names']:
+                self._forget_locked(group_id, task_id)
+        succeeded = sum(1 for status in group['status'].values() if status in SUCCESS_STATUSES)
+        failed = len(group['names']) + group['rejected'] - succeeded
+        self.emit(group_id, f"Group finished: {succeeded} succeeded, {failed} failed", progress=100,
+                  status='completed' if not failed else 'failed')
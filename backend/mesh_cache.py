@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import hashlib
+from result_cache import hash_file
+from task_store import SQLiteDatabase, owner_alive, process_owner
+
+# Generated meshes, kept on disk under cache_dir and keyed by the snapshot's
+# content hash plus the export parameters, so repeated downloads of the same
+# mesh are served straight from disk. The raw marching cubes output (format
+# 'raw', no lod) is cached too, so every level of detail and format is derived
+# from a single marching cubes run. Identical requests that arrive while a
+# mesh is being generated, in any server process, join that generation
+# instead of starting another.
+# Old meshes are evicted least-recently-used once the cache exceeds max_bytes.
+
+# SQLite index of the cached meshes and of exports being generated, shared by
+# every server process; LEGACY_INDEX_FILENAME is the JSON index it replaces
+INDEX_FILENAME = 'index.db'
+LEGACY_INDEX_FILENAME = 'index.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meshes (
+    key          TEXT PRIMARY KEY,
+    path         TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    created      REAL NOT NULL,
+    last_access  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exports (
+    key      TEXT PRIMARY KEY,
+    state    TEXT NOT NULL,
+    error    TEXT,
+    owner    TEXT NOT NULL,
+    updated  REAL NOT NULL
+);
+"""
+ACTIVE_STATES = ('queued', 'running')
+
+
+def make_mesh_key(snapshot_path, format, resolution, density_thresh, lod=None):
+    params = {'snapshot': hash_file(snapshot_path), 'format': format, 'resolution': resolution, 'density_thresh': density_thresh}
+    if lod is not None:
+        params['lod'] = lod
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class MeshCache:
+    # Export state ('queued' | 'running' | 'failed', with an error) is kept in the
+    # shared index, so /export_status answers and begin() deduplicates the same
+    # way whichever server process is asked. An active export whose process has
+    # exited on this host reads as failed and may be started again.
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        self._db = SQLiteDatabase(self.index_path, SCHEMA)
+        self._import_legacy_index()
+
+    def _import_legacy_index(self):
+        legacy_path = os.path.join(self.cache_dir, LEGACY_INDEX_FILENAME)
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Mesh Cache] Ignoring unreadable index {legacy_path}: {e}")
+            entries = {}
+        with self._db._transaction() as conn:
+            for key, entry in entries.items():
+                conn.execute('INSERT OR IGNORE INTO meshes VALUES (?, ?, ?, ?, ?)',
+                             (key, entry['path'], entry['size'], entry['created'], entry.get('last_access', entry['created'])))
+        os.replace(legacy_path, legacy_path + '.imported')
+
+    def mesh_path(self, key, format):
+        return os.path.join(self.cache_dir, f"{key}.{format}")
+
+    def lookup(self, key, format):
+        path = self.mesh_path(key, format)
+        with self._db._transaction() as conn:
+            if not os.path.exists(path):
+                conn.execute('DELETE FROM meshes WHERE key = ?', (key,))
+                return None
+            now = time.time()
+            # A mesh without an entry (written before the index existed) is adopted
+            conn.execute('INSERT OR IGNORE INTO meshes VALUES (?, ?, ?, ?, ?)', (key, path, os.path.getsize(path), now, now))
+            conn.execute('UPDATE meshes SET last_access = ? WHERE key = ?', (now, key))
+            return path
+
+    def _export_locked(self, conn, key):
+        row = conn.execute('SELECT state, error, owner FROM exports WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row['state'] in ACTIVE_STATES and not owner_alive(row['owner']):
+            return {'state': 'failed', 'error': 'Mesh generation was interrupted'}
+        return {'state': row['state'], 'error': row['error']}
+
+    def status(self, key, format):
+        if os.path.exists(self.mesh_path(key, format)):
+            return {'state': 'ready'}
+        with self._db._transaction() as conn:
+            return self._export_locked(conn, key) or {'state': 'unknown'}
+
+    def begin(self, key):
+        # True if the caller should generate this mesh; False if it is already
+        # being generated (the caller just hands out the same handle)
+        with self._db._transaction() as conn:
+            current = self._export_locked(conn, key)
+            if current is not None and current['state'] in ACTIVE_STATES:
+                return False
+            conn.execute('INSERT OR REPLACE INTO exports VALUES (?, ?, NULL, ?, ?)', (key, 'queued', process_owner(), time.time()))
+            return True
+
+    def mark_running(self, key):
+        with self._db._transaction() as conn:
+            conn.execute("UPDATE exports SET state = 'running', updated = ? WHERE key = ?", (time.time(), key))
+
+    def abandon(self, key):
+        with self._db._transaction() as conn:
+            conn.execute('DELETE FROM exports WHERE key = ?', (key,))
+
+    def finish(self, key, path=None, error=None):
+        if path is None or not os.path.exists(path):
+            # Keep the failure around so pollers can see why
+            with self._db._transaction() as conn:
+                conn.execute('INSERT OR REPLACE INTO exports VALUES (?, ?, ?, ?, ?)',
+                             (key, 'failed', error or 'Mesh generation failed', process_owner(), time.time()))
+            return
+        now = time.time()
+        with self._db._transaction() as conn:
+            conn.execute('DELETE FROM exports WHERE key = ?', (key,))
+            conn.execute('INSERT OR REPLACE INTO meshes VALUES (?, ?, ?, ?, ?)', (key, path, os.path.getsize(path), now, now))
+            evicted = self._evict_locked(conn, keep=key)
+        for entry in evicted:
+            print(f"[Mesh Cache] Evicting {entry['path']} ({entry['size']} bytes)")
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+
+    def _evict_locked(self, conn, keep=None):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM meshes').fetchone()[0]
+        evicted = []
+        for row in conn.execute('SELECT key, path, size FROM meshes WHERE key != ? ORDER BY last_access', (keep,)).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM meshes WHERE key = ?', (row['key'],))
+            total -= row['size']
+            evicted.append(dict(row))
+        return evicted
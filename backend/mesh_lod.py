@@ -0,0 +1,496 @@
+import os
+import json
+import struct
+import time
+import numpy as np
+
+# Mesh post-processing for export: instant-ngp's marching cubes output is read
+# into NumPy arrays, duplicate vertices are welded, the mesh is simplified to a
+# level of detail with quadric error metrics, positions are quantized to a
+# 16-bit grid and colors to 8 bits, and the result is written as binary PLY,
+# OBJ or glTF binary (GLB).
+#
+# Decimation collapses edges in batches instead of one at a time from a heap:
+# every pass scores all edges with the summed quadrics of their endpoints,
+# collapses the edges that are the cheapest around both of their endpoints (an
+# independent set, so collapses never interact within a pass), rejects the
+# ones that would flip a face, and repeats until the triangle budget is met.
+# Boundary edges get extra quadrics so open borders do not shrink inwards.
+
+# Triangle budget per level of detail; level 0 keeps full resolution
+LOD_TRIANGLES = (None, 200000, 50000, 10000)
+POSITION_BITS = 16
+# Vertices closer than this fraction of the bounding box diagonal are welded
+WELD_TOLERANCE = 1e-6
+BOUNDARY_WEIGHT = 100.0
+MAX_DECIMATION_PASSES = 200
+SELECTION_ROUNDS = 4       # Rounds of independent edge picks per pass
+
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+GLB_MAGIC = 0x46546C67
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+
+
+# ---------- reading ----------
+
+def read_mesh(path):
+    # (vertices float64 (N, 3), faces int64 (F, 3), colors uint8 (N, 3) or None)
+    if path.lower().endswith('.obj'):
+        return read_obj(path)
+    return read_ply(path)
+
+
+def _triangulate(polygons):
+    # Fan-triangulates a list of index lists
+    triangles = [(poly[0], poly[i], poly[i + 1]) for poly in polygons for i in range(1, len(poly) - 1)]
+    return np.array(triangles, dtype=np.int64).reshape(-1, 3)
+
+
+def read_ply(path):
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f"{path} is not a PLY file")
+        fmt, elements = None, []
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{path}: PLY header has no end_header")
+            words = line.decode('ascii', 'replace').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                break
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append({'name': words[1], 'count': int(words[2]), 'properties': []})
+            elif words[0] == 'property':
+                if words[1] == 'list':
+                    elements[-1]['properties'].append((words[4], 'list', PLY_TYPES[words[2]], PLY_TYPES[words[3]]))
+                else:
+                    elements[-1]['properties'].append((words[2], PLY_TYPES[words[1]]))
+        body = f.read()
+
+    if fmt == 'ascii':
+        return _read_ply_ascii(body, elements)
+    order = '<' if fmt == 'binary_little_endian' else '>'
+    offset = 0
+    vertices = faces = colors = None
+    for element in elements:
+        properties = element['properties']
+        if all(len(p) == 2 for p in properties):
+            dtype = np.dtype([(name, order + kind) for name, kind in properties])
+            data = np.frombuffer(body, dtype=dtype, count=element['count'], offset=offset)
+            offset += dtype.itemsize * element['count']
+            if element['name'] == 'vertex':
+                vertices = np.stack([data['x'], data['y'], data['z']], axis=1).astype(np.float64)
+                if 'red' in data.dtype.names:
+                    colors = np.stack([data['red'], data['green'], data['blue']], axis=1).astype(np.uint8)
+        elif element['name'] == 'face' and len(properties) == 1:
+            _, _, count_type, index_type = properties[0]
+            # Marching cubes only writes triangles; anything else takes the slow path
+            dtype = np.dtype([('n', order + count_type), ('i', order + index_type, (3,))])
+            data = np.frombuffer(body, dtype=dtype, count=element['count'], offset=offset) if element['count'] else None
+            if data is None or (data['n'] == 3).all():
+                faces = np.zeros((0, 3), dtype=np.int64) if data is None else data['i'].astype(np.int64)
+                offset += dtype.itemsize * element['count']
+            else:
+                faces, offset = _read_ply_polygons(body, offset, element['count'], order + count_type, order + index_type)
+        else:
+            raise ValueError(f"Unsupported PLY element {element['name']}")
+    if vertices is None or faces is None:
+        raise ValueError("PLY file has no vertex or face element")
+    return vertices, faces, colors
+
+
+def _read_ply_polygons(body, offset, count, count_type, index_type):
+    count_size, index_size = np.dtype(count_type).itemsize, np.dtype(index_type).itemsize
+    polygons = []
+    for _ in range(count):
+        n = int(np.frombuffer(body, dtype=count_type, count=1, offset=offset)[0])
+        offset += count_size
+        polygons.append(np.frombuffer(body, dtype=index_type, count=n, offset=offset).tolist())
+        offset += n * index_size
+    return _triangulate(polygons), offset
+
+
+def _read_ply_ascii(body, elements):
+    lines = body.decode('ascii').split('\n')
+    position = 0
+    vertices = faces = colors = None
+    for element in elements:
+        rows = lines[position:position + element['count']]
+        position += element['count']
+        names = [p[0] for p in element['properties']]
+        if element['name'] == 'vertex':
+            data = np.array([row.split() for row in rows], dtype=np.float64).reshape(-1, len(names))
+            vertices = data[:, [names.index('x'), names.index('y'), names.index('z')]]
+            if 'red' in names:
+                colors = data[:, [names.index('red'), names.index('green'), names.index('blue')]].astype(np.uint8)
+        elif element['name'] == 'face':
+            polygons = [[int(v) for v in row.split()[1:int(row.split()[0]) + 1]] for row in rows]
+            faces = _triangulate(polygons)
+    if vertices is None or faces is None:
+        raise ValueError("PLY file has no vertex or face element")
+    return vertices, faces, colors
+
+
+def read_obj(path):
+    positions, colors, polygons = [], [], []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('v '):
+                values = line.split()[1:]
+                positions.append(values[:3])
+                if len(values) >= 6:
+                    colors.append(values[3:6])
+            elif line.startswith('f '):
+                polygons.append([int(v.split('/')[0]) for v in line.split()[1:]])
+    vertices = np.array(positions, dtype=np.float64).reshape(-1, 3)
+    faces = _triangulate(polygons)
+    # OBJ indices are 1-based; negative ones count back from the last vertex
+    faces = np.where(faces < 0, faces + len(vertices), faces - 1)
+    mesh_colors = None
+    if len(colors) == len(vertices) and colors:
+        mesh_colors = np.clip(np.array(colors, dtype=np.float64) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    return vertices, faces, mesh_colors
+
+
+# ---------- cleanup ----------
+
+def _drop_degenerate(faces):
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])
+    faces = faces[keep]
+    # The same triangle twice (in any winding) is left behind by welding and collapses
+    ordered = np.sort(faces, axis=1)
+    if len(faces) and ordered.max() < 2 ** 21:
+        _, first = np.unique((ordered[:, 0] << 42) | (ordered[:, 1] << 21) | ordered[:, 2], return_index=True)
+    else:
+        _, first = np.unique(ordered, axis=0, return_index=True)
+    return faces[np.sort(first)]
+
+
+def compact(vertices, faces, colors=None):
+    # Drops vertices no face uses
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    return vertices[used], faces, None if colors is None else colors[used]
+
+
+def weld(vertices, faces, colors=None, tolerance=WELD_TOLERANCE):
+    # Merges vertices within tolerance (relative to the bounding box diagonal);
+    # merged colors are averaged
+    if len(vertices) == 0:
+        return vertices, faces, colors
+    low = vertices.min(axis=0)
+    diagonal = float(np.linalg.norm(vertices.max(axis=0) - low)) or 1.0
+    cells = np.round((vertices - low) / (tolerance * diagonal)).astype(np.int64)
+    # 21 bits per axis are enough for a 1e-6 tolerance; pack into one int64 key
+    keys = (cells[:, 0] << 42) | (cells[:, 1] << 21) | cells[:, 2]
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    welded = vertices[first]
+    welded_colors = None
+    if colors is not None:
+        counts = np.bincount(inverse, minlength=len(first))
+        welded_colors = np.stack([np.bincount(inverse, weights=colors[:, c], minlength=len(first)) / counts for c in range(3)], axis=1)
+        welded_colors = np.clip(welded_colors + 0.5, 0, 255).astype(np.uint8)
+    return compact(welded, _drop_degenerate(inverse[faces]), welded_colors)
+
+
+# ---------- quadric error decimation ----------
+
+def _plane_quadrics(normals, offsets, weights):
+    # Quadric K = w * [n d]^T [n d] of each plane, as its 10 unique entries
+    a, b, c = normals[:, 0], normals[:, 1], normals[:, 2]
+    d = offsets
+    return weights[:, None] * np.stack([a * a, a * b, a * c, a * d, b * b, b * c, b * d, c * c, c * d, d * d], axis=1)
+
+
+def _accumulate(indices, values, count):
+    return np.stack([np.bincount(indices, weights=values[:, k], minlength=count) for k in range(values.shape[1])], axis=1)
+
+
+def vertex_quadrics(vertices, faces):
+    v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    normals = np.cross(v1 - v0, v2 - v0)
+    double_area = np.linalg.norm(normals, axis=1)
+    normals = normals / np.maximum(double_area, 1e-30)[:, None]
+    face_q = _plane_quadrics(normals, -np.einsum('ij,ij->i', normals, v0), double_area * 0.5)
+    quadrics = _accumulate(faces.reshape(-1), np.repeat(face_q, 3, axis=0), len(vertices))
+
+    # Boundary edges (used by one face) are held in place by a plane through the
+    # edge, perpendicular to its face
+    starts, ends = faces.reshape(-1), faces[:, [1, 2, 0]].reshape(-1)
+    keys = np.minimum(starts, ends) * len(vertices) + np.maximum(starts, ends)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    boundary = counts[inverse.reshape(-1)] == 1
+    if boundary.any():
+        a, b = vertices[starts[boundary]], vertices[ends[boundary]]
+        edge = b - a
+        plane = np.cross(edge, np.repeat(normals, 3, axis=0)[boundary])
+        plane = plane / np.maximum(np.linalg.norm(plane, axis=1), 1e-30)[:, None]
+        edge_q = _plane_quadrics(plane, -np.einsum('ij,ij->i', plane, a), BOUNDARY_WEIGHT * np.einsum('ij,ij->i', edge, edge))
+        quadrics += _accumulate(np.concatenate([starts[boundary], ends[boundary]]), np.concatenate([edge_q, edge_q]), len(vertices))
+    return quadrics
+
+
+def _quadric_error(q, p):
+    x, y, z = p[:, 0], p[:, 1], p[:, 2]
+    return (q[:, 0] * x * x + 2 * q[:, 1] * x * y + 2 * q[:, 2] * x * z + 2 * q[:, 3] * x
+            + q[:, 4] * y * y + 2 * q[:, 5] * y * z + 2 * q[:, 6] * y
+            + q[:, 7] * z * z + 2 * q[:, 8] * z + q[:, 9])
+
+
+def _unique_edges(faces, vertex_count):
+    starts, ends = faces.reshape(-1), faces[:, [1, 2, 0]].reshape(-1)
+    keys = np.sort(np.minimum(starts, ends) * vertex_count + np.maximum(starts, ends))
+    # Sorting and comparing neighbours is several times faster than np.unique's hashing here
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return keys // vertex_count, keys % vertex_count
+
+
+def _flipped(vertices, new_vertices, faces, new_faces):
+    # Faces whose normal turns around after a collapse (faces that collapse to
+    # an edge are dropped anyway)
+    def normals(v, f):
+        return np.cross(v[f[:, 1]] - v[f[:, 0]], v[f[:, 2]] - v[f[:, 0]])
+    before, after = normals(vertices, faces), normals(new_vertices, new_faces)
+    degenerate = (new_faces[:, 0] == new_faces[:, 1]) | (new_faces[:, 1] == new_faces[:, 2]) | (new_faces[:, 2] == new_faces[:, 0])
+    return ~degenerate & (np.einsum('ij,ij->i', before, after) <= 0)
+
+
+def _local_minima(order, rank, u, v, n):
+    # Edges (of `order`, sorted by cost) that are the cheapest of `order` at both
+    # endpoints. Writing ranks in descending order leaves each vertex its lowest.
+    descending = order[::-1]
+    lowest_u = np.full(n, len(rank), dtype=np.int64)
+    lowest_u[u[descending]] = rank[descending]
+    lowest_v = np.full(n, len(rank), dtype=np.int64)
+    lowest_v[v[descending]] = rank[descending]
+    lowest = np.minimum(lowest_u, lowest_v)
+    return order[(lowest[u[order]] == rank[order]) & (lowest[v[order]] == rank[order])]
+
+
+def decimate(vertices, faces, colors=None, target_faces=0):
+    # Simplifies the mesh to at most target_faces triangles (or as close as it gets)
+    vertices = vertices.copy()
+    colors = None if colors is None else colors.astype(np.float64)
+    quadrics = vertex_quadrics(vertices, faces)
+    n = len(vertices)
+    for _ in range(MAX_DECIMATION_PASSES):
+        if len(faces) <= target_faces:
+            break
+        u, v = _unique_edges(faces, n)
+        q = quadrics[u] + quadrics[v]
+        # Best of the two endpoints and the midpoint; cheaper and steadier than
+        # solving for the optimum, which is often ill-conditioned on flat areas
+        candidates = np.stack([vertices[u], vertices[v], 0.5 * (vertices[u] + vertices[v])])
+        errors = np.stack([_quadric_error(q, c) for c in candidates])
+        best = np.argmin(errors, axis=0)
+        positions = candidates[best, np.arange(len(u))]
+        order = np.argsort(errors[best, np.arange(len(u))])
+        rank = np.empty(len(u), dtype=np.int64)
+        rank[order] = np.arange(len(u))
+
+        # An interior collapse removes two faces; stop at the budget
+        budget = max(1, (len(faces) - target_faces + 1) // 2)
+        usable = np.ones(len(u), dtype=bool)
+        locked = np.zeros(n, dtype=bool)
+        remap = np.arange(n)
+        new_vertices = vertices.copy()
+        chosen = []
+        for _round in range(SELECTION_ROUNDS):
+            # Each round takes the local minima among edges not touching an earlier pick
+            eligible = order[usable[order] & ~locked[u[order]] & ~locked[v[order]]]
+            picked = _local_minima(eligible, rank, u, v, n)[:budget - sum(len(c) for c in chosen)]
+            # Only faces around the picked edges can flip
+            moved = np.zeros(n, dtype=bool)
+            moved[u[picked]] = moved[v[picked]] = True
+            nearby = faces[moved[faces].any(axis=1)]
+            while len(picked):
+                trial_remap = remap.copy()
+                trial_remap[v[picked]] = u[picked]
+                trial_vertices = new_vertices.copy()
+                trial_vertices[u[picked]] = positions[picked]
+                flipped = _flipped(vertices, trial_vertices, nearby, trial_remap[nearby])
+                if not flipped.any():
+                    break
+                # Drop every collapse that touches a flipped face and check again
+                bad = np.zeros(n, dtype=bool)
+                bad[nearby[flipped].reshape(-1)] = True
+                rejected = bad[u[picked]] | bad[v[picked]]
+                usable[picked[rejected]] = False
+                picked = picked[~rejected]
+            if len(picked) == 0:
+                break
+            locked[u[picked]] = locked[v[picked]] = True
+            remap[v[picked]] = u[picked]
+            new_vertices[u[picked]] = positions[picked]
+            chosen.append(picked)
+            if sum(len(c) for c in chosen) >= budget:
+                break
+        if not chosen:
+            break
+
+        chosen = np.concatenate(chosen)
+        keep, gone = u[chosen], v[chosen]
+        vertices = new_vertices
+        quadrics[keep] += quadrics[gone]
+        if colors is not None:
+            colors[keep] = 0.5 * (colors[keep] + colors[gone])
+        faces = _drop_degenerate(remap[faces])
+
+    vertices, faces, colors = compact(vertices, faces, colors)
+    return vertices, faces, None if colors is None else np.clip(colors + 0.5, 0, 255).astype(np.uint8)
+
+
+# ---------- quantization and writing ----------
+
+def quantize_positions(vertices, bits=POSITION_BITS):
+    # (integer grid coordinates, offset, per-axis step); vertices ~= offset + grid * step
+    low = vertices.min(axis=0) if len(vertices) else np.zeros(3)
+    high = vertices.max(axis=0) if len(vertices) else np.zeros(3)
+    step = np.maximum(high - low, 1e-12) / (2 ** bits - 1)
+    grid = np.round((vertices - low) / step).astype(np.uint32 if bits > 16 else np.uint16)
+    return grid, low, step
+
+
+def vertex_normals(vertices, faces):
+    face_normals = np.cross(vertices[faces[:, 1]] - vertices[faces[:, 0]], vertices[faces[:, 2]] - vertices[faces[:, 0]])
+    normals = _accumulate(faces.reshape(-1), np.repeat(face_normals, 3, axis=0), len(vertices))
+    lengths = np.linalg.norm(normals, axis=1)
+    # Vertices of only zero-area faces get +Z, already unit length (glTF requires unit normals)
+    degenerate = lengths == 0
+    normals[degenerate] = (0.0, 0.0, 1.0)
+    lengths[degenerate] = 1.0
+    return normals / lengths[:, None]
+
+
+def write_ply(path, vertices, faces, colors=None):
+    fields = [('x', '<f4'), ('y', '<f4'), ('z', '<f4')]
+    if colors is not None:
+        fields += [('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
+    vertex_data = np.empty(len(vertices), dtype=fields)
+    vertex_data['x'], vertex_data['y'], vertex_data['z'] = vertices[:, 0], vertices[:, 1], vertices[:, 2]
+    if colors is not None:
+        vertex_data['red'], vertex_data['green'], vertex_data['blue'] = colors[:, 0], colors[:, 1], colors[:, 2]
+    face_data = np.empty(len(faces), dtype=[('n', 'u1'), ('i', '<i4', (3,))])
+    face_data['n'] = 3
+    face_data['i'] = faces
+    header = ['ply', 'format binary_little_endian 1.0', f'element vertex {len(vertices)}']
+    header += [f"property {'float' if kind == '<f4' else 'uchar'} {name}" for name, kind in fields]
+    header += [f'element face {len(faces)}', 'property list uchar int vertex_indices', 'end_header']
+    with open(path, 'wb') as f:
+        f.write(('\n'.join(header) + '\n').encode('ascii'))
+        f.write(vertex_data.tobytes())
+        f.write(face_data.tobytes())
+
+
+def write_obj(path, vertices, faces, colors=None):
+    with open(path, 'w') as f:
+        if colors is not None:
+            np.savetxt(f, np.hstack([vertices, colors / 255.0]), fmt='v %.6f %.6f %.6f %.4f %.4f %.4f')
+        else:
+            np.savetxt(f, vertices, fmt='v %.6f %.6f %.6f')
+        np.savetxt(f, faces + 1, fmt='f %d %d %d')
+
+
+def _srgb_to_linear(colors):
+    # glTF vertex colors are linear; instant-ngp writes sRGB
+    table = np.arange(256) / 255.0
+    table = np.where(table <= 0.04045, table / 12.92, ((table + 0.055) / 1.055) ** 2.4)
+    return np.round(table[colors] * 255.0).astype(np.uint8)
+
+
+def write_glb(path, vertices, faces, colors=None):
+    # Positions as uint16 (KHR_mesh_quantization, dequantized by the node
+    # transform), normals as normalized int8 and colors as normalized uint8.
+    # Every vertex attribute is padded to 4-byte elements, as glTF requires.
+    grid, low, step = quantize_positions(vertices)
+    count = len(vertices)
+    positions = np.zeros((count, 4), dtype=np.uint16)
+    positions[:, :3] = grid
+    normals = np.zeros((count, 4), dtype=np.int8)
+    normals[:, :3] = np.round(vertex_normals(vertices, faces) * 127.0).astype(np.int8)
+    index_type, index_component = (np.uint16, 5123) if count < 65536 else (np.uint32, 5125)
+    indices = faces.astype(index_type).reshape(-1)
+
+    blobs = [(positions.tobytes(), 8, 34962), (normals.tobytes(), 4, 34962)]
+    attributes = {'POSITION': 0, 'NORMAL': 1}
+    accessors = [
+        {'bufferView': 0, 'componentType': 5123, 'count': count, 'type': 'VEC3',
+         'min': grid.min(axis=0).tolist() if count else [0, 0, 0], 'max': grid.max(axis=0).tolist() if count else [0, 0, 0]},
+        {'bufferView': 1, 'componentType': 5120, 'normalized': True, 'count': count, 'type': 'VEC3'},
+    ]
+    if colors is not None:
+        rgba = np.full((count, 4), 255, dtype=np.uint8)
+        rgba[:, :3] = _srgb_to_linear(colors)
+        blobs.append((rgba.tobytes(), 4, 34962))
+        attributes['COLOR_0'] = len(accessors)
+        accessors.append({'bufferView': len(blobs) - 1, 'componentType': 5121, 'normalized': True, 'count': count, 'type': 'VEC4'})
+    blobs.append((indices.tobytes(), None, 34963))
+    accessors.append({'bufferView': len(blobs) - 1, 'componentType': index_component, 'count': len(indices), 'type': 'SCALAR'})
+
+    buffer_views, binary = [], b''
+    for data, stride, target in blobs:
+        view = {'buffer': 0, 'byteOffset': len(binary), 'byteLength': len(data), 'target': target}
+        if stride:
+            view['byteStride'] = stride
+        buffer_views.append(view)
+        binary += data + b'\0' * (-len(data) % 4)
+
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'Video2NeRF mesh_lod'},
+        'extensionsUsed': ['KHR_mesh_quantization'],
+        'extensionsRequired': ['KHR_mesh_quantization'],
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0, 'translation': low.tolist(), 'scale': step.tolist()}],
+        'meshes': [{'primitives': [{'attributes': attributes, 'indices': len(accessors) - 1, 'material': 0}]}],
+        'materials': [{'pbrMetallicRoughness': {'metallicFactor': 0.0, 'roughnessFactor': 1.0}}],
+        'accessors': accessors,
+        'bufferViews': buffer_views,
+        'buffers': [{'byteLength': len(binary)}],
+    }
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+    total = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<III', GLB_MAGIC, 2, total))
+        f.write(struct.pack('<II', len(json_chunk), GLB_JSON_CHUNK))
+        f.write(json_chunk)
+        f.write(struct.pack('<II', len(binary), GLB_BIN_CHUNK))
+        f.write(binary)
+
+
+WRITERS = {'ply': write_ply, 'obj': write_obj, 'glb': write_glb}
+
+
+def build_lod(input_path, output_path, format, target_faces=None):
+    # Reads a raw mesh, welds, decimates to target_faces (None keeps every face),
+    # quantizes and writes it in `format`; returns what was done
+    started = time.time()
+    vertices, faces, colors = read_mesh(input_path)
+    input_faces = len(faces)
+    vertices, faces, colors = weld(vertices, faces, colors)
+    if target_faces is not None and len(faces) > target_faces:
+        vertices, faces, colors = decimate(vertices, faces, colors, target_faces)
+    # PLY and OBJ keep float positions, snapped to the same grid the GLB stores
+    grid, low, step = quantize_positions(vertices)
+    vertices = low + grid * step
+    WRITERS[format](output_path, vertices, faces, colors)
+    return {
+        'input_faces': input_faces,
+        'faces': int(len(faces)),
+        'vertices': int(len(vertices)),
+        'bytes': os.path.getsize(output_path),
+        'seconds': round(time.time() - started, 3),
+    }
@@ -0,0 +1,189 @@
+import os
+import time
+import threading
+
+# Pipeline metrics in Prometheus text format: wall time of every stage (the
+# scheduler's stages plus the steps video2nerf.py reports), CPU time and memory
+# of the subprocesses each stage runs, and queue depth / active jobs per pool.
+#
+# Child processes are sampled from /proc. Every stage subprocess is started in
+# its own session (see scheduler.NEW_PROCESS_GROUP), so all processes sharing
+# that session id (ffmpeg, COLMAP, ...) are attributed to the stage. On
+# systems without /proc only wall times and queue metrics are collected.
+
+METRIC_PREFIX = 'video2nerf'
+# Histogram buckets for stage wall time in seconds (stages range from
+# milliseconds for the camera path to hours for SfM on long videos)
+STAGE_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600, 7200)
+SAMPLE_INTERVAL = 1.0
+
+PROC_DIR = '/proc'
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def read_session_usage(session_ids):
+    # {session id: (cpu seconds, rss bytes, process count)} for the given sessions.
+    # cutime/cstime carry the CPU of children that already exited and were reaped.
+    usage = {sid: [0.0, 0, 0] for sid in session_ids}
+    try:
+        pids = [name for name in os.listdir(PROC_DIR) if name.isdigit()]
+    except OSError:
+        return {}
+    for pid in pids:
+        try:
+            with open(os.path.join(PROC_DIR, pid, 'stat'), 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue  # exited while we were scanning
+        fields = stat[stat.rindex(')') + 2:].split()
+        session = int(fields[3])
+        if session not in usage:
+            continue
+        entry = usage[session]
+        entry[0] += sum(int(value) for value in fields[11:15]) / CLOCK_TICKS
+        entry[1] += int(fields[21]) * PAGE_SIZE
+        entry[2] += 1
+    return {sid: tuple(entry) for sid, entry in usage.items()}
+
+
+class Metrics:
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # stage -> [bucket counts..., sum, count]
+        self._durations = {}
+        # (stage, outcome) -> count
+        self._runs = {}
+        # stage -> child CPU seconds, peak RSS; current RSS / process count per stage
+        self._cpu_seconds = {}
+        self._peak_rss = {}
+        self._current_rss = {}
+        self._current_processes = {}
+        # (job_id, stage) -> {'cpu_seconds', 'peak_rss_bytes'} until the job is done
+        self._job_usage = {}
+
+    def observe_stage(self, stage, seconds, outcome='ok'):
+        # seconds=None counts the run without recording a duration
+        with self._lock:
+            self._runs[(stage, outcome)] = self._runs.get((stage, outcome), 0) + 1
+            if seconds is None:
+                return
+            histogram = self._durations.setdefault(stage, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def record_samples(self, samples):
+        # samples: [(job_id, stage, session_id, cpu_seconds, rss_bytes, processes)]
+        # from one scan; a stage may run several sessions side by side
+        with self._lock:
+            self._current_rss = {}
+            self._current_processes = {}
+            job_rss = {}
+            for job_id, stage, session_id, cpu_seconds, rss_bytes, processes in samples:
+                usage = self._job_usage.setdefault((job_id, stage), {'cpu_seconds': 0.0, 'peak_rss_bytes': 0, 'sessions': {}})
+                # CPU of a session only grows; count the increase since the last sample
+                delta = cpu_seconds - usage['sessions'].get(session_id, 0.0)
+                if delta > 0:
+                    usage['sessions'][session_id] = cpu_seconds
+                    usage['cpu_seconds'] += delta
+                    self._cpu_seconds[stage] = self._cpu_seconds.get(stage, 0.0) + delta
+                job_rss[(job_id, stage)] = job_rss.get((job_id, stage), 0) + rss_bytes
+                self._current_rss[stage] = self._current_rss.get(stage, 0) + rss_bytes
+                self._current_processes[stage] = self._current_processes.get(stage, 0) + processes
+            for (job_id, stage), rss_bytes in job_rss.items():
+                usage = self._job_usage[(job_id, stage)]
+                usage['peak_rss_bytes'] = max(usage['peak_rss_bytes'], rss_bytes)
+                self._peak_rss[stage] = max(self._peak_rss.get(stage, 0), rss_bytes)
+
+    def pop_job_usage(self, job_id):
+        # {stage: {'cpu_seconds', 'peak_rss_bytes'}} sampled for a finished job
+        with self._lock:
+            keys = [key for key in self._job_usage if key[0] == job_id]
+            return {stage: {'cpu_seconds': round(usage['cpu_seconds'], 2), 'peak_rss_bytes': usage['peak_rss_bytes']}
+                    for (_, stage), usage in ((key, self._job_usage.pop(key)) for key in keys)}
+
+    def render(self, scheduler_snapshot=None):
+        p = METRIC_PREFIX
+        lines = []
+        with self._lock:
+            lines += [f'# HELP {p}_stage_duration_seconds Wall time of pipeline stages.',
+                      f'# TYPE {p}_stage_duration_seconds histogram']
+            for stage, histogram in sorted(self._durations.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'{p}_stage_duration_seconds_bucket{_labels(stage=stage, le=bound)} {count}')
+                lines.append(f'{p}_stage_duration_seconds_bucket{_labels(stage=stage, le="+Inf")} {histogram[-1]}')
+                lines.append(f'{p}_stage_duration_seconds_sum{_labels(stage=stage)} {histogram[-2]:.3f}')
+                lines.append(f'{p}_stage_duration_seconds_count{_labels(stage=stage)} {histogram[-1]}')
+
+            lines += [f'# HELP {p}_stage_runs_total Finished stage runs by outcome.',
+                      f'# TYPE {p}_stage_runs_total counter']
+            lines += [f'{p}_stage_runs_total{_labels(stage=stage, outcome=outcome)} {count}'
+                      for (stage, outcome), count in sorted(self._runs.items())]
+
+            lines += [f'# HELP {p}_stage_cpu_seconds_total CPU time of stage subprocesses and their children.',
+                      f'# TYPE {p}_stage_cpu_seconds_total counter']
+            lines += [f'{p}_stage_cpu_seconds_total{_labels(stage=stage)} {seconds:.3f}' for stage, seconds in sorted(self._cpu_seconds.items())]
+
+            lines += [f'# HELP {p}_stage_peak_rss_bytes Largest resident set seen for one run of a stage.',
+                      f'# TYPE {p}_stage_peak_rss_bytes gauge']
+            lines += [f'{p}_stage_peak_rss_bytes{_labels(stage=stage)} {value}' for stage, value in sorted(self._peak_rss.items())]
+
+            lines += [f'# HELP {p}_stage_rss_bytes Resident set of the subprocesses of currently running stages.',
+                      f'# TYPE {p}_stage_rss_bytes gauge']
+            lines += [f'{p}_stage_rss_bytes{_labels(stage=stage)} {value}' for stage, value in sorted(self._current_rss.items())]
+
+            lines += [f'# HELP {p}_stage_processes Processes belonging to currently running stages.',
+                      f'# TYPE {p}_stage_processes gauge']
+            lines += [f'{p}_stage_processes{_labels(stage=stage)} {value}' for stage, value in sorted(self._current_processes.items())]
+
+        if scheduler_snapshot is not None:
+            pools = sorted(scheduler_snapshot['pools'].items())
+            for name, key, help_text in (('queue_depth', 'queued', 'Jobs waiting for a worker.'),
+                                         ('active_jobs', 'running', 'Jobs currently running.'),
+                                         ('pool_workers', 'workers', 'Configured workers.')):
+                lines += [f'# HELP {p}_{name} {help_text}', f'# TYPE {p}_{name} gauge']
+                lines += [f'{p}_{name}{_labels(pool=pool)} {info[key]}' for pool, info in pools]
+        return '\n'.join(lines) + '\n'
+
+
+class ProcessSampler:
+    # Background thread feeding /proc samples of running stage subprocesses into
+    # `metrics`. `list_processes()` returns (job_id, stage, subprocess) triples.
+    def __init__(self, metrics, list_processes, interval=SAMPLE_INTERVAL):
+        self.metrics = metrics
+        self.list_processes = list_processes
+        self.interval = interval
+        self.enabled = os.path.isdir(PROC_DIR)
+        if not self.enabled:
+            print("[Metrics] /proc not available, subprocess CPU/RSS sampling disabled")
+
+    def start(self):
+        if self.enabled:
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def sample(self):
+        # Remote workers' commands have no local pid to sample
+        running = [entry for entry in self.list_processes() if entry[2].pid is not None]
+        usage = read_session_usage({process.pid for _, _, process in running})
+        self.metrics.record_samples([(job_id, stage, process.pid, *usage[process.pid]) for job_id, stage, process in running
+                                     if usage.get(process.pid, (0, 0, 0))[2] > 0])
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[Metrics] Sampling failed: {e}")
+            time.sleep(self.interval)
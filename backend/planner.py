@@ -0,0 +1,183 @@
+import os
+import json
+import math
+import threading
+import numpy as np
+
+# ===========================
+# Frame budget planning and runtime estimates
+# ===========================
+# A plan turns a quality preset plus the upload's probe metadata (duration,
+# resolution, frame rate) into concrete extraction settings: an fps that keeps
+# the frame count near the preset's target whatever the clip length, and a
+# frame width that keeps every frame within the preset's pixel budget.
+#
+# Stage runtimes are predicted per scheduler stage by a least-squares fit over
+# the timings of finished jobs (stored as JSON lines), with features taken from
+# their plans. The fit is pulled towards fixed prior coefficients (ridge rows,
+# each worth PRIOR_WEIGHT jobs at a typical plan), so it starts out at the
+# priors and follows the recorded jobs once there are enough of them.
+
+HISTORY_LIMIT = 200        # Most recent samples per stage used for the fit
+PRIOR_WEIGHT = 3.0
+MIN_FRAMES = 20
+MIN_PIXELS = 320 * 180
+# Keyframe selection scores candidates decoded at fps x CANDIDATE_FPS_MULTIPLIER
+# (video2nerf.py's default); fps is capped so there are about KEYFRAME_OVERSAMPLE
+# candidates per kept frame and long clips do not flood the scoring
+KEYFRAME_OVERSAMPLE = 4.0
+CANDIDATE_FPS_MULTIPLIER = 3
+
+
+def _features(stage, plan):
+    frames = plan['expected_frames']
+    megapixels = plan['megapixels']
+    if stage == 'video2nerf':
+        # Decode time grows with the clip, SIFT and matching with frames x pixels
+        return [1.0, frames, frames * megapixels, plan.get('duration') or 0.0]
+    if stage == 'train':
+        # Fixed step count; loading and ray sampling scale with the dataset
+        return [1.0, frames * megapixels]
+    return [1.0]
+
+
+# Prior coefficients for _features(), in seconds; roughly a mid-range GPU
+STAGE_PRIORS = {
+    'video2nerf': [30.0, 1.5, 3.0, 0.2],
+    'train': [280.0, 0.2],
+    'camera_path': [1.0],
+    'render': [120.0],
+}
+# Feature magnitudes of a typical job, which scale the prior rows
+TYPICAL_PLAN = {'expected_frames': 120, 'megapixels': 0.92, 'duration': 60.0}
+
+
+def display_size(metadata):
+    width, height = metadata.get('width'), metadata.get('height')
+    if not width or not height:
+        return None, None
+    if abs(int(metadata.get('rotation') or 0)) % 180 == 90:
+        width, height = height, width
+    return int(width), int(height)
+
+
+def plan_extraction(metadata, fps, target_frames, max_pixels, frame_selection):
+    # Extraction settings for a preset (fps, target_frames, max_pixels); without
+    # usable metadata the preset is used as is
+    metadata = metadata or {}
+    duration = metadata.get('duration')
+    width, height = display_size(metadata)
+
+    frame_width = 0
+    megapixels = (width * height / 1e6) if width else max_pixels / 1e6
+    if width and width * height > max_pixels:
+        scale = math.sqrt(max_pixels / float(width * height))
+        # Even sizes, as encoders and ffmpeg's scale=W:-2 expect
+        frame_width = max(2, int(width * scale) // 2 * 2)
+        megapixels = frame_width * (height * frame_width / width) / 1e6
+
+    planned_fps = float(fps)
+    if duration:
+        cap = target_frames / duration
+        if frame_selection == 'keyframes':
+            cap *= KEYFRAME_OVERSAMPLE / CANDIDATE_FPS_MULTIPLIER
+        planned_fps = min(planned_fps, cap)
+        source_fps = metadata.get('fps')
+        if source_fps:
+            planned_fps = min(planned_fps, float(source_fps))
+        planned_fps = round(max(planned_fps, 0.05), 3)
+        sampled = duration * planned_fps
+        expected = min(target_frames, sampled * CANDIDATE_FPS_MULTIPLIER) if frame_selection == 'keyframes' else sampled
+    else:
+        expected = target_frames
+    return {
+        'fps': planned_fps,
+        'target_frames': int(target_frames),
+        'frame_width': frame_width,
+        'max_pixels': int(max_pixels),
+        'expected_frames': int(round(expected)),
+        'megapixels': round(megapixels, 3),
+        'duration': duration,
+        'source_size': [width, height] if width else None,
+    }
+
+
+class RuntimeModel:
+    def __init__(self, history_path, priors=STAGE_PRIORS):
+        self.history_path = history_path
+        self.priors = priors
+        self._lock = threading.Lock()
+        self._samples = {stage: [] for stage in priors}
+        self._coefficients = {}
+        if os.path.exists(history_path):
+            with open(history_path, 'r') as f:
+                for line in f:
+                    try:
+                        sample = json.loads(line)
+                    except ValueError:
+                        continue
+                    if sample.get('stage') in self._samples:
+                        self._samples[sample['stage']].append((sample['features'], sample['seconds']))
+
+    def record(self, stage, plan, seconds):
+        if stage not in self._samples:
+            return
+        sample = {'stage': stage, 'features': [round(x, 4) for x in _features(stage, plan)], 'seconds': round(seconds, 3)}
+        with self._lock:
+            self._samples[stage].append((sample['features'], sample['seconds']))
+            del self._samples[stage][:-HISTORY_LIMIT]
+            self._coefficients.pop(stage, None)
+            os.makedirs(os.path.dirname(os.path.abspath(self.history_path)), exist_ok=True)
+            with open(self.history_path, 'a') as f:
+                f.write(json.dumps(sample) + '\n')
+
+    def _fit(self, stage):
+        with self._lock:
+            if stage in self._coefficients:
+                return self._coefficients[stage]
+            samples = list(self._samples[stage])
+        prior = np.array(self.priors[stage])
+        # One row per coefficient: its feature at the typical magnitude, predicting the prior's share
+        typical = np.array(_features(stage, TYPICAL_PLAN)) * math.sqrt(PRIOR_WEIGHT)
+        rows = [np.diag(typical)] + [np.array([features]) for features, _ in samples]
+        targets = [typical * prior] + [np.array([seconds]) for _, seconds in samples]
+        coefficients, *_ = np.linalg.lstsq(np.vstack(rows), np.concatenate(targets), rcond=None)
+        with self._lock:
+            self._coefficients[stage] = coefficients
+        return coefficients
+
+    def predict(self, plan, stages=None):
+        # {stage: predicted seconds} for a plan
+        return {stage: round(max(0.0, float(np.dot(self._fit(stage), _features(stage, plan)))), 1)
+                for stage in (stages or self.priors)}
+
+    def sample_counts(self):
+        with self._lock:
+            return {stage: len(samples) for stage, samples in self._samples.items()}
+
+
+def fit_plan(model, metadata, fps, target_frames, max_pixels, frame_selection, budget_seconds):
+    # The richest plan whose predicted runtime fits the budget, or the smallest
+    # one considered if none does. Returns (plan, fits).
+    frame_options = []
+    frames = target_frames
+    while frames > MIN_FRAMES:
+        frame_options.append(int(frames))
+        frames *= 0.8
+    frame_options.append(MIN_FRAMES)
+    pixel_options = []
+    pixels = max_pixels
+    while pixels > MIN_PIXELS:
+        pixel_options.append(int(pixels))
+        pixels /= 2
+    pixel_options.append(MIN_PIXELS)
+
+    # Ranked by frames x linear resolution, so views and resolution shrink together
+    candidates = [(f, p) for f in frame_options for p in pixel_options]
+    candidates.sort(key=lambda c: (c[0] * math.sqrt(c[1])), reverse=True)
+    plan = None
+    for frames, pixels in candidates:
+        plan = plan_extraction(metadata, fps, frames, pixels, frame_selection)
+        if sum(model.predict(plan).values()) <= budget_seconds:
+            return plan, True
+    return plan_extraction(metadata, fps, MIN_FRAMES, MIN_PIXELS, frame_selection), False
@@ -0,0 +1,317 @@
+import os
+import time
+import uuid
+import threading
+from collections import deque
+
+# Remote execution of stage subprocesses. For the pools in REMOTE_POOLS, app.py
+# hands every stage command (video2nerf.py, instant-ngp's run.py) to a
+# LeaseQueue instead of starting it locally, and gets back a RemoteProcess that
+# behaves like the subprocess.Popen it replaces: its stdout yields the command's
+# output lines, and wait()/returncode/kill() work as before, so stage code is the
+# same either way.
+#
+# Workers (worker.py, any number per host) long-poll /workers/lease for a
+# command of a pool they serve, run it, and heartbeat with its output lines
+# while it runs. A lease that misses heartbeats for LEASE_SECONDS is taken back
+# and queued again (up to MAX_ATTEMPTS), so work held by a dead worker moves to
+# a live one.
+#
+# Paths: commands are sent with the server's paths plus the server's `roots`
+# (named directories). Workers map each root to a local directory; with a
+# shared filesystem they map to the same path and nothing is copied. Otherwise
+# the worker downloads a command's `inputs` before running it and uploads its
+# `outputs` (files, or every changed file below an output directory) before
+# reporting completion, and the server deletes output files the run removed.
+# Only SYNC_ROOTS are ever read or written over HTTP.
+
+LEASE_SECONDS = 30.0
+MAX_ATTEMPTS = 3
+WORKER_TIMEOUT = 60.0       # Workers not heard from for this long are dropped from /workers
+SYNC_ROOTS = ('dataset', 'uploads')
+# Exit code reported for commands cancelled, or given up on after MAX_ATTEMPTS
+CANCELLED_RETURNCODE = -9
+LOST_RETURNCODE = -1
+
+
+def map_path(path, from_roots, to_roots):
+    # Rewrites a path under one of from_roots to the same place under to_roots;
+    # the longest matching root wins. Returns (mapped path, root name or None).
+    best = None
+    for name, root in from_roots.items():
+        if not root or name not in to_roots:
+            continue
+        root = root.rstrip('/\\')
+        if (path == root or path.startswith(root + '/') or path.startswith(root + '\\')) and (best is None or len(root) > len(best[1])):
+            best = (name, root)
+    if best is None:
+        return path, None
+    name, root = best
+    return to_roots[name].rstrip('/\\') + path[len(root):].replace('\\', '/'), name
+
+
+def list_files(paths):
+    # {path: [size, mtime]} for the given files and every file below the given directories
+    files = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                for name in names:
+                    full = os.path.join(directory, name)
+                    stat = os.stat(full)
+                    files[full] = [stat.st_size, stat.st_mtime]
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            files[path] = [stat.st_size, stat.st_mtime]
+    return files
+
+
+def _under_outputs(task, path):
+    # At one of the task's output files or below one of its output directories
+    path = os.path.abspath(path)
+    return any(path == os.path.abspath(output) or path.startswith(os.path.abspath(output) + os.sep) for output in task.outputs)
+
+
+class RemoteTask:
+    def __init__(self, job_id, pool, command, cwd, inputs, outputs):
+        self.task_id = uuid.uuid4().hex
+        self.job_id = job_id
+        self.pool = pool
+        self.command = command
+        self.cwd = cwd
+        self.inputs = inputs
+        self.outputs = outputs
+        self.state = 'queued'
+        self.worker_id = None
+        self.lease_id = None
+        self.expires = 0.0
+        self.attempts = 0
+        self.returncode = None
+        self.lines = deque()
+        self.cancelled = False
+        self.submitted_at = time.time()
+
+    def describe(self):
+        return {'task_id': self.task_id, 'job_id': self.job_id, 'pool': self.pool, 'state': self.state,
+                'worker_id': self.worker_id, 'attempts': self.attempts, 'command': self.command[1:3]}
+
+
+class RemoteProcess:
+    # The Popen-like handle stage code gets for a remote command
+    remote = True
+    pid = None
+
+    def __init__(self, queue, task):
+        self._queue = queue
+        self._task = task
+        self.stdout = self
+        self.args = task.command
+
+    def readline(self):
+        # Next output line, '' once the command has finished and all lines were read
+        with self._queue.cond:
+            while not self._task.lines and self._task.state != 'done':
+                self._queue.cond.wait()
+            if self._task.lines:
+                return self._task.lines.popleft() + '\n'
+            return ''
+
+    def poll(self):
+        return self._task.returncode
+
+    @property
+    def returncode(self):
+        return self._task.returncode
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.cond:
+            while self._task.state != 'done':
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._queue.cond.wait(remaining)
+        return self._task.returncode
+
+    def communicate(self):
+        output = ''.join(iter(self.readline, ''))
+        self.wait()
+        return output, None
+
+    def kill(self):
+        self._queue.cancel(self._task.task_id)
+
+
+class LeaseQueue:
+    def __init__(self, roots, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.roots = dict(roots)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.cond = threading.Condition()
+        self._queued = deque()
+        self._tasks = {}
+        self._leases = {}
+        self._workers = {}
+        threading.Thread(target=self._reap, name='lease-reaper', daemon=True).start()
+
+    # ---------- server side ----------
+    def submit(self, job_id, pool, command, cwd=None, inputs=(), outputs=()):
+        task = RemoteTask(job_id, pool, [str(arg) for arg in command], cwd, list(inputs), list(outputs))
+        with self.cond:
+            self._tasks[task.task_id] = task
+            self._queued.append(task)
+            self.cond.notify_all()
+        return RemoteProcess(self, task)
+
+    def cancel(self, task_id):
+        with self.cond:
+            task = self._tasks.get(task_id)
+            if task is None or task.state == 'done':
+                return
+            task.cancelled = True
+            if task in self._queued:
+                self._queued.remove(task)
+            # A leased task learns of it on its next heartbeat; the stage stops waiting now
+            self._finish_locked(task, CANCELLED_RETURNCODE, 'Cancelled')
+
+    def live_workers(self, pool):
+        with self.cond:
+            now = time.time()
+            return sum(1 for worker in self._workers.values() if pool in worker['pools'] and now - worker['seen'] < WORKER_TIMEOUT)
+
+    def snapshot(self):
+        with self.cond:
+            now = time.time()
+            return {
+                'workers': [dict(worker, worker_id=worker_id, seen_seconds_ago=round(now - worker['seen'], 1))
+                            for worker_id, worker in self._workers.items() if now - worker['seen'] < WORKER_TIMEOUT],
+                'queued': [task.describe() for task in self._queued],
+                'leased': [task.describe() for task in self._leases.values()],
+            }
+
+    # ---------- worker side (called from the /workers routes) ----------
+    def lease(self, worker_id, pools, wait=0.0, info=None):
+        # Hands the oldest queued command of one of `pools` to the worker, waiting
+        # up to `wait` seconds for one; returns the lease description or None
+        deadline = time.monotonic() + wait
+        with self.cond:
+            self._touch_locked(worker_id, pools, info)
+            while True:
+                task = next((t for t in self._queued if t.pool in pools), None)
+                if task is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+                self._touch_locked(worker_id, pools, info)
+            self._queued.remove(task)
+            task.state = 'leased'
+            task.worker_id = worker_id
+            task.lease_id = uuid.uuid4().hex
+            task.attempts += 1
+            task.expires = time.time() + self.lease_seconds
+            self._leases[task.lease_id] = task
+            self._workers[worker_id]['running'] += 1
+        print(f"[Workers] {worker_id} leased {task.command[1] if len(task.command) > 1 else task.command[0]} "
+              f"for job {task.job_id} (attempt {task.attempts})")
+        return {
+            'lease_id': task.lease_id,
+            'task_id': task.task_id,
+            'job_id': task.job_id,
+            'pool': task.pool,
+            'command': task.command,
+            'cwd': task.cwd,
+            'roots': self.roots,
+            'inputs': list_files(task.inputs),
+            'outputs': task.outputs,
+            'lease_seconds': self.lease_seconds,
+        }
+
+    def heartbeat(self, lease_id, lines=()):
+        # Extends the lease and delivers output lines. Returns 'ok', 'cancel' (stop
+        # the command) or None when the lease is no longer held by the caller.
+        with self.cond:
+            task = self._leases.get(lease_id)
+            if task is None:
+                return None
+            if task.cancelled:
+                self._release_locked(task)
+                return 'cancel'
+            task.expires = time.time() + self.lease_seconds
+            self._touch_locked(task.worker_id)
+            if lines:
+                task.lines.extend(lines)
+                self.cond.notify_all()
+            return 'ok'
+
+    def output_allowed(self, lease_id, path):
+        # Whether the lease may write `path`
+        with self.cond:
+            task = self._leases.get(lease_id)
+            return task is not None and not task.cancelled and _under_outputs(task, path)
+
+    def complete(self, lease_id, returncode, lines=(), deleted=()):
+        with self.cond:
+            task = self._leases.get(lease_id)
+            if task is None:
+                return False
+            task.lines.extend(lines)
+            self._release_locked(task)
+        if returncode == 0 and not task.cancelled:
+            for path in deleted:
+                if _under_outputs(task, path) and os.path.isfile(path):
+                    os.remove(path)
+        with self.cond:
+            self._finish_locked(task, returncode)
+        return True
+
+    # ---------- internals ----------
+    def _touch_locked(self, worker_id, pools=None, info=None):
+        worker = self._workers.setdefault(worker_id, {'pools': [], 'running': 0, 'completed': 0, 'lost': 0, 'info': {}})
+        worker['seen'] = time.time()
+        if pools is not None:
+            worker['pools'] = list(pools)
+        if info:
+            worker['info'] = info
+
+    def _release_locked(self, task, completed=True):
+        self._leases.pop(task.lease_id, None)
+        worker = self._workers.get(task.worker_id)
+        if worker is not None:
+            worker['running'] = max(0, worker['running'] - 1)
+            worker['completed' if completed else 'lost'] += 1
+
+    def _finish_locked(self, task, returncode, line=None):
+        if task.state == 'done':
+            return
+        if line:
+            task.lines.append(line)
+        task.state = 'done'
+        task.returncode = returncode
+        self._tasks.pop(task.task_id, None)
+        self.cond.notify_all()
+
+    def _reap(self):
+        # Takes back leases whose worker stopped heartbeating
+        while True:
+            time.sleep(1.0)
+            now = time.time()
+            with self.cond:
+                for task in [t for t in self._leases.values() if t.expires < now]:
+                    self._release_locked(task, completed=False)
+                    if task.state == 'done':
+                        # Cancelled while leased; nothing to hand out again
+                        continue
+                    message = f"[Workers] Lease of {task.worker_id} on job {task.job_id} expired"
+                    if task.attempts >= self.max_attempts:
+                        self._finish_locked(task, LOST_RETURNCODE, f"{message}; giving up after {task.attempts} attempts")
+                    else:
+                        task.state = 'queued'
+                        task.worker_id = None
+                        task.lines.append(f"{message}; queued again")
+                        self._queued.appendleft(task)
+                        self.cond.notify_all()
+                    print(message)
+                for worker_id in [w for w, worker in self._workers.items() if now - worker['seen'] > WORKER_TIMEOUT]:
+                    del self._workers[worker_id]
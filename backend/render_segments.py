@@ -0,0 +1,91 @@
+import os
+import subprocess
+
+# Parallel rendering of one camera path. The frames of the video are split into
+# contiguous ranges and every range is rendered by its own instant-ngp run.py
+# process (--video_render_range), each pinned to a device round-robin. The
+# segment videos are then joined with ffmpeg's concat demuxer (`-c copy`), so
+# nothing is re-encoded. All segments come from the same camera path with the
+# same settings, which is what stream copy needs.
+#
+# run.py numbers frames by their index in the whole path, also inside a range.
+# Left to encode the video itself it writes tmp/%04d.jpg and runs ffmpeg, which
+# only looks for a first frame at indices 0-4, so every segment but the first
+# would come out empty. Segments are therefore given a frame pattern as
+# --video_output (run.py then just saves the frames) and each is encoded here
+# from its own start frame. Every segment renders into its own directory under
+# <output_dir>/render_segments.
+
+SEGMENTS_DIR = 'render_segments'
+# Shorter segments spend more time loading the snapshot than rendering
+MIN_SEGMENT_FRAMES = 15
+
+
+def detect_render_devices():
+    # GPU ids to spread segments over: RENDER_DEVICES ("0,1"), else
+    # CUDA_VISIBLE_DEVICES, else whatever `nvidia-smi -L` lists. [None] means one
+    # unnamed device (the process inherits the default).
+    configured = os.getenv("RENDER_DEVICES") or os.getenv("CUDA_VISIBLE_DEVICES")
+    if configured:
+        return [device.strip() for device in configured.split(',') if device.strip()] or [None]
+    try:
+        listing = subprocess.run(['nvidia-smi', '-L'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return [None]
+    devices = [str(i) for i, line in enumerate(listing.stdout.splitlines()) if line.startswith('GPU ')]
+    return devices or [None]
+
+
+def plan_segments(n_frames, workers, min_frames=MIN_SEGMENT_FRAMES):
+    # Inclusive [start, end] frame ranges of nearly equal length covering 0..n_frames-1
+    count = max(1, min(workers, n_frames // max(1, min_frames)))
+    bounds = [n_frames * i // count for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(count)]
+
+
+FRAME_PATTERN = '%04d.jpg'
+
+
+def segment_path(output_dir, index):
+    return os.path.join(output_dir, SEGMENTS_DIR, f"segment_{index:03d}", 'segment.mp4')
+
+
+def frame_pattern(output_dir, index):
+    return os.path.join(os.path.dirname(segment_path(output_dir, index)), FRAME_PATTERN)
+
+
+def missing_frames(pattern, start, end):
+    return [i for i in range(start, end + 1) if not os.path.exists(pattern % i)]
+
+
+def aggregate_progress(segment_progress, segments):
+    # Overall percentage, weighting each segment's percentage by its frame count
+    total = sum(end - start + 1 for start, end in segments)
+    done = sum(segment_progress[i] * (end - start + 1) for i, (start, end) in enumerate(segments))
+    return int(done / max(1, total))
+
+
+def encode_frames(pattern, start, end, fps, output_path, ffmpeg='ffmpeg'):
+    # Encodes frames start..end of `pattern` like run.py encodes a whole video; returns the ffmpeg result
+    partial_path = output_path + '.partial.mp4'
+    result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-framerate', str(fps), '-start_number', str(start), '-i', pattern,
+                             '-frames:v', str(end - start + 1), '-c:v', 'libx264', '-pix_fmt', 'yuv420p', partial_path],
+                            capture_output=True, text=True)
+    if result.returncode == 0:
+        os.replace(partial_path, output_path)
+    return result
+
+
+def concat_segments(paths, output_path, ffmpeg='ffmpeg'):
+    # Joins the segment videos without re-encoding; returns the ffmpeg result
+    list_path = os.path.join(os.path.dirname(paths[0]), '..', 'segments.txt')
+    with open(list_path, 'w') as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    partial_path = output_path + '.partial.mp4'
+    result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+                             '-c', 'copy', partial_path], capture_output=True, text=True)
+    if result.returncode == 0:
+        os.replace(partial_path, output_path)
+    return result
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from task_store import SQLiteDatabase, owner_alive, process_owner
+
+# Files a finished pipeline run must still have on disk to be served from the cache
+# (relative to the task's output directory)
+REQUIRED_ARTIFACTS = [
+    os.path.join('frames', 'transforms.json'),
+    'trained.ingp',
+    'output_video.mp4',
+]
+
+# SQLite index shared by every server process using the dataset directory;
+# LEGACY_INDEX_FILENAME is the JSON index it replaces, imported once
+INDEX_FILENAME = '.result_cache.db'
+LEGACY_INDEX_FILENAME = '.result_cache.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+# Hashes of files already read, keyed by (path, size, mtime), so a re-submitted
+# upload or snapshot is not re-read from disk; the least recently used are dropped
+HASH_MEMO_SIZE = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key          TEXT PRIMARY KEY,
+    output_dir   TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    created      REAL NOT NULL,
+    last_access  REAL NOT NULL,
+    hits         INTEGER NOT NULL DEFAULT 0,
+    metadata     TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS inflight (
+    key      TEXT PRIMARY KEY,
+    task_id  TEXT NOT NULL,
+    owner    TEXT NOT NULL,
+    started  REAL NOT NULL
+);
+"""
+
+_file_hash_memo = OrderedDict()
+_file_hash_lock = threading.Lock()
+
+
+def hash_file(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hash_lock:
+        if memo_key in _file_hash_memo:
+            _file_hash_memo.move_to_end(memo_key)
+            return _file_hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+
+    with _file_hash_lock:
+        _file_hash_memo[memo_key] = content_hash
+        while len(_file_hash_memo) > HASH_MEMO_SIZE:
+            _file_hash_memo.popitem(last=False)
+    return content_hash
+
+
+def make_cache_key(content_hash, params):
+    # Parameters are serialized with sorted keys so dict ordering never changes the key
+    payload = content_hash + ':' + json.dumps(params, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def path_within(path, base_dir):
+    # Strictly below base_dir; a sibling such as <base_dir>_old does not count
+    path, base_dir = os.path.abspath(path), os.path.abspath(base_dir)
+    return path != base_dir and os.path.commonpath([path, base_dir]) == base_dir
+
+
+class ResultCache:
+    # Index of finished pipeline runs living under base_dir, evicted
+    # least-recently-used first once their total size exceeds max_bytes.
+    # Also tracks in-flight runs so identical concurrent requests share one run.
+    # Both live in a SQLite file in base_dir, one transaction per call, so every
+    # server process sees the same entries and the same in-flight leaders.
+
+    def __init__(self, base_dir, max_bytes):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(base_dir, INDEX_FILENAME)
+        self._db = SQLiteDatabase(self.index_path, SCHEMA)
+        self._import_legacy_index()
+
+    def _import_legacy_index(self):
+        legacy_path = os.path.join(self.base_dir, LEGACY_INDEX_FILENAME)
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Result Cache] Ignoring unreadable index {legacy_path}: {e}")
+            entries = {}
+        with self._db._transaction() as conn:
+            for key, entry in entries.items():
+                conn.execute('INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (key, entry['output_dir'], entry['size'], entry['created'], entry['last_access'],
+                              entry.get('hits', 0), json.dumps(entry.get('metadata', {}))))
+        os.replace(legacy_path, legacy_path + '.imported')
+
+    def _artifacts_present(self, output_dir):
+        return all(os.path.exists(os.path.join(output_dir, rel)) for rel in REQUIRED_ARTIFACTS)
+
+    def lookup(self, key):
+        with self._db._transaction() as conn:
+            row = conn.execute('SELECT * FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if not self._artifacts_present(row['output_dir']):
+                # Someone removed the files behind our back; forget the entry
+                conn.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+            now = time.time()
+            conn.execute('UPDATE results SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key))
+            return dict(row, last_access=now, hits=row['hits'] + 1, metadata=json.loads(row['metadata']))
+
+    def begin(self, key, task_id):
+        # Returns the task id of an identical run already in progress (in any
+        # server process), or None if the caller is now the leader for this key
+        # and must run the pipeline. A leader whose process has exited is replaced.
+        with self._db._transaction() as conn:
+            row = conn.execute('SELECT task_id, owner FROM inflight WHERE key = ?', (key,)).fetchone()
+            if row is not None and owner_alive(row['owner']):
+                return row['task_id']
+            conn.execute('INSERT OR REPLACE INTO inflight VALUES (?, ?, ?, ?)', (key, task_id, process_owner(), time.time()))
+            return None
+
+    def finish(self, key, output_dir=None, metadata=None):
+        # Called by the leader once its run ends; output_dir is only given on success
+        succeeded = output_dir is not None and self._artifacts_present(output_dir)
+        size = directory_size(output_dir) if succeeded else 0
+        evicted = []
+        with self._db._transaction() as conn:
+            conn.execute('DELETE FROM inflight WHERE key = ?', (key,))
+            if not succeeded:
+                return
+            now = time.time()
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, 0, ?)',
+                         (key, output_dir, size, now, now, json.dumps(metadata or {})))
+            evicted = self._evict_locked(conn, keep=key)
+        # Files go once the index no longer points at them, outside the write lock
+        for entry in evicted:
+            print(f"[Result Cache] Evicting {entry['output_dir']} ({entry['size']} bytes)")
+            # Never delete anything outside the dataset directory we manage
+            if path_within(entry['output_dir'], self.base_dir):
+                shutil.rmtree(entry['output_dir'], ignore_errors=True)
+
+    def _evict_locked(self, conn, keep=None):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        evicted = []
+        for row in conn.execute('SELECT key, output_dir, size FROM results WHERE key != ? ORDER BY last_access', (keep,)).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM results WHERE key = ?', (row['key'],))
+            total -= row['size']
+            evicted.append(dict(row))
+        return evicted
@@ -0,0 +1,277 @@
+import os
+import heapq
+import time
+import itertools
+import threading
+import subprocess
+
+# Run subprocesses in their own process group so cancelling a job can take down
+# everything they spawned (ffmpeg, COLMAP, ...) and not just the direct child
+if os.name == 'nt':
+    NEW_PROCESS_GROUP = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    NEW_PROCESS_GROUP = {'start_new_session': True}
+
+TERMINAL_JOB_STATES = ('completed', 'failed', 'cancelled')
+
+# A stage function may return this instead of True when it found nothing to do
+# (e.g. its checkpoint was still valid); the job continues as on success
+SKIPPED = 'skipped'
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def kill_process_tree(process):
+    if process.poll() is not None:
+        return
+    if getattr(process, 'remote', False):
+        # A command leased to a remote worker (remote_workers.RemoteProcess)
+        process.kill()
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, 9)
+    except (OSError, ProcessLookupError):
+        process.kill()
+
+
+class Stage:
+    # One step of a job. `pool` names the worker pool it runs in; `fn(job)`
+    # returns True when the next stage should run.
+    def __init__(self, name, pool, fn):
+        self.name = name
+        self.pool = pool
+        self.fn = fn
+
+
+class Job:
+    def __init__(self, job_id, stages, priority, seq, on_done, group=None, group_seq=None):
+        self.job_id = job_id
+        self.stages = stages
+        self.priority = priority
+        self.seq = seq
+        self.group = group
+        # Jobs of a group share their first member's sequence number
+        self.group_seq = seq if group_seq is None else group_seq
+        self.on_done = on_done
+        self.stage_index = 0
+        self.state = 'queued'
+        self.cancelled = False
+        # Subprocesses of the running stage; usually one, several when a stage fans out
+        self.processes = []
+        self.submitted_at = time.time()
+        self.stage_timings = {}
+
+    @property
+    def current_stage(self):
+        return self.stages[self.stage_index]
+
+    def sort_key(self):
+        # Lower priority value runs first; ties go to the earlier submission, so a
+        # job that already finished SfM keeps its place ahead of newer jobs. A
+        # group's jobs queue as one block, in the order they were submitted.
+        return (self.priority, self.group_seq, self.seq)
+
+
+class JobScheduler:
+    # Priority queue per worker pool with a fixed number of workers each. A job
+    # moves to the next stage's pool when a stage completes, so one job's SfM
+    # (cpu pool) overlaps with another job's training (gpu pool).
+
+    def __init__(self, pool_sizes, max_queued, default_durations=None, stage_listener=None):
+        self.pool_sizes = dict(pool_sizes)
+        self.max_queued = max_queued
+        # Called as stage_listener(job, stage, seconds, outcome) after every stage run
+        self.stage_listener = stage_listener
+        self._cond = threading.Condition()
+        self._queues = {pool: [] for pool in pool_sizes}
+        self._running = {pool: set() for pool in pool_sizes}
+        self._jobs = {}
+        self._seq = itertools.count()
+        # group -> [shared sequence number, live jobs]
+        self._groups = {}
+        # Exponential moving average of every stage's wall time, used for ETAs
+        self._durations = dict(default_durations or {})
+
+        for pool, size in self.pool_sizes.items():
+            for i in range(size):
+                threading.Thread(target=self._worker, args=(pool,), name=f"scheduler-{pool}-{i}", daemon=True).start()
+
+    # ---------- submission / control ----------
+    def submit(self, job_id, stages, priority=0, on_done=None, group=None):
+        # Jobs submitted with the same `group` are scheduled together: they share
+        # one place in every pool's queue instead of interleaving with other jobs
+        with self._cond:
+            queued = sum(len(q) for q in self._queues.values())
+            if queued >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({queued} jobs waiting)")
+            seq = next(self._seq)
+            group_seq = None
+            if group is not None:
+                group_entry = self._groups.setdefault(group, [seq, 0])
+                group_entry[1] += 1
+                group_seq = group_entry[0]
+            job = Job(job_id, stages, priority, seq, on_done, group, group_seq)
+            self._jobs[job_id] = job
+            self._push_locked(job)
+            return self._admission_info_locked(job)
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in TERMINAL_JOB_STATES:
+                return False
+            job.cancelled = True
+            if job.state == 'queued':
+                queue = self._queues[job.current_stage.pool]
+                queue[:] = [entry for entry in queue if entry[-1] is not job]
+                heapq.heapify(queue)
+                job.state = 'cancelled'
+                finished = True
+            else:
+                finished = False
+            processes = list(job.processes)
+        for process in processes:
+            kill_process_tree(process)
+        if finished:
+            self._finish(job)
+        return True
+
+    def register_process(self, job_id, process):
+        # Stage functions hand over the subprocesses they are waiting on, so cancel()
+        # can kill them. A job cancelled in the meantime is killed right away.
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.processes = [p for p in job.processes if p.poll() is None] + [process]
+            cancelled = job.cancelled
+        if cancelled:
+            kill_process_tree(process)
+
+    def free_slots(self):
+        # How many more jobs submit() would accept right now
+        with self._cond:
+            return max(0, self.max_queued - sum(len(q) for q in self._queues.values()))
+
+    def is_cancelled(self, job_id):
+        job = self._jobs.get(job_id)
+        return job is not None and job.cancelled
+
+    # ---------- introspection ----------
+    def position(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return self._admission_info_locked(job)
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'pools': {
+                    pool: {'workers': self.pool_sizes[pool], 'queued': len(self._queues[pool]), 'running': len(self._running[pool])}
+                    for pool in self.pool_sizes
+                },
+                'stage_durations': {name: round(seconds, 1) for name, seconds in self._durations.items()},
+            }
+
+    def running_processes(self):
+        # (job_id, stage name, subprocess) for every running stage that registered one
+        with self._cond:
+            return [(job.job_id, job.current_stage.name, process)
+                    for job in self._jobs.values() if job.state == 'running' for process in job.processes]
+
+    def fan_out(self, pool, slots, cores_per_worker=1):
+        # How many worker processes one running stage of `pool` may split into.
+        # The `slots` (e.g. devices x processes per device) and the CPU cores are
+        # shared evenly between the stages currently running in that pool.
+        with self._cond:
+            running = max(1, len(self._running[pool]))
+        cores = os.cpu_count() or 1
+        return max(1, min(slots // running, cores // (cores_per_worker * running)))
+
+    def _position_locked(self, job):
+        if job.state != 'queued':
+            return 0
+        key = job.sort_key()
+        return sum(1 for entry in self._queues[job.current_stage.pool] if entry[-1].sort_key() < key)
+
+    def _admission_info_locked(self, job):
+        # ETA = time to drain the jobs ahead in this job's pool + its own remaining
+        # stages; rough, but based on measured stage durations
+        position = self._position_locked(job)
+        pool = job.current_stage.pool
+        pool_stage_seconds = sum(self._durations.get(stage.name, 0) for stage in job.stages if stage.pool == pool)
+        wait = (position + len(self._running[pool])) * pool_stage_seconds / max(1, self.pool_sizes[pool])
+        remaining = sum(self._durations.get(stage.name, 0) for stage in job.stages[job.stage_index:])
+        return {'state': job.state, 'stage': job.current_stage.name, 'queue_position': position, 'eta_seconds': round(wait + remaining)}
+
+    # ---------- workers ----------
+    def _push_locked(self, job):
+        job.state = 'queued'
+        heapq.heappush(self._queues[job.current_stage.pool], (job.sort_key(), job))
+        self._cond.notify_all()
+
+    def _worker(self, pool):
+        while True:
+            with self._cond:
+                while not self._queues[pool]:
+                    self._cond.wait()
+                _, job = heapq.heappop(self._queues[pool])
+                job.state = 'running'
+                self._running[pool].add(job.job_id)
+            stage = job.current_stage
+
+            start = time.time()
+            result = False
+            try:
+                result = stage.fn(job)
+            except Exception as e:
+                print(f"[Scheduler] Stage {stage.name} of job {job.job_id} raised: {e}")
+            ok = bool(result)
+            elapsed = time.time() - start
+            if self.stage_listener is not None:
+                outcome = 'cancelled' if job.cancelled else (SKIPPED if result == SKIPPED else ('ok' if ok else 'failed'))
+                try:
+                    self.stage_listener(job, stage, elapsed, outcome)
+                except Exception as e:
+                    print(f"[Scheduler] Stage listener raised: {e}")
+
+            with self._cond:
+                self._running[pool].discard(job.job_id)
+                job.processes = []
+                job.stage_timings[stage.name] = elapsed
+                if ok and result != SKIPPED and not job.cancelled:
+                    # Only full runs say how long the stage takes; skips, failures and cancels would skew the ETA
+                    previous = self._durations.get(stage.name)
+                    self._durations[stage.name] = elapsed if previous is None else 0.7 * previous + 0.3 * elapsed
+                if job.cancelled:
+                    job.state = 'cancelled'
+                elif not ok:
+                    job.state = 'failed'
+                elif job.stage_index + 1 < len(job.stages):
+                    job.stage_index += 1
+                    self._push_locked(job)
+                    continue
+                else:
+                    job.state = 'completed'
+            self._finish(job)
+
+    def _finish(self, job):
+        with self._cond:
+            self._jobs.pop(job.job_id, None)
+            group_entry = self._groups.get(job.group)
+            if group_entry is not None:
+                group_entry[1] -= 1
+                if group_entry[1] <= 0:
+                    del self._groups[job.group]
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"[Scheduler] on_done for job {job.job_id} raised: {e}")
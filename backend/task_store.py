@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Task state for the web app: one record per task (status, progress and a JSON
+# bag of other fields) plus an append-only log of the lines it produced, each
+# with a per-task offset so readers can resume where they left off.
+#
+# SQLiteTaskStore lets every server process see the same tasks and survives
+# restarts; MemoryTaskStore keeps the old single-process behaviour, with the
+# log capped per task.
+
+# Columns of the tasks table; every other field lives in the JSON `data` column
+TASK_COLUMNS = ('status', 'progress')
+
+MEMORY_LOG_LIMIT = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id     TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    progress    INTEGER NOT NULL DEFAULT 0,
+    data        TEXT NOT NULL DEFAULT '{}',
+    log_length  INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+CREATE TABLE IF NOT EXISTS task_log (
+    task_id   TEXT NOT NULL,
+    offset    INTEGER NOT NULL,
+    line      TEXT NOT NULL,
+    progress  INTEGER NOT NULL,
+    status    TEXT NOT NULL,
+    PRIMARY KEY (task_id, offset)
+) WITHOUT ROWID;
+"""
+
+
+def process_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill on Windows terminates the target, so ask the kernel instead
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_alive(owner):
+    # False only for a process_owner() string naming a process on this host that
+    # has exited; owners on other hosts cannot be checked and count as alive
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    return pid_alive(int(pid))
+
+
+def _split_fields(fields):
+    columns = {k: v for k, v in fields.items() if k in TASK_COLUMNS}
+    data = {k: v for k, v in fields.items() if k not in TASK_COLUMNS}
+    return columns, data
+
+
+class SQLiteDatabase:
+    # A SQLite file shared by every server process, with one connection per
+    # thread; also used by the result and mesh caches for their indexes
+    def __init__(self, path, schema):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(schema)
+
+    def _conn(self):
+        # sqlite3 connections must not be shared across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences are atomic across threads and processes
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+class SQLiteTaskStore(SQLiteDatabase):
+    def __init__(self, path):
+        super().__init__(path, SCHEMA)
+
+    def _row_to_task(self, row):
+        task = json.loads(row['data'])
+        task.update(task_id=row['task_id'], status=row['status'], progress=row['progress'], log_length=row['log_length'])
+        return task
+
+    def create(self, task_id, status, **fields):
+        columns, data = _split_fields(fields)
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO tasks (task_id, status, progress, data, log_length, created_at, updated_at) VALUES (?, ?, ?, ?, 0, ?, ?)',
+                (task_id, status, columns.get('progress', 0), json.dumps(data), now, now))
+            conn.execute('DELETE FROM task_log WHERE task_id = ?', (task_id,))
+
+    def get(self, task_id):
+        row = self._conn().execute('SELECT * FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        return None if row is None else self._row_to_task(row)
+
+    def exists(self, task_id):
+        return self._conn().execute('SELECT 1 FROM tasks WHERE task_id = ?', (task_id,)).fetchone() is not None
+
+    def _update_locked(self, conn, task_id, fields):
+        row = conn.execute('SELECT data FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        if row is None:
+            return False
+        columns, data = _split_fields(fields)
+        merged = json.loads(row['data'])
+        merged.update(data)
+        assignments = ''.join(f', {name} = ?' for name in columns)
+        conn.execute(f'UPDATE tasks SET data = ?, updated_at = ?{assignments} WHERE task_id = ?',
+                     (json.dumps(merged), time.time(), *columns.values(), task_id))
+        return True
+
+    def update(self, task_id, **fields):
+        with self._transaction() as conn:
+            return self._update_locked(conn, task_id, fields)
+
+    def transition(self, task_id, status, from_statuses=None, **fields):
+        # Compare-and-set: only move to `status` if the task is currently in one of
+        # `from_statuses` (any status when None). Returns whether it happened.
+        with self._transaction() as conn:
+            row = conn.execute('SELECT status FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+            if row is None or (from_statuses is not None and row['status'] not in from_statuses):
+                return False
+            return self._update_locked(conn, task_id, dict(fields, status=status))
+
+    def append_log(self, task_id, line, progress=None, status=None):
+        # Appends one line and, in the same transaction, applies the progress/status
+        # it reports. Returns the stored entry (with its offset), or None for an unknown task.
+        with self._transaction() as conn:
+            row = conn.execute('SELECT status, progress, log_length FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+            if row is None:
+                return None
+            entry = {
+                'offset': row['log_length'],
+                'line': line,
+                'progress': row['progress'] if progress is None else progress,
+                'status': row['status'] if status is None else status,
+            }
+            conn.execute('INSERT INTO task_log (task_id, offset, line, progress, status) VALUES (?, ?, ?, ?, ?)',
+                         (task_id, entry['offset'], line, entry['progress'], entry['status']))
+            conn.execute('UPDATE tasks SET log_length = log_length + 1, progress = ?, status = ?, updated_at = ? WHERE task_id = ?',
+                         (entry['progress'], entry['status'], time.time(), task_id))
+            return entry
+
+    def read_log(self, task_id, after=-1, limit=500):
+        rows = self._conn().execute(
+            'SELECT offset, line, progress, status FROM task_log WHERE task_id = ? AND offset > ? ORDER BY offset LIMIT ?',
+            (task_id, after, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, task_id):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM task_log WHERE task_id = ?', (task_id,))
+            conn.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
+
+    def list_active(self, terminal_statuses):
+        placeholders = ', '.join('?' for _ in terminal_statuses)
+        rows = self._conn().execute(f'SELECT * FROM tasks WHERE status NOT IN ({placeholders})', tuple(terminal_statuses)).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+
+class MemoryTaskStore:
+    def __init__(self, log_limit=MEMORY_LOG_LIMIT):
+        self.log_limit = log_limit
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._logs = {}
+
+    def create(self, task_id, status, **fields):
+        with self._lock:
+            self._tasks[task_id] = dict(fields, task_id=task_id, status=status, progress=fields.get('progress', 0), log_length=0, created_at=time.time())
+            self._logs[task_id] = deque(maxlen=self.log_limit)
+
+    def get(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return None if task is None else dict(task)
+
+    def exists(self, task_id):
+        return task_id in self._tasks
+
+    def update(self, task_id, **fields):
+        with self._lock:
+            if task_id not in self._tasks:
+                return False
+            self._tasks[task_id].update(fields)
+            return True
+
+    def transition(self, task_id, status, from_statuses=None, **fields):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or (from_statuses is not None and task['status'] not in from_statuses):
+                return False
+            task.update(fields, status=status)
+            return True
+
+    def append_log(self, task_id, line, progress=None, status=None):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            if progress is not None:
+                task['progress'] = progress
+            if status is not None:
+                task['status'] = status
+            entry = {'offset': task['log_length'], 'line': line, 'progress': task['progress'], 'status': task['status']}
+            task['log_length'] += 1
+            self._logs[task_id].append(entry)
+            return entry
+
+    def read_log(self, task_id, after=-1, limit=500):
+        with self._lock:
+            entries = [entry for entry in self._logs.get(task_id, ()) if entry['offset'] > after]
+        return entries[:limit]
+
+    def delete(self, task_id):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._logs.pop(task_id, None)
+
+    def list_active(self, terminal_statuses):
+        with self._lock:
+            return [dict(task) for task in self._tasks.values() if task['status'] not in terminal_statuses]
+
+
+def open_task_store(spec):
+    # 'memory' for the in-process store, otherwise a path to the SQLite database
+    if spec == 'memory':
+        return MemoryTaskStore()
+    if spec.startswith('sqlite:///'):
+        spec = spec[len('sqlite:///'):]
+    return SQLiteTaskStore(spec)
+
+
+def fail_orphaned_tasks(store, terminal_statuses):
+    # Tasks still marked active whose owning server process on this host is gone
+    # (crash or restart) will never finish; mark them failed so clients stop waiting
+    hostname = socket.gethostname()
+    for task in store.list_active(terminal_statuses):
+        owner = task.get('owner', '')
+        host, _, pid = owner.rpartition(':')
+        if host != hostname or not pid.isdigit() or pid_alive(int(pid)):
+            continue
+        if store.transition(task['task_id'], 'failed', from_statuses=[task['status']]):
+            store.append_log(task['task_id'], "Processing interrupted: server process exited", status='failed')
+            print(f"[Task Store] Marked orphaned task {task['task_id']} as failed")
@@ -0,0 +1,66 @@
+from remote_workers import LeaseQueue, map_path, CANCELLED_RETURNCODE, LOST_RETURNCODE
+
+SERVER_ROOTS = {'dataset': '/srv/nerf/dataset', 'uploads': '/srv/nerf/uploads', 'scripts': '/srv/nerf'}
+
+
+def test_map_path_uses_the_longest_root():
+    worker_roots = {'dataset': '/mnt/dataset', 'scripts': '/opt/nerf'}
+    assert map_path('/srv/nerf/dataset/job/frames', SERVER_ROOTS, worker_roots) == ('/mnt/dataset/job/frames', 'dataset')
+    assert map_path('/srv/nerf/video2nerf.py', SERVER_ROOTS, worker_roots) == ('/opt/nerf/video2nerf.py', 'scripts')
+    # Roots the worker does not map fall back to the next longest one
+    assert map_path('/srv/nerf/uploads/a.mp4', SERVER_ROOTS, worker_roots) == ('/opt/nerf/uploads/a.mp4', 'scripts')
+
+
+def test_map_path_matches_whole_components_only():
+    assert map_path('/srv/nerf/dataset2/x', {'dataset': '/srv/nerf/dataset'}, {'dataset': '/mnt/d'}) == ('/srv/nerf/dataset2/x', None)
+    assert map_path('/elsewhere/x', SERVER_ROOTS, {'dataset': '/mnt/d'}) == ('/elsewhere/x', None)
+
+
+def test_map_path_from_windows_roots():
+    assert map_path('D:\\nerf\\dataset\\job\\a.jpg', {'dataset': 'D:\\nerf\\dataset\\'}, {'dataset': '/mnt/d/'}) == ('/mnt/d/job/a.jpg', 'dataset')
+
+
+def test_expired_lease_is_queued_again():
+    queue = LeaseQueue(SERVER_ROOTS, lease_seconds=0.1)
+    process = queue.submit('job', 'gpu', ['python', 'run.py'])
+    first = queue.lease('worker-1', ['gpu'])
+    assert first is not None
+    # The reaper hands the command to the next worker once the lease runs out
+    second = queue.lease('worker-2', ['gpu'], wait=5.0)
+    assert second is not None and second['task_id'] == first['task_id']
+    assert queue.heartbeat(first['lease_id'], ['late']) is None
+    assert not queue.complete(first['lease_id'], 0)
+    assert queue.complete(second['lease_id'], 0, ['done'])
+    output, _ = process.communicate()
+    assert process.returncode == 0
+    assert 'queued again' in output and 'late' not in output and output.endswith('done\n')
+
+
+def test_gives_up_after_max_attempts():
+    queue = LeaseQueue(SERVER_ROOTS, lease_seconds=0.1, max_attempts=2)
+    process = queue.submit('job', 'gpu', ['python', 'run.py'])
+    assert queue.lease('worker-1', ['gpu']) is not None
+    assert queue.lease('worker-1', ['gpu'], wait=5.0) is not None
+    assert process.wait(timeout=5.0) == LOST_RETURNCODE
+    assert queue.lease('worker-1', ['gpu'], wait=1.5) is None
+
+
+def test_cancel_while_leased():
+    queue = LeaseQueue(SERVER_ROOTS)
+    process = queue.submit('job', 'gpu', ['python', 'run.py'])
+    lease = queue.lease('worker-1', ['gpu'])
+    process.kill()
+    # The stage stops waiting right away; the worker is told on its next heartbeat
+    assert process.wait(timeout=0) == CANCELLED_RETURNCODE
+    assert queue.heartbeat(lease['lease_id'], ['more']) == 'cancel'
+    assert queue.heartbeat(lease['lease_id']) is None
+    assert not queue.complete(lease['lease_id'], 0)
+    assert queue.snapshot()['leased'] == []
+    assert queue.lease('worker-1', ['gpu']) is None
+
+
+def test_lease_only_serves_requested_pools():
+    queue = LeaseQueue(SERVER_ROOTS)
+    queue.submit('job', 'cpu', ['python', 'video2nerf.py'])
+    assert queue.lease('gpu-worker', ['gpu']) is None
+    assert queue.lease('cpu-worker', ['cpu', 'gpu'])['pool'] == 'cpu'
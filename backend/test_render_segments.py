@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+from render_segments import plan_segments, aggregate_progress, frame_pattern, missing_frames, encode_frames
+
+STUB_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'stubs', 'ffmpeg')
+
+
+def test_plan_segments_covers_every_frame_once():
+    for n_frames in (15, 150, 151, 299):
+        for workers in (1, 2, 3, 7):
+            segments = plan_segments(n_frames, workers)
+            assert segments[0][0] == 0 and segments[-1][1] == n_frames - 1
+            assert all(end + 1 == next_start for (_, end), (next_start, _) in zip(segments, segments[1:]))
+            lengths = [end - start + 1 for start, end in segments]
+            assert max(lengths) - min(lengths) <= 1
+
+
+def test_plan_segments_keeps_segments_long_enough():
+    assert plan_segments(150, 4) == [(0, 36), (37, 74), (75, 111), (112, 149)]
+    assert len(plan_segments(40, 8, min_frames=15)) == 2
+    assert plan_segments(10, 4, min_frames=15) == [(0, 9)]
+
+
+def test_aggregate_progress_weights_by_frames():
+    segments = [(0, 29), (30, 119)]
+    assert aggregate_progress([100, 0], segments) == 25
+    assert aggregate_progress([0, 100], segments) == 75
+    assert aggregate_progress([100, 100], segments) == 100
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='the stub ffmpeg runs through its shebang line')
+def test_segment_frames_encode_from_their_start(tmp_path):
+    # run.py numbers the frames of a range by their index in the whole path
+    pattern = frame_pattern(str(tmp_path), 1)
+    os.makedirs(os.path.dirname(pattern))
+    for i in range(50, 100):
+        with open(pattern % i, 'wb') as f:
+            f.write(bytes([i]))
+    assert missing_frames(pattern, 50, 100) == [100]
+    output_path = str(tmp_path / 'segment.mp4')
+    result = encode_frames(pattern, 50, 99, 30, output_path, ffmpeg=STUB_FFMPEG)
+    assert result.returncode == 0, result.stderr
+    with open(output_path, 'rb') as f:
+        assert f.read() == bytes(range(50, 100))
+
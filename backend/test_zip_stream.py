@@ -0,0 +1,38 @@
+import io
+import zipfile
+
+import zip_stream
+from zip_stream import stream_zip
+
+
+def test_stream_zip_without_seeking(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_stream, 'CHUNK_SIZE', 1000)
+    snapshot = tmp_path / 'model.ingp'
+    snapshot.write_bytes(bytes(range(256)) * 20)
+    chunks = list(stream_zip([('job/model.ingp', str(snapshot)), ('job/info.json', b'{"ok": true}')]))
+    # The file member arrives while it is read rather than in one piece at the end
+    assert len(chunks) > 3
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ['job/model.ingp', 'job/info.json']
+        assert archive.read('job/model.ingp') == snapshot.read_bytes()
+        assert archive.read('job/info.json') == b'{"ok": true}'
+        info = archive.getinfo('job/model.ingp')
+        # Written to an unseekable sink: sizes follow the data in a descriptor
+        assert info.flag_bits & 0x08
+        assert info.compress_type == zipfile.ZIP_STORED
+
+
+def test_stream_zip_deflated(tmp_path):
+    mesh = tmp_path / 'mesh.obj'
+    mesh.write_text('v 0 0 0\n' * 5000)
+    data = b''.join(stream_zip([('mesh.obj', str(mesh))], compression=zipfile.ZIP_DEFLATED))
+    assert len(data) < mesh.stat().st_size
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.read('mesh.obj') == mesh.read_bytes()
+
+
+def test_stream_zip_empty():
+    with zipfile.ZipFile(io.BytesIO(b''.join(stream_zip([])))) as archive:
+        assert archive.namelist() == []
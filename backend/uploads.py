@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+from ffprobe import FFProbe
+from ffprobe.exceptions import FFProbeError
+
+# Chunked, resumable video uploads. A client opens an upload with its size,
+# then sends the bytes in order as raw chunks, each tagged with the offset it
+# starts at; after a dropped connection it asks for the current offset and
+# continues from there. Chunks stream to a temp file in fixed-size reads while
+# the SHA-256 is updated on the fly, so memory stays bounded for multi-GB
+# videos. The finished file is renamed into a content-addressed location
+# (<sha256><ext>) and probed once; the probe metadata is stored next to it.
+#
+# Layout under upload_dir:
+#   <sha256>.mp4, <sha256>.json   finished uploads and their metadata
+#   .partial/<upload_id>.part     bytes received so far
+#   .partial/<upload_id>.json     session (original filename, declared size)
+
+PARTIAL_DIR = '.partial'
+READ_SIZE = 1024 * 1024
+MAX_CHUNK_BYTES = 256 * 1024 * 1024
+# Unfinished uploads not touched for this long are deleted
+PARTIAL_TTL_SECONDS = 24 * 3600
+
+
+class UploadError(Exception):
+    # `status` is the HTTP status the route should answer with
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _extension(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return ext if re.fullmatch(r'\.[a-z0-9]{1,8}', ext) else '.mp4'
+
+
+def probe_video(path):
+    # Duration, resolution and codec of the first video stream, from one ffprobe run
+    try:
+        probe = FFProbe(path)
+    except (IOError, OSError) as e:
+        return {'probe_error': str(e)}
+    if not probe.video:
+        return {'probe_error': 'No video stream found'}
+    stream = probe.video[0]
+    metadata = {
+        'codec': stream.codec(),
+        'pixel_format': stream.pixel_format(),
+        'fps': stream.framerate,
+        'rotation': int(stream.__dict__.get('TAG:rotate', 0) or 0),
+    }
+    try:
+        metadata['width'], metadata['height'] = stream.frame_size()
+    except (FFProbeError, TypeError):
+        metadata['width'] = metadata['height'] = None
+    for key, read in (('duration', stream.duration_seconds), ('frames', stream.frames), ('bit_rate', stream.bit_rate)):
+        try:
+            metadata[key] = read()
+        except FFProbeError:
+            metadata[key] = None
+    return metadata
+
+
+class UploadManager:
+    def __init__(self, upload_dir):
+        self.upload_dir = upload_dir
+        self.partial_dir = os.path.join(upload_dir, PARTIAL_DIR)
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # upload_id -> (lock, running sha256, offset it covers); rebuilt from the
+        # part file when an upload resumes in another process or after a restart
+        self._sessions = {}
+        self.cleanup()
+
+    def _paths(self, upload_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+            raise UploadError('Unknown upload', status=404)
+        base = os.path.join(self.partial_dir, upload_id)
+        return base + '.part', base + '.json'
+
+    def _load_session(self, upload_id):
+        part_path, session_path = self._paths(upload_id)
+        try:
+            with open(session_path, 'r') as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            raise UploadError('Unknown upload', status=404)
+        session['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return session
+
+    def _state(self, upload_id):
+        with self._lock:
+            if upload_id not in self._sessions:
+                self._sessions[upload_id] = [threading.Lock(), None, -1]
+            return self._sessions[upload_id]
+
+    def create(self, filename, size):
+        if not filename or size is None or int(size) <= 0:
+            raise UploadError('filename and a positive size are required')
+        upload_id = uuid.uuid4().hex
+        part_path, session_path = self._paths(upload_id)
+        with open(part_path, 'wb'):
+            pass
+        with open(session_path, 'w') as f:
+            json.dump({'upload_id': upload_id, 'filename': os.path.basename(filename), 'size': int(size), 'created': time.time()}, f)
+        return {'upload_id': upload_id, 'offset': 0, 'size': int(size)}
+
+    def status(self, upload_id):
+        session = self._load_session(upload_id)
+        return {'upload_id': upload_id, 'offset': session['offset'], 'size': session['size'], 'complete': False}
+
+    def append(self, upload_id, offset, stream, length=None):
+        # Writes the chunk read from `stream` (a file-like object) at `offset`,
+        # which must equal the bytes received so far. Returns the status, or the
+        # finished upload's info once the last byte arrived.
+        lock, _, _ = state = self._state(upload_id)
+        with lock:
+            session = self._load_session(upload_id)
+            if offset != session['offset']:
+                raise UploadError(f"Expected offset {session['offset']}", status=409, offset=session['offset'])
+            if length is not None and (length > MAX_CHUNK_BYTES or offset + length > session['size']):
+                raise UploadError('Chunk too large', status=413, offset=offset)
+
+            part_path, _ = self._paths(upload_id)
+            hasher = state[1]
+            if hasher is None or state[2] != offset:
+                # First chunk seen by this process: catch up on what is already on disk
+                hasher = hashlib.sha256()
+                with open(part_path, 'rb') as f:
+                    for block in iter(lambda: f.read(READ_SIZE), b''):
+                        hasher.update(block)
+
+            written = offset
+            with open(part_path, 'ab') as f:
+                while True:
+                    block = stream.read(READ_SIZE)
+                    if not block:
+                        break
+                    if written + len(block) > session['size']:
+                        f.truncate(offset)
+                        state[1], state[2] = None, -1
+                        raise UploadError('Upload exceeds its declared size', status=413, offset=offset)
+                    f.write(block)
+                    hasher.update(block)
+                    written += len(block)
+            state[1], state[2] = hasher, written
+
+            if written < session['size']:
+                return {'upload_id': upload_id, 'offset': written, 'size': session['size'], 'complete': False}
+            info = self._finish(upload_id, session, hasher.hexdigest())
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        return info
+
+    def _finish(self, upload_id, session, content_hash):
+        part_path, session_path = self._paths(upload_id)
+        final_path = os.path.join(self.upload_dir, content_hash + _extension(session['filename']))
+        metadata_path = os.path.splitext(final_path)[0] + '.json'
+        if os.path.exists(final_path) and os.path.exists(metadata_path):
+            # Same content uploaded before: keep the existing file and its probe
+            os.remove(part_path)
+            with open(metadata_path, 'r') as f:
+                info = json.load(f)
+        else:
+            os.replace(part_path, final_path)
+            info = {
+                'content_hash': content_hash,
+                'filename': session['filename'],
+                'size': session['size'],
+                'metadata': probe_video(final_path),
+            }
+            tmp_path = metadata_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(info, f, indent=2)
+            os.replace(tmp_path, metadata_path)
+        os.remove(session_path)
+        print(f"[Upload] {session['filename']} stored as {os.path.basename(final_path)}: {info['metadata']}")
+        # `filename` is this upload's name even when the content was deduplicated
+        return dict(info, filename=session['filename'], upload_id=upload_id, path=final_path,
+                    stored_name=os.path.basename(final_path), complete=True)
+
+    def info(self, video_path):
+        # Stored metadata of a finished upload, or None for files that did not come through here
+        metadata_path = os.path.splitext(video_path)[0] + '.json'
+        if not os.path.exists(metadata_path):
+            return None
+        try:
+            with open(metadata_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def cleanup(self, max_age=PARTIAL_TTL_SECONDS):
+        # An upload counts as abandoned once neither its data nor its session changed for max_age
+        now = time.time()
+        last_touched = {}
+        for name in os.listdir(self.partial_dir):
+            try:
+                mtime = os.path.getmtime(os.path.join(self.partial_dir, name))
+            except OSError:
+                continue
+            upload_id = name.split('.')[0]
+            last_touched[upload_id] = max(last_touched.get(upload_id, 0), mtime)
+        for upload_id, mtime in last_touched.items():
+            if now - mtime <= max_age:
+                continue
+            for ext in ('.part', '.json'):
+                try:
+                    os.remove(os.path.join(self.partial_dir, upload_id + ext))
+                except OSError:
+                    pass
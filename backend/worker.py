@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from remote_workers import SYNC_ROOTS, list_files, map_path
+from scheduler import NEW_PROCESS_GROUP, kill_process_tree
+
+# Stage worker for the web app's REMOTE_POOLS mode (see remote_workers.py).
+# Start any number per host; each runs one leased command at a time.
+#
+#   python backend/worker.py --server http://127.0.0.1:5000 --shared --pools cpu,gpu
+#   python backend/worker.py --server http://10.0.0.5:5000 --pools gpu --work_dir /scratch/video2nerf
+#
+# --shared is for workers that see the server's dataset and upload directories
+# at the same paths (the same box, or a network filesystem): nothing is copied.
+# Otherwise the dataset and upload roots live under --work_dir, inputs are
+# downloaded when missing or changed, and outputs are uploaded after each run.
+# Code roots (python, instant_ngp, video2nerf) default to this host's
+# VENV_PYTHON_PATH / INSTANT_NGP_SCRIPTS or the server's paths; --root
+# name=path overrides any root.
+
+LEASE_WAIT = 20.0
+LOG_FLUSH_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 5.0
+RETRY_DELAY = 5.0
+CHUNK_SIZE = 1024 * 1024
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Client:
+    def __init__(self, server, token=None):
+        self.server = server.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+    def _open(self, method, path, data=None, headers=None, timeout=60):
+        request = urllib.request.Request(self.server + path, data=data, method=method, headers=dict(self.headers, **(headers or {})))
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def post(self, path, payload, timeout=60):
+        # (status, decoded JSON body or None)
+        try:
+            with self._open('POST', path, json.dumps(payload).encode(), {'Content-Type': 'application/json'}, timeout) as response:
+                body = response.read()
+                return response.status, json.loads(body) if body else None
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    def download(self, server_path, local_path, check=None):
+        # `check` is called between chunks: 'cancel' drops the partial file, an exception abandons it
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        partial_path = local_path + '.download'
+        with self._open('GET', '/workers/files?' + urllib.parse.urlencode({'path': server_path}), timeout=300) as response, \
+                open(partial_path, 'wb') as f:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                f.write(chunk)
+                if check is not None and check() == 'cancel':
+                    break
+        if check is not None and check() == 'cancel':
+            os.remove(partial_path)
+            return
+        os.replace(partial_path, local_path)
+
+    def upload(self, lease_id, server_path, local_path):
+        # Returns the server's record of the stored file
+        with open(local_path, 'rb') as f:
+            query = urllib.parse.urlencode({'path': server_path})
+            headers = {'Content-Type': 'application/octet-stream', 'Content-Length': str(os.path.getsize(local_path))}
+            try:
+                with self._open('PUT', f'/workers/leases/{lease_id}/files?{query}', f, headers, timeout=300) as response:
+                    return json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                if e.code in (403, 409):
+                    raise LeaseLost(f"upload of {server_path} refused ({e.code})")
+                raise
+
+
+class Worker:
+    def __init__(self, client, worker_id, pools, shared, work_dir, root_overrides):
+        self.client = client
+        self.worker_id = worker_id
+        self.pools = pools
+        self.shared = shared
+        self.work_dir = os.path.abspath(work_dir)
+        self.root_overrides = root_overrides
+
+    def local_roots(self, server_roots):
+        roots = dict(server_roots)
+        if os.getenv('VENV_PYTHON_PATH'):
+            roots['python'] = os.getenv('VENV_PYTHON_PATH')
+        if os.getenv('INSTANT_NGP_SCRIPTS'):
+            roots['instant_ngp'] = os.getenv('INSTANT_NGP_SCRIPTS')
+        roots['video2nerf'] = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        if not self.shared:
+            for name in SYNC_ROOTS:
+                roots[name] = os.path.join(self.work_dir, name)
+        roots.update(self.root_overrides)
+        return roots
+
+    def run_forever(self):
+        print(f"[Worker] {self.worker_id} serving pools {self.pools} from {self.client.server}", flush=True)
+        while True:
+            try:
+                status, lease = self.client.post('/workers/lease', {
+                    'worker_id': self.worker_id, 'pools': self.pools, 'wait': LEASE_WAIT,
+                    'info': {'host': socket.gethostname(), 'pid': os.getpid(), 'shared': self.shared},
+                }, timeout=LEASE_WAIT + 30)
+            except (urllib.error.URLError, OSError) as e:
+                print(f"[Worker] Server unreachable ({e}); retrying in {RETRY_DELAY:.0f}s", flush=True)
+                time.sleep(RETRY_DELAY)
+                continue
+            if status == 401:
+                sys.exit("[Worker] Server rejected the worker token")
+            if status != 200 or not lease:
+                continue
+            try:
+                self.run_lease(lease)
+            except LeaseLost as e:
+                print(f"[Worker] Lease {lease['lease_id']} lost: {e}", flush=True)
+            except (urllib.error.URLError, OSError) as e:
+                # The server will take the lease back once heartbeats stop
+                print(f"[Worker] Lease {lease['lease_id']} abandoned: {e}", flush=True)
+
+    def run_lease(self, lease):
+        lease_id = lease['lease_id']
+        server_roots = lease['roots']
+        roots = self.local_roots(server_roots)
+        to_local = lambda path: map_path(path, server_roots, roots)
+        to_server = lambda path: map_path(path, roots, server_roots)[0]
+        command = [to_local(arg)[0] for arg in lease['command']]
+        cwd = to_local(lease['cwd'])[0] if lease.get('cwd') else None
+        outputs = [to_local(path)[0] for path in lease['outputs']]
+        print(f"[Worker] Running {' '.join(command)}", flush=True)
+
+        # Keeps the lease alive through transfers as well as the run, however long a single file takes
+        beat = Heartbeat(self.client, lease_id, min(HEARTBEAT_INTERVAL, lease['lease_seconds'] / 3))
+        beat.start()
+        try:
+            if not self.shared:
+                for server_path, (size, mtime) in lease['inputs'].items():
+                    local_path, root = to_local(server_path)
+                    if root not in SYNC_ROOTS:
+                        continue
+                    if not os.path.exists(local_path) or os.path.getsize(local_path) != size or abs(os.path.getmtime(local_path) - mtime) > 1e-3:
+                        self.client.download(server_path, local_path, check=beat.check)
+                        if beat.check() == 'cancel':
+                            return self.cancelled(lease_id)
+                        os.utime(local_path, (mtime, mtime))
+            for path in outputs:
+                # Output directories exist on the server side; output files need their parent
+                os.makedirs(path if path.endswith(os.sep) or not os.path.splitext(path)[1] else os.path.dirname(path), exist_ok=True)
+            if cwd:
+                os.makedirs(cwd, exist_ok=True)
+            before = list_files(outputs)
+
+            returncode = self.run_command(beat, command, cwd)
+            if returncode is None:
+                return self.cancelled(lease_id)
+
+            deleted = []
+            if returncode == 0 and not self.shared:
+                after = list_files(outputs)
+                for local_path, stat in after.items():
+                    if local_path.endswith(('.download', '.partial')) or before.get(local_path) == stat:
+                        continue
+                    stored = self.client.upload(lease_id, to_server(local_path), local_path)
+                    os.utime(local_path, (stored['mtime'], stored['mtime']))
+                    if beat.check() == 'cancel':
+                        return self.cancelled(lease_id)
+                deleted = [to_server(path) for path in before if path not in after]
+        finally:
+            lines = beat.stop()
+        status, _ = self.client.post(f'/workers/leases/{lease_id}/complete', {'returncode': returncode, 'lines': lines, 'deleted': deleted})
+        if status != 200:
+            raise LeaseLost(f"completion refused ({status})")
+        print(f"[Worker] Lease {lease_id} finished with exit code {returncode}", flush=True)
+
+    def cancelled(self, lease_id):
+        print(f"[Worker] Lease {lease_id} cancelled by the server", flush=True)
+
+    def run_command(self, beat, command, cwd):
+        # Runs the command, handing its output to the heartbeat. Returns the exit
+        # code, or None if the lease was cancelled.
+        process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                                   **NEW_PROCESS_GROUP)
+
+        def read_output():
+            for line in iter(process.stdout.readline, ''):
+                beat.add(line.rstrip('\n'))
+
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
+        try:
+            while reader.is_alive():
+                reader.join(LOG_FLUSH_INTERVAL)
+                if beat.check() == 'cancel':
+                    kill_process_tree(process)
+                    return None
+        except BaseException:
+            kill_process_tree(process)
+            raise
+        process.wait()
+        return process.returncode
+
+
+class Heartbeat(threading.Thread):
+    # Heartbeats for one lease from lease to completion, every `interval` seconds
+    # or sooner (LOG_FLUSH_INTERVAL) when there are output lines to deliver. The
+    # lease's own thread polls check() to learn of a cancel or a lost lease.
+    def __init__(self, client, lease_id, interval=HEARTBEAT_INTERVAL):
+        super().__init__(name=f'heartbeat-{lease_id[:8]}', daemon=True)
+        self.client = client
+        self.lease_id = lease_id
+        self.interval = interval
+        self.action = 'ok'
+        self.error = None
+        self._lines = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def add(self, line):
+        with self._lock:
+            self._lines.append(line)
+
+    def check(self):
+        # 'ok' or 'cancel'; raises LeaseLost once the server no longer knows the lease
+        if self.error is not None:
+            raise self.error
+        return self.action
+
+    def stop(self):
+        # Stops heartbeating; returns the lines not delivered yet
+        self._stopped.set()
+        self.join()
+        with self._lock:
+            lines, self._lines = self._lines, []
+        return lines
+
+    def run(self):
+        last_beat = time.monotonic()
+        while not self._stopped.wait(LOG_FLUSH_INTERVAL):
+            with self._lock:
+                lines, self._lines = self._lines, []
+            if not lines and time.monotonic() - last_beat < self.interval:
+                continue
+            try:
+                status, body = self.client.post(f'/workers/leases/{self.lease_id}/heartbeat', {'lines': lines})
+            except (urllib.error.URLError, OSError) as e:
+                # Retried on the next round; the lease survives a few missed beats
+                print(f"[Worker] Heartbeat failed ({e})", flush=True)
+                with self._lock:
+                    self._lines[:0] = lines
+                continue
+            last_beat = time.monotonic()
+            if status != 200:
+                self.error = LeaseLost(f"heartbeat refused ({status})")
+                return
+            if body['action'] == 'cancel':
+                # The server has already released the lease; nothing more to send
+                self.action = 'cancel'
+                return
+
+def parse_roots(specs):
+    roots = {}
+    for spec in specs or []:
+        name, _, path = spec.partition('=')
+        if not name or not path:
+            raise SystemExit(f"--root expects name=path, got {spec!r}")
+        roots[name] = os.path.abspath(path)
+    return roots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline stages leased from the Video2NeRF server.")
+    parser.add_argument('--server', type=str, default=os.getenv('WORKER_SERVER', 'http://127.0.0.1:5000'), help='Base URL of the web app.')
+    parser.add_argument('--pools', type=str, default='cpu,gpu', help='Comma-separated scheduler pools to take work from.')
+    parser.add_argument('--shared', action='store_true', help='The dataset and upload directories are at the same paths as on the server.')
+    parser.add_argument('--work_dir', type=str, default=os.path.join(os.path.expanduser('~'), '.video2nerf_worker'),
+                        help='Local copy of the dataset and upload directories (without --shared).')
+    parser.add_argument('--root', action='append', help='Override a root mapping, as name=path (repeatable).')
+    parser.add_argument('--worker_id', type=str, default=None, help='Defaults to host:pid.')
+    parser.add_argument('--token', type=str, default=os.getenv('WORKER_TOKEN'), help="The server's WORKER_TOKEN, if it has one.")
+    args = parser.parse_args()
+
+    worker_id = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    pools = [pool for pool in args.pools.split(',') if pool]
+    worker = Worker(Client(args.server, args.token), worker_id, pools, args.shared, args.work_dir, parse_roots(args.root))
+    # Stop the running command along with the worker (SystemExit unwinds through run_command)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
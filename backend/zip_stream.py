@@ -0,0 +1,54 @@
+import zipfile
+
+# Zip archives generated straight into the HTTP response. ZipFile is handed a
+# write-only sink, so it writes every member with a trailing data descriptor
+# instead of seeking back to patch its header, and nothing is staged on disk;
+# memory use is one CHUNK_SIZE read at a time. Members are stored uncompressed
+# by default: snapshots, videos and meshes hardly compress, and storing keeps
+# the download at disk speed.
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Sink:
+    # Collects what ZipFile writes until the generator hands it out; no tell()
+    # or seek(), which is what makes ZipFile stream
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries, compression=zipfile.ZIP_STORED):
+    # Yields the archive in chunks. `entries` are (name in archive, file path)
+    # or (name in archive, bytes) pairs.
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=compression, allowZip64=True) as archive:
+        for arcname, source in entries:
+            if isinstance(source, bytes):
+                archive.writestr(arcname, source)
+            else:
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                info.compress_type = compression
+                with open(source, 'rb') as f, archive.open(info, 'w') as out:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        out.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import argparse
+import tempfile
+
+# Run the staged and one-shot COLMAP paths against the stub COLMAP binary,
+# check which commands (and matching strategy) were issued, and report how much
+# wall time the orchestration adds on top of the stub's own per-command delay.
+#
+#   python benchmarks/bench_colmap_stages.py --frames 200 --delay 0.05
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from colmap_runner import run_sequential_reconstruction, run_automatic_reconstruction
+
+STUB_COLMAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stubs', 'colmap')
+
+
+def read_log(log_path):
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def bench(name, runner, work_dir, delay):
+    log_path = os.path.join(work_dir, name + '.log')
+    os.environ['STUB_COLMAP_LOG'] = log_path
+    os.environ['STUB_COLMAP_DELAY'] = str(delay)
+    workspace = os.path.join(work_dir, name)
+    os.makedirs(workspace, exist_ok=True)
+
+    start = time.perf_counter()
+    timings = runner(workspace)
+    total = time.perf_counter() - start
+
+    invocations = read_log(log_path)
+    return {
+        'mode': name,
+        'commands': [entry['command'] for entry in invocations],
+        'matcher_options': {k: v for entry in invocations if entry['command'].endswith('_matcher') for k, v in entry['options'].items()},
+        'stage_seconds': {k: round(v, 4) for k, v in timings.items()},
+        'total_seconds': round(total, 4),
+        'overhead_seconds': round(total - delay * len(invocations), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark COLMAP orchestration with a stub binary.")
+    parser.add_argument('--frames', type=int, default=200, help='Number of placeholder frames.')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds the stub sleeps per command.')
+    parser.add_argument('--overlap', type=int, default=10, help='Sequential matching overlap.')
+    args = parser.parse_args()
+
+    os.chmod(STUB_COLMAP, os.stat(STUB_COLMAP).st_mode | stat.S_IXUSR)
+    work_dir = tempfile.mkdtemp(prefix='bench_colmap_')
+    try:
+        frames_dir = os.path.join(work_dir, 'frames')
+        os.makedirs(frames_dir)
+        for i in range(args.frames):
+            open(os.path.join(frames_dir, f"frame_{i + 1:04d}.jpg"), 'wb').close()
+
+        results = [
+            bench('sequential', lambda ws: run_sequential_reconstruction(STUB_COLMAP, frames_dir, ws, overlap=args.overlap), work_dir, args.delay),
+            bench('automatic', lambda ws: run_automatic_reconstruction(STUB_COLMAP, frames_dir, ws), work_dir, args.delay),
+        ]
+        assert results[0]['commands'] == ['feature_extractor', 'sequential_matcher', 'mapper'], results[0]['commands']
+        assert results[0]['matcher_options']['SequentialMatching.overlap'] == str(args.overlap)
+        assert results[1]['commands'] == ['automatic_reconstructor'], results[1]['commands']
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
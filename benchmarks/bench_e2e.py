@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import urllib.request
+
+import cv2
+import numpy as np
+
+# End-to-end benchmark of the web pipeline with the heavy tools replaced by the
+# stubs in benchmarks/stubs (COLMAP, instant-ngp run.py, ffmpeg). A server
+# process runs backend/app.py unchanged; client threads drive the full flow
+#
+#   /upload_video -> /process_video -> /progress (SSE) -> /video_result -> /export_model
+#
+# for synthetic videos, at several levels of concurrency. Since the stubs only
+# sleep for known amounts of time, whatever a stage takes beyond that is
+# orchestration overhead (process start-up, log handling, store writes, our own
+# Python work such as keyframe selection and the COLMAP model conversion).
+#
+#   python benchmarks/bench_e2e.py --concurrency 1,2,4 --output baseline.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+BACKEND_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'backend'))
+
+
+def serve(port):
+    # Runs in the server child process; the environment was set up by main()
+    import logging
+    from werkzeug.serving import make_server
+    sys.path.insert(0, BACKEND_DIR)
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def make_video(path, seconds, fps, width, height, seed):
+    # Pan across a random texture, so keyframe selection sees motion and detail
+    rng = np.random.default_rng(seed)
+    texture = cv2.GaussianBlur((rng.random((height * 2, width * 2, 3)) * 255).astype(np.uint8), (5, 5), 0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    frames = int(seconds * fps)
+    for i in range(frames):
+        x = int(i * width / frames)
+        y = int(i * height / frames / 2)
+        writer.write(texture[y:y + height, x:x + width].copy())
+    writer.release()
+
+
+def request(port, method, path, body=None, headers=None, timeout=300):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, response.getheader('Content-Type', ''), data
+
+
+def upload(port, video_path, filename):
+    boundary = uuid.uuid4().hex
+    with open(video_path, 'rb') as f:
+        content = f.read()
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="video"; filename="{filename}"\r\n'
+            f'Content-Type: video/mp4\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    start = time.time()
+    status, _, data = request(port, 'POST', '/upload_video', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    elapsed = time.time() - start
+    if status != 200:
+        raise RuntimeError(f"upload failed ({status}): {data[:200]}")
+    return json.loads(data), len(content), elapsed
+
+
+def follow_progress(port, task_id, submitted):
+    # Returns (seconds to the first event, seconds until the stream ended, final status, events received)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    conn.request('GET', f'/progress/{task_id}')
+    response = conn.getresponse()
+    first_event = None
+    events = 0
+    status = None
+    for raw in response:
+        line = raw.decode().rstrip('\n')
+        if not line.startswith('data: '):
+            continue
+        if first_event is None:
+            first_event = time.time() - submitted
+        payload = json.loads(line[len('data: '):])
+        events += 1
+        status = payload['status']
+        if payload['line'] == 'Processing finished.':
+            break
+    conn.close()
+    return first_event, time.time() - submitted, status, events
+
+
+def export_mesh(port, task_id, format):
+    start = time.time()
+    status, _, data = request(port, 'GET', f'/export_model/{task_id}/{format}')
+    if status == 202:
+        info = json.loads(data)
+        while True:
+            time.sleep(0.1)
+            _, _, data = request(port, 'GET', info['status_url'])
+            state = json.loads(data)['state']
+            if state == 'ready':
+                break
+            if state in ('failed', 'unknown'):
+                raise RuntimeError(f"mesh export failed: {data[:200]}")
+        status, _, data = request(port, 'GET', info['download_url'])
+    if status != 200:
+        raise RuntimeError(f"mesh download failed ({status})")
+    return time.time() - start, len(data)
+
+
+def run_job(port, video_path, filename, results, index):
+    result = {'filename': filename}
+    try:
+        info, size, upload_seconds = upload(port, video_path, filename)
+        result['upload_bytes'] = size
+        result['upload_seconds'] = upload_seconds
+
+        submitted = time.time()
+        status, _, data = request(port, 'POST', '/process_video', json.dumps({'filename': info['filename'], 'quality': 'low'}),
+                                  {'Content-Type': 'application/json'})
+        if status != 200:
+            raise RuntimeError(f"process_video failed ({status}): {data[:200]}")
+        task_id = json.loads(data)['task_id']
+        result['task_id'] = task_id
+
+        first_event, finished, final_status, events = follow_progress(port, task_id, submitted)
+        result.update(first_event_seconds=first_event, pipeline_seconds=finished, status=final_status, events=events)
+
+        start = time.time()
+        status, _, data = request(port, 'GET', f'/video_result/{task_id}')
+        result['video_result_seconds'] = time.time() - start
+        result['video_bytes'] = len(data) if status == 200 else 0
+
+        result['export_seconds'], result['mesh_bytes'] = export_mesh(port, task_id, 'obj')
+        result['export_cached_seconds'], _ = export_mesh(port, task_id, 'obj')
+
+        _, _, data = request(port, 'GET', f'/timings/{task_id}')
+        timings = json.loads(data)
+        result['stage_timings'] = timings['stage_timings']
+        result['step_timings'] = timings['step_timings']
+    except Exception as e:
+        result['error'] = str(e)
+    results[index] = result
+
+
+def percentile(values, q):
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))] if values else None
+
+
+def summarize(results, wall, stub_seconds):
+    ok = [r for r in results if 'error' not in r and r.get('status') == 'completed']
+    rounded = lambda value: None if value is None else round(value, 3)
+    summary = {
+        'jobs': len(results),
+        'completed': len(ok),
+        'errors': [r['error'] for r in results if 'error' in r] + [f"{r['task_id']}: {r['status']}" for r in results if 'error' not in r and r.get('status') != 'completed'],
+        'wall_seconds': round(wall, 2),
+        'jobs_per_minute': round(60 * len(ok) / wall, 2) if wall > 0 else None,
+        'upload_mb_per_s': rounded(sum(r['upload_bytes'] for r in ok) / 1e6 / max(1e-9, sum(r['upload_seconds'] for r in ok))) if ok else None,
+        'first_progress_event_seconds': {'p50': rounded(percentile([r['first_event_seconds'] for r in ok], 50)),
+                                         'max': rounded(max((r['first_event_seconds'] for r in ok), default=None))},
+        'pipeline_seconds': {'p50': rounded(percentile([r['pipeline_seconds'] for r in ok], 50)),
+                             'max': rounded(max((r['pipeline_seconds'] for r in ok), default=None))},
+        'export_seconds': {'first': rounded(percentile([r['export_seconds'] for r in ok], 50)),
+                           'cached': rounded(percentile([r['export_cached_seconds'] for r in ok], 50))},
+        'stages': {},
+    }
+    # Overhead = measured stage time minus what the stubs spend sleeping
+    for stage in sorted({name for r in ok for name in r['stage_timings']}):
+        times = [r['stage_timings'][stage] for r in ok if stage in r['stage_timings']]
+        mean = sum(times) / len(times)
+        summary['stages'][stage] = {
+            'mean_seconds': round(mean, 3),
+            'stub_seconds': stub_seconds.get(stage, 0.0),
+            'overhead_seconds': round(mean - stub_seconds.get(stage, 0.0), 3),
+        }
+    steps = sorted({name for r in ok for name in r['step_timings']})
+    summary['video2nerf_steps'] = {step: round(sum(r['step_timings'].get(step, 0) for r in ok) / len(ok), 3) for step in steps} if ok else {}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against stub executables.")
+    parser.add_argument('--concurrency', type=str, default='1,2,4', help='Comma-separated numbers of jobs submitted at once.')
+    parser.add_argument('--video_seconds', type=float, default=4.0)
+    parser.add_argument('--video_size', type=str, default='640x360')
+    parser.add_argument('--colmap_delay', type=float, default=0.2, help='Stub seconds per COLMAP command.')
+    parser.add_argument('--train_seconds', type=float, default=1.0)
+    parser.add_argument('--render_seconds', type=float, default=0.5)
+    parser.add_argument('--mesh_seconds', type=float, default=0.3)
+    parser.add_argument('--log_rate', type=float, default=50.0, help='Stub instant-ngp PROGRESS lines per second.')
+    parser.add_argument('--cpu_workers', type=int, default=2)
+    parser.add_argument('--gpu_workers', type=int, default=1)
+    parser.add_argument('--render_devices', type=int, default=1, help='Simulated GPUs the render is split across.')
+    parser.add_argument('--port', type=int, default=5079)
+    parser.add_argument('--output', type=str, default=None, help='Also write the JSON baseline to this file.')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory.')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    width, height = (int(v) for v in args.video_size.split('x'))
+    work_dir = tempfile.mkdtemp(prefix='bench_e2e_')
+    env = dict(
+        os.environ,
+        PATH=STUBS_DIR + os.pathsep + os.environ.get('PATH', ''),
+        COLMAP_PATH=os.path.join(STUBS_DIR, 'colmap'),
+        INSTANT_NGP_SCRIPTS=STUBS_DIR,
+        VENV_PYTHON_PATH=sys.executable,
+        UPLOAD_FOLDER=os.path.join(work_dir, 'uploads'),
+        DATASET_DIR=os.path.join(work_dir, 'dataset'),
+        TASK_STORE=os.path.join(work_dir, 'tasks.db'),
+        SCHEDULER_CPU_WORKERS=str(args.cpu_workers),
+        SCHEDULER_GPU_WORKERS=str(args.gpu_workers),
+        RENDER_DEVICES=','.join(str(i) for i in range(args.render_devices)),
+        STUB_COLMAP_DELAY=str(args.colmap_delay),
+        STUB_COLMAP_IMAGE_SIZE=args.video_size,
+        STUB_NGP_TRAIN_SECONDS=str(args.train_seconds),
+        STUB_NGP_RENDER_SECONDS=str(args.render_seconds),
+        STUB_NGP_MESH_SECONDS=str(args.mesh_seconds),
+        STUB_NGP_LOG_RATE=str(args.log_rate),
+    )
+    # The sequential SfM path issues three COLMAP commands
+    stub_seconds = {'video2nerf': round(3 * args.colmap_delay, 3), 'train': args.train_seconds, 'render': args.render_seconds, 'camera_path': 0.0}
+
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args.port)], env=env,
+                              stdout=subprocess.DEVNULL if not args.keep else None)
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{args.port}/metrics', timeout=2).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        report = {'settings': {k: v for k, v in vars(args).items() if k not in ('serve', 'output', 'keep')}, 'levels': {}}
+        seed = 0
+        for level in levels:
+            videos = []
+            for _ in range(level):
+                # A different video per job, so the result cache never short-circuits a run
+                path = os.path.join(work_dir, f'synthetic_{seed}.mp4')
+                make_video(path, args.video_seconds, 30, width, height, seed)
+                videos.append((path, f'synthetic_{seed}.mp4'))
+                seed += 1
+
+            results = [None] * level
+            threads = [threading.Thread(target=run_job, args=(args.port, path, name, results, i)) for i, (path, name) in enumerate(videos)]
+            start = time.time()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            report['levels'][str(level)] = summarize(results, time.time() - start, stub_seconds)
+
+        # Resubmitting an already processed video is answered from the result cache
+        path, name = os.path.join(work_dir, 'synthetic_0.mp4'), 'synthetic_0.mp4'
+        info, _, _ = upload(args.port, path, name)
+        start = time.time()
+        _, _, data = request(args.port, 'POST', '/process_video', json.dumps({'filename': info['filename'], 'quality': 'low'}), {'Content-Type': 'application/json'})
+        report['cache_hit_seconds'] = round(time.time() - start, 4)
+        report['cache_hit'] = json.loads(data).get('cached', False)
+
+        output = json.dumps(report, indent=2)
+        print(output)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + '\n')
+    finally:
+        server.terminate()
+        server.wait()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+
+# Compare the old extraction command (ffmpeg -q:v 2 at source resolution)
+# against frame_extractor.py on synthetic 1080p and 4K clips: extraction wall
+# time, frames and bytes written, and the time to decode every written frame
+# once, which COLMAP and instant-ngp each pay again.
+#
+#   python benchmarks/bench_frame_extraction.py --seconds 10 --fps 4 --sizes 1920x1080,3840x2160
+#
+# The ffmpeg baseline needs a real ffmpeg on PATH (the stub in benchmarks/stubs
+# is skipped); everything else only needs OpenCV.
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from frame_extractor import FRAME_FORMATS, extract_frames
+
+STUBS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'stubs'))
+
+
+def make_video(path, seconds, fps, width, height, seed=0):
+    # A detailed texture panned across the frame, so encoders have real work to do
+    rng = np.random.default_rng(seed)
+    texture = cv2.resize(rng.integers(0, 255, (height // 4, width // 2, 3), dtype=np.uint8), (width * 2, height), interpolation=cv2.INTER_LINEAR)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    n_frames = int(seconds * fps)
+    for i in range(n_frames):
+        offset = int(i * (width - 1) / max(1, n_frames - 1))
+        writer.write(np.ascontiguousarray(texture[:, offset:offset + width]))
+    writer.release()
+
+
+def real_ffmpeg():
+    path = shutil.which('ffmpeg')
+    if path and os.path.dirname(os.path.abspath(path)) != STUBS_DIR:
+        return path
+    return None
+
+
+def extract_ffmpeg(ffmpeg, video_path, frames_dir, fps):
+    # The command video2nerf.py used to run, with a portable output path
+    os.makedirs(frames_dir, exist_ok=True)
+    subprocess.run([ffmpeg, '-loglevel', 'error', '-i', video_path, '-q:v', '2', '-vf', f'fps={fps}',
+                    os.path.join(frames_dir, 'frame_%04d.jpg')], check=True)
+
+
+def measure(name, extract, frames_dir):
+    start = time.perf_counter()
+    extract()
+    extract_seconds = time.perf_counter() - start
+    files = sorted(os.listdir(frames_dir))
+    start = time.perf_counter()
+    for frame_file in files:
+        cv2.imread(os.path.join(frames_dir, frame_file))
+    read_seconds = time.perf_counter() - start
+    total_bytes = sum(os.path.getsize(os.path.join(frames_dir, f)) for f in files)
+    shape = cv2.imread(os.path.join(frames_dir, files[0])).shape if files else (0, 0)
+    return {
+        'mode': name,
+        'frames': len(files),
+        'size': f"{shape[1]}x{shape[0]}",
+        'bytes': total_bytes,
+        'bytes_per_frame': total_bytes // max(1, len(files)),
+        'extract_seconds': round(extract_seconds, 3),
+        'read_seconds': round(read_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame extraction against the ffmpeg command it replaced.")
+    parser.add_argument('--seconds', type=float, default=10.0, help='Length of the synthetic clips.')
+    parser.add_argument('--fps', type=float, default=4.0, help='Extraction rate.')
+    parser.add_argument('--sizes', type=str, default='1920x1080,3840x2160', help='Comma-separated source resolutions.')
+    parser.add_argument('--frame_width', type=int, default=1280, help='Downscale width for the downscaled runs.')
+    parser.add_argument('--workers', type=int, default=0, help='Encoder threads (0 = all cores).')
+    parser.add_argument('--output', type=str, default=None, help='Also write the report to this JSON file.')
+    args = parser.parse_args()
+
+    ffmpeg = real_ffmpeg()
+    work_dir = tempfile.mkdtemp(prefix='bench_frames_')
+    report = {'settings': vars(args), 'ffmpeg': ffmpeg, 'cpu_count': os.cpu_count(), 'results': {}}
+    try:
+        for size in args.sizes.split(','):
+            width, height = (int(v) for v in size.split('x'))
+            video_path = os.path.join(work_dir, f'{size}.mp4')
+            make_video(video_path, args.seconds, 30, width, height)
+            runs = []
+            if ffmpeg:
+                out = os.path.join(work_dir, size, 'ffmpeg')
+                runs.append(measure('ffmpeg_q2', lambda: extract_ffmpeg(ffmpeg, video_path, out, args.fps), out))
+            out = os.path.join(work_dir, size, 'single')
+            runs.append(measure('jpg_1_worker', lambda: extract_frames(video_path, out, fps=args.fps, workers=1), out))
+            for image_format in sorted(FRAME_FORMATS):
+                out = os.path.join(work_dir, size, image_format)
+                runs.append(measure(image_format, lambda: extract_frames(video_path, out, fps=args.fps, image_format=image_format,
+                                                                         workers=args.workers), out))
+            if args.frame_width and args.frame_width < width:
+                out = os.path.join(work_dir, size, 'jpg_scaled')
+                runs.append(measure(f'jpg_{args.frame_width}w', lambda: extract_frames(video_path, out, fps=args.fps, frame_width=args.frame_width,
+                                                                                      workers=args.workers), out))
+            report['results'][size] = runs
+            shutil.rmtree(os.path.join(work_dir, size), ignore_errors=True)
+            os.remove(video_path)
+        print(json.dumps(report, indent=2))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
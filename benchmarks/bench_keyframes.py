@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+
+# Compare the fixed-fps extraction path against keyframe selection on a
+# synthetic clip: number of frames and bytes handed to COLMAP, extraction wall
+# time and, when COLMAP_PATH is set, COLMAP reconstruction wall time.
+#
+#   python benchmarks/bench_keyframes.py --seconds 20 --fps 4 --target_frames 40
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from keyframes import extract_keyframes
+
+
+def make_synthetic_video(path, seconds, fps=30, width=1280, height=720, seed=0):
+    # A textured plane panned by a camera that dwells, moves, and shakes, with
+    # some frames blurred to mimic motion blur
+    rng = np.random.default_rng(seed)
+    texture = cv2.resize(rng.integers(0, 255, (height // 8, width // 4, 3), dtype=np.uint8), (width * 2, height), interpolation=cv2.INTER_NEAREST)
+    texture = cv2.GaussianBlur(texture, (3, 3), 0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    n_frames = seconds * fps
+    # Camera speed: stationary for the first and last quarter, panning in between
+    speed = np.where((np.arange(n_frames) > n_frames // 4) & (np.arange(n_frames) < 3 * n_frames // 4), 1.0, 0.05)
+    offsets = np.cumsum(speed)
+    offsets = (offsets / offsets[-1] * (width - 1)).astype(int)
+    for i in range(n_frames):
+        frame = np.ascontiguousarray(texture[:, offsets[i]:offsets[i] + width])
+        if rng.random() < 0.2:
+            frame = cv2.blur(frame, (15, 1))
+        writer.write(frame)
+    writer.release()
+
+
+def extract_fixed_fps(video_path, frames_dir, fps):
+    os.makedirs(frames_dir, exist_ok=True)
+    if shutil.which('ffmpeg'):
+        subprocess.run(['ffmpeg', '-loglevel', 'error', '-i', video_path, '-q:v', '2', '-vf', f'fps={fps}', os.path.join(frames_dir, 'frame_%04d.jpg')], check=True)
+        return sorted(os.listdir(frames_dir))
+    # No ffmpeg available: emulate the fps filter with OpenCV
+    cap = cv2.VideoCapture(video_path)
+    step = max(1, int(round((cap.get(cv2.CAP_PROP_FPS) or 30.0) / fps)))
+    idx, written = 0, []
+    while cap.grab():
+        if idx % step == 0:
+            _, frame = cap.retrieve()
+            name = f"frame_{len(written) + 1:04d}.jpg"
+            cv2.imwrite(os.path.join(frames_dir, name), frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            written.append(name)
+        idx += 1
+    cap.release()
+    return written
+
+
+def run_colmap(frames_dir, workspace):
+    colmap_path = os.getenv("COLMAP_PATH")
+    if not colmap_path:
+        return None
+    os.makedirs(workspace, exist_ok=True)
+    start = time.perf_counter()
+    subprocess.run([colmap_path, 'automatic_reconstructor', '--workspace_path', workspace, '--image_path', frames_dir, '--quality', 'low'], check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def measure(name, extract, frames_dir, work_dir):
+    start = time.perf_counter()
+    extract()
+    extract_seconds = time.perf_counter() - start
+    files = os.listdir(frames_dir)
+    return {
+        'mode': name,
+        'frames': len(files),
+        'bytes': sum(os.path.getsize(os.path.join(frames_dir, f)) for f in files),
+        'extract_seconds': round(extract_seconds, 3),
+        'colmap_seconds': run_colmap(frames_dir, os.path.join(work_dir, name + '_colmap')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyframe selection against fixed-fps extraction.")
+    parser.add_argument('--video_path', type=str, default=None, help='Video to use; a synthetic clip is generated if omitted.')
+    parser.add_argument('--seconds', type=int, default=20, help='Length of the synthetic clip.')
+    parser.add_argument('--fps', type=int, default=4, help='Fixed-fps extraction rate (keyframe candidates use 3x this).')
+    parser.add_argument('--target_frames', type=int, default=40, help='Keyframe target count.')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_keyframes_')
+    try:
+        video_path = args.video_path
+        if video_path is None:
+            video_path = os.path.join(work_dir, 'synthetic.mp4')
+            make_synthetic_video(video_path, args.seconds)
+
+        fixed_dir = os.path.join(work_dir, 'fixed')
+        key_dir = os.path.join(work_dir, 'keyframes')
+        results = [
+            measure('fixed_fps', lambda: extract_fixed_fps(video_path, fixed_dir, args.fps), fixed_dir, work_dir),
+            measure('keyframes', lambda: extract_keyframes(video_path, key_dir, args.target_frames, args.fps * 3), key_dir, work_dir),
+        ]
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
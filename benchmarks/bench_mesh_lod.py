@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+# File size and time-to-first-render of mesh exports per level of detail and
+# format, on a synthetic marching-cubes-like mesh (a bumpy coloured sphere).
+#
+#   python benchmarks/bench_mesh_lod.py --faces 1000000 --bandwidth_mbps 50
+#
+# Time to first render is approximated as download time at --bandwidth_mbps
+# plus the time to parse the file into GPU-ready vertex and index arrays
+# (PLY/OBJ with the readers in mesh_lod.py, GLB by viewing its accessors in
+# place, as a glTF loader does). The baseline is the unprocessed marching
+# cubes mesh, which is what /export_model used to serve.
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+from mesh_lod import GLB_BIN_CHUNK, LOD_TRIANGLES, WRITERS, build_lod, read_mesh, write_ply
+
+GLB_COMPONENTS = {5121: 'u1', 5122: 'i2', 5123: 'u2', 5125: 'u4', 5126: 'f4', 5120: 'i1'}
+GLB_WIDTHS = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4}
+
+
+def make_mesh(faces):
+    # UV sphere with about `faces` triangles and a noisy radius
+    rings = max(4, int(np.sqrt(faces / 4)))
+    segments = 2 * rings
+    theta = np.linspace(0, np.pi, rings + 1)[:, None]
+    phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)[None, :]
+    rng = np.random.default_rng(0)
+    radius = 1 + 0.05 * np.sin(8 * theta) * np.cos(6 * phi) + 0.002 * rng.standard_normal((rings + 1, segments))
+    vertices = np.stack([radius * np.sin(theta) * np.cos(phi), radius * np.cos(theta),
+                         radius * np.sin(theta) * np.sin(phi)], axis=-1).reshape(-1, 3).astype(np.float32)
+    colors = np.clip((vertices * 0.5 + 0.5) * 255, 0, 255).astype(np.uint8)
+    i, j = np.meshgrid(np.arange(rings), np.arange(segments), indexing='ij')
+    a = i * segments + j
+    b = i * segments + (j + 1) % segments
+    c, d = a + segments, b + segments
+    faces = np.concatenate([np.stack([a, b, c], -1).reshape(-1, 3), np.stack([b, d, c], -1).reshape(-1, 3)]).astype(np.int64)
+    # The pole rows collapse to single points; leave those degenerate triangles for welding to remove
+    return vertices, faces, colors
+
+
+def parse_glb(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    json_length = int.from_bytes(data[12:16], 'little')
+    gltf = json.loads(data[20:20 + json_length])
+    bin_header = 20 + json_length
+    assert int.from_bytes(data[bin_header + 4:bin_header + 8], 'little') == GLB_BIN_CHUNK
+    body = memoryview(data)[bin_header + 8:]
+    arrays = []
+    for accessor in gltf['accessors']:
+        view = gltf['bufferViews'][accessor['bufferView']]
+        dtype = np.dtype(GLB_COMPONENTS[accessor['componentType']])
+        width = GLB_WIDTHS[accessor['type']]
+        stride = view.get('byteStride', dtype.itemsize * width)
+        arrays.append(np.ndarray((accessor['count'], width), dtype, body, view.get('byteOffset', 0) + accessor.get('byteOffset', 0),
+                                 (stride, dtype.itemsize)))
+    return arrays
+
+
+def parse(path, format):
+    if format == 'glb':
+        return parse_glb(path)
+    return read_mesh(path)
+
+
+def measure(path, format, bandwidth_mbps, repeats):
+    size = os.path.getsize(path)
+    parse_seconds = min(_timed(lambda: parse(path, format)) for _ in range(repeats))
+    transfer_seconds = size * 8 / (bandwidth_mbps * 1e6)
+    return {
+        'bytes': size,
+        'parse_seconds': round(parse_seconds, 4),
+        'transfer_seconds': round(transfer_seconds, 3),
+        'first_render_seconds': round(transfer_seconds + parse_seconds, 3),
+    }
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mesh export size and time-to-first-render per level of detail.")
+    parser.add_argument('--faces', type=int, default=1000000, help='Triangles in the synthetic marching cubes mesh.')
+    parser.add_argument('--formats', type=str, default='ply,obj,glb', help='Comma-separated export formats.')
+    parser.add_argument('--bandwidth_mbps', type=float, default=50.0, help='Download bandwidth for the transfer estimate.')
+    parser.add_argument('--repeats', type=int, default=3, help='Parse repeats (the fastest is reported).')
+    parser.add_argument('--output', type=str, default=None, help='Also write the report to this JSON file.')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_mesh_')
+    report = {'settings': vars(args), 'results': []}
+    try:
+        vertices, faces, colors = make_mesh(args.faces)
+        raw_path = os.path.join(work_dir, 'raw.ply')
+        write_ply(raw_path, vertices, faces, colors)
+        report['input'] = {'vertices': len(vertices), 'faces': len(faces)}
+        for format in args.formats.split(','):
+            if format not in WRITERS:
+                raise SystemExit(f"Unknown format: {format}")
+            if format != 'glb':
+                # Baseline: the unprocessed marching cubes mesh in this format
+                baseline_path = os.path.join(work_dir, f'baseline.{format}')
+                if format == 'ply':
+                    shutil.copy(raw_path, baseline_path)
+                else:
+                    WRITERS[format](baseline_path, vertices, faces, colors)
+                report['results'].append(dict(format=format, lod='baseline', faces=len(faces), build_seconds=0.0,
+                                              **measure(baseline_path, format, args.bandwidth_mbps, args.repeats)))
+            for lod, target in enumerate(LOD_TRIANGLES):
+                if target is not None and target >= len(faces):
+                    continue
+                path = os.path.join(work_dir, f'lod{lod}.{format}')
+                stats = build_lod(raw_path, path, format, target)
+                report['results'].append(dict(format=format, lod=lod, faces=stats['faces'], build_seconds=stats['seconds'],
+                                              **measure(path, format, args.bandwidth_mbps, args.repeats)))
+                print(f"{format} lod{lod}: {report['results'][-1]}", file=sys.stderr)
+        print(json.dumps(report, indent=2))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import urllib.request
+
+# Measure /progress event latency and server CPU with many concurrent SSE
+# clients. A server process runs the same task store + event bus + SSE
+# generator as backend/app.py; N client threads subscribe to one task, the
+# server publishes timestamped events, and every client records how long each
+# event took to arrive.
+#
+#   python benchmarks/bench_sse.py --clients 300 --events 500 --rate 200
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, BACKEND_DIR)
+
+TASK_ID = 'bench-task'
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def serve(port, store_spec):
+    import logging
+    from flask import Flask, Response, request, jsonify
+    from werkzeug.serving import make_server
+    from task_store import open_task_store, process_owner
+    from event_bus import EventBus, sse_stream
+
+    app = Flask(__name__)
+    task_store = open_task_store(store_spec)
+    event_bus = EventBus()
+    task_store.create(TASK_ID, 'training_in_progress', owner=process_owner())
+
+    def emit(line, progress, status, coalesce):
+        entry = task_store.append_log(TASK_ID, line, progress=progress, status=status)
+        event_bus.publish(TASK_ID, entry, coalesce=coalesce)
+
+    def publish(events, rate, progress_fraction):
+        interval = 1.0 / rate
+        for i in range(events):
+            # A share of the events are PROGRESS lines, which the bus coalesces
+            is_progress = (i % 100) < progress_fraction * 100
+            line = json.dumps({'sent': time.time(), 'i': i}) + (' PROGRESS' if is_progress else '')
+            emit(line, int(100 * i / events), 'training_in_progress', is_progress)
+            time.sleep(interval)
+        emit(json.dumps({'sent': time.time(), 'i': events}), 100, 'completed', False)
+
+    @app.route('/progress/<task_id>')
+    def progress(task_id):
+        last_event_id = int(request.headers.get('Last-Event-ID', '-1'))
+        return Response(sse_stream(task_store, event_bus, task_id, last_event_id, TERMINAL_STATUSES, True), mimetype='text/event-stream')
+
+    @app.route('/stats')
+    def stats():
+        return jsonify({'cpu_seconds': time.process_time(), 'subscribers': event_bus.subscriber_count()})
+
+    @app.route('/publish', methods=['POST'])
+    def start_publish():
+        args = request.get_json()
+        threading.Thread(target=publish, args=(args['events'], args['rate'], args['progress_fraction']), daemon=True).start()
+        return jsonify({'ok': True})
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def get_json(port, path, payload=None):
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def client(port, results, index):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    conn.request('GET', f'/progress/{TASK_ID}')
+    response = conn.getresponse()
+    latencies = []
+    for raw in response:
+        line = raw.decode().rstrip('\n')
+        if not line.startswith('data: '):
+            continue
+        payload = json.loads(line[len('data: '):])
+        if payload['line'] == 'Processing finished.':
+            break
+        sent = json.loads(payload['line'].replace(' PROGRESS', ''))['sent']
+        latencies.append(time.time() - sent)
+    conn.close()
+    results[index] = latencies
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))] if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SSE progress delivery.")
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=100.0, help='Events per second published.')
+    parser.add_argument('--progress_fraction', type=float, default=0.8, help='Share of events that are coalescable PROGRESS lines.')
+    parser.add_argument('--store', type=str, default='sqlite', choices=['sqlite', 'memory'])
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--store_spec', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.store_spec)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='bench_sse_')
+    store_spec = 'memory' if args.store == 'memory' else os.path.join(work_dir, 'tasks.db')
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args.port), '--store_spec', store_spec])
+    try:
+        for _ in range(100):
+            try:
+                get_json(args.port, '/stats')
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        results = [None] * args.clients
+        threads = [threading.Thread(target=client, args=(args.port, results, i), daemon=True) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        while get_json(args.port, '/stats')['subscribers'] < args.clients:
+            time.sleep(0.1)
+
+        cpu_before = get_json(args.port, '/stats')['cpu_seconds']
+        start = time.time()
+        get_json(args.port, '/publish', {'events': args.events, 'rate': args.rate, 'progress_fraction': args.progress_fraction})
+        for thread in threads:
+            thread.join()
+        wall = time.time() - start
+        cpu_after = get_json(args.port, '/stats')['cpu_seconds']
+
+        latencies = [value for result in results if result for value in result]
+        received = [len(result or []) for result in results]
+        print(json.dumps({
+            'clients': args.clients,
+            'events_published': args.events + 1,
+            'events_received_per_client': {'min': min(received), 'max': max(received)},
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p95': round(percentile(latencies, 95) * 1000, 2),
+                'max': round(max(latencies) * 1000, 2),
+            },
+            'wall_seconds': round(wall, 2),
+            'server_cpu_seconds': round(cpu_after - cpu_before, 2),
+            'store': args.store,
+        }, indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
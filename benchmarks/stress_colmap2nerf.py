@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+
+# Runs many colmap2nerf.py conversions at once, each on its own synthetic text
+# model, and checks that every transforms.json describes its own input: the
+# same image names (which are unique per job), frame count and image width.
+#
+#   python benchmarks/stress_colmap2nerf.py --jobs 64 --concurrency 16
+#   python benchmarks/stress_colmap2nerf.py --mode rewrite    # the old approach, for comparison
+#
+# --mode isolated converts through colmap2nerf_runner.py as video2nerf.py does.
+# --mode rewrite reproduces the previous video2nerf.py step: rewrite
+# TEXT_FOLDER in the shared script, then run it (on a copy of --script, the
+# original is left alone). By default --script is the stub in benchmarks/stubs,
+# which like our copy of the real script reads TEXT_FOLDER and ignores --text;
+# point it at instant-ngp's scripts/colmap2nerf.py to stress the real one.
+# Exits with status 1 if any conversion failed or converted the wrong model.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '..')))
+from colmap2nerf_runner import run_colmap2nerf
+
+# The line the old video2nerf.py step expected to find in colmap2nerf.py
+ORIGINAL_TEXT_FOLDER = r'TEXT_FOLDER = r"D:\VScode\Code\simpleNeRF\dataset\my_video\output\colmap_text"'
+
+
+def make_job(job_dir, job, num_images):
+    # A text model of `num_images` cameras on a circle whose radius depends on the job
+    text_dir = os.path.join(job_dir, 'colmap_text')
+    images_dir = os.path.join(job_dir, 'images')
+    os.makedirs(text_dir)
+    os.makedirs(images_dir)
+    width, height = 64 + job, 48
+    with open(os.path.join(text_dir, 'cameras.txt'), 'w') as f:
+        f.write(f"1 PINHOLE {width} {height} {0.8 * width} {0.8 * width} {width / 2} {height / 2}\n")
+    rng = np.random.default_rng(job)
+    names = []
+    with open(os.path.join(text_dir, 'images.txt'), 'w') as f:
+        for i in range(num_images):
+            name = f"job{job:04d}_{i:04d}.jpg"
+            angle = 2 * np.pi * i / num_images
+            center = np.array([np.cos(angle), np.sin(angle), 0.1]) * (1 + job)
+            # Identity rotation: t = -center
+            f.write(f"{i + 1} 1 0 0 0 {-center[0]} {-center[1]} {-center[2]} 1 {name}\n\n")
+            cv2.imwrite(os.path.join(images_dir, name), (rng.random((height, width, 3)) * 255).astype(np.uint8))
+            names.append(name)
+    open(os.path.join(text_dir, 'points3D.txt'), 'w').close()
+    return {'text': text_dir, 'images': images_dir, 'out': os.path.join(job_dir, 'transforms.json'), 'names': names, 'width': width}
+
+
+def convert_rewrite(script_path, job):
+    with open(script_path, 'r') as f:
+        content = f.read()
+    content = content.replace(ORIGINAL_TEXT_FOLDER, f'TEXT_FOLDER = r"{job["text"]}"')
+    with open(script_path, 'w') as f:
+        f.write(content)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, script_path, '--images', job['images'], '--text', job['text'], '--out', job['out']],
+                            stdout=subprocess.DEVNULL)
+    if result.returncode != 0:
+        raise RuntimeError(f"colmap2nerf.py failed with exit code {result.returncode}")
+    return time.perf_counter() - start
+
+
+def check(job):
+    # None if transforms.json matches the job's own model, else what is wrong with it
+    try:
+        with open(job['out']) as f:
+            transforms = json.load(f)
+    except (OSError, ValueError) as e:
+        return f"unreadable: {e}"
+    names = sorted(os.path.basename(frame['file_path']) for frame in transforms['frames'])
+    if names != job['names']:
+        foreign = sorted({name.split('_')[0] for name in names} - {job['names'][0].split('_')[0]})
+        return f"{len(names)} frames, expected {len(job['names'])}" + (f"; frames of {', '.join(foreign)}" if foreign else '')
+    if int(transforms.get('w', job['width'])) != job['width']:
+        return f"width {transforms['w']}, expected {job['width']}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent colmap2nerf.py conversions.")
+    parser.add_argument('--jobs', type=int, default=32, help='Conversions in total, each with its own model.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Conversions running at once.')
+    parser.add_argument('--images', type=int, default=40, help='Images per model.')
+    parser.add_argument('--mode', type=str, default='isolated', choices=['isolated', 'rewrite'])
+    parser.add_argument('--script', type=str, default=os.path.join(BENCH_DIR, 'stubs', 'colmap2nerf.py'), help='colmap2nerf.py to run.')
+    parser.add_argument('--stub_seconds', type=float, default=0.2, help='Work time of the stub script per conversion.')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory.')
+    args = parser.parse_args()
+
+    os.environ['STUB_COLMAP2NERF_SECONDS'] = str(args.stub_seconds)
+    work_dir = tempfile.mkdtemp(prefix='stress_colmap2nerf_')
+    try:
+        jobs = [make_job(os.path.join(work_dir, f'job_{j:04d}'), j, args.images) for j in range(args.jobs)]
+        script_path = os.path.abspath(args.script)
+        if args.mode == 'rewrite':
+            script_path = os.path.join(work_dir, 'colmap2nerf.py')
+            shutil.copy(args.script, script_path)
+
+        def convert(job):
+            try:
+                if args.mode == 'rewrite':
+                    return convert_rewrite(script_path, job), None
+                return run_colmap2nerf(script_path, job['text'], job['images'], job['out']), None
+            except (OSError, RuntimeError) as e:
+                return None, str(e)
+
+        start = time.time()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            outcomes = list(pool.map(convert, jobs))
+        wall = time.time() - start
+
+        errors = {}
+        for j, (job, (seconds, error)) in enumerate(zip(jobs, outcomes)):
+            problem = error or check(job)
+            if problem:
+                errors[f'job_{j:04d}'] = problem
+        seconds = [s for s, _ in outcomes if s is not None]
+        report = {
+            'settings': {k: v for k, v in vars(args).items() if k != 'keep'},
+            'wall_seconds': round(wall, 3),
+            'mean_conversion_seconds': round(sum(seconds) / len(seconds), 3) if seconds else None,
+            'conversions_per_second': round(args.jobs / wall, 2),
+            'ok': args.jobs - len(errors),
+            'wrong_or_failed': len(errors),
+            'errors': dict(list(errors.items())[:20]),
+        }
+        print(json.dumps(report, indent=2))
+        if args.keep:
+            print(f"Work directory: {work_dir}", file=sys.stderr)
+        sys.exit(1 if errors else 0)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import argparse
+
+# Stand-in for our copy of instant-ngp's colmap2nerf.py (INSTANT_NGP_SCRIPTS
+# points here in the benchmarks). Like that copy it reads the text model from
+# the hard-coded TEXT_FOLDER below and ignores --text; video2nerf.py relies on
+# colmap2nerf_runner.py to point TEXT_FOLDER at each job's folder. Writes every
+# image of images.txt as a frame with its camera-to-world matrix in COLMAP's
+# axes (no re-centring or scaling), after $STUB_COLMAP2NERF_SECONDS of "work".
+
+TEXT_FOLDER = r"D:\VScode\Code\simpleNeRF\dataset\my_video\output\colmap_text"
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--images', default='images')
+parser.add_argument('--text', default='colmap_text')
+parser.add_argument('--out', default='transforms.json')
+parser.add_argument('--colmap_db', default='colmap.db')
+args, _ = parser.parse_known_args()
+
+
+def rotmat(qw, qx, qy, qz):
+    return [
+        [1 - 2 * qy * qy - 2 * qz * qz, 2 * qx * qy - 2 * qw * qz, 2 * qz * qx + 2 * qw * qy],
+        [2 * qx * qy + 2 * qw * qz, 1 - 2 * qx * qx - 2 * qz * qz, 2 * qy * qz - 2 * qw * qx],
+        [2 * qz * qx - 2 * qw * qy, 2 * qy * qz + 2 * qw * qx, 1 - 2 * qx * qx - 2 * qy * qy],
+    ]
+
+
+camera = None
+with open(os.path.join(TEXT_FOLDER, 'cameras.txt')) as f:
+    for line in f:
+        if line.strip() and not line.startswith('#'):
+            fields = line.split()
+            camera = {'w': int(fields[2]), 'h': int(fields[3]), 'fl_x': float(fields[4]),
+                      'fl_y': float(fields[5]) if len(fields) > 7 else float(fields[4])}
+            break
+
+frames = []
+with open(os.path.join(TEXT_FOLDER, 'images.txt')) as f:
+    lines = [line for line in f if not line.startswith('#')]
+# Two lines per image: the pose, then its 2D points
+for line in lines[::2]:
+    fields = line.split()
+    if len(fields) < 10:
+        continue
+    qw, qx, qy, qz, tx, ty, tz = (float(v) for v in fields[1:8])
+    R = rotmat(qw, qx, qy, qz)
+    # Camera-to-world: R^T, -R^T t
+    center = [-sum(R[r][c] * t for r, t in enumerate((tx, ty, tz))) for c in range(3)]
+    matrix = [[R[0][c], R[1][c], R[2][c], center[c]] for c in range(3)] + [[0.0, 0.0, 0.0, 1.0]]
+    frames.append({'file_path': os.path.join(args.images, fields[9]), 'transform_matrix': matrix})
+
+time.sleep(float(os.getenv('STUB_COLMAP2NERF_SECONDS', '0')))
+with open(args.out, 'w') as f:
+    json.dump(dict(camera or {}, aabb_scale=16, frames=frames), f, indent=2)
+print(f"stub colmap2nerf: {len(frames)} frames written to {args.out}")
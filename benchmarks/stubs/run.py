@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import math
+import time
+import struct
+import argparse
+
+# Stand-in for instant-ngp's scripts/run.py. Point INSTANT_NGP_SCRIPTS at this
+# directory to train, render and export meshes without a GPU. Each mode prints
+# instant-ngp-like log and PROGRESS lines at $STUB_NGP_LOG_RATE lines per second
+# for a configurable duration and writes placeholder artifacts:
+#
+#   STUB_NGP_TRAIN_SECONDS   training time (default 2)
+#   STUB_NGP_RENDER_SECONDS  rendering time (default 1)
+#   STUB_NGP_MESH_SECONDS    marching cubes time (default 0.5)
+#   STUB_NGP_SNAPSHOT_MB     size of the written .ingp snapshot (default 1)
+#   STUB_NGP_RENDER_FAIL_ONCE  start frame of a --video_render_range segment whose
+#                            first attempt fails (to exercise segment retries)
+#
+# Video frames are handled like run.py does: with a '%' in --video_output each
+# frame i (its index in the whole path, also inside a render range) is saved
+# to `video_output % i`; otherwise ./tmp is cleared, frames go to tmp/%04d.jpg
+# and `ffmpeg -i tmp/%04d.jpg` is run through os.system, its result ignored.
+
+parser = argparse.ArgumentParser()
+parser.add_argument('files', nargs='*')
+parser.add_argument('--scene', default='')
+parser.add_argument('--load_snapshot', '--snapshot', default='')
+parser.add_argument('--save_snapshot', default='')
+parser.add_argument('--n_steps', type=int, default=-1)
+parser.add_argument('--save_mesh', default='')
+parser.add_argument('--marching_cubes_res', type=int, default=256)
+parser.add_argument('--marching_cubes_density_thresh', type=float, default=2.5)
+parser.add_argument('--video_camera_path', default='')
+parser.add_argument('--video_n_seconds', type=int, default=1)
+parser.add_argument('--video_fps', type=int, default=60)
+parser.add_argument('--video_output', default='video.mp4')
+parser.add_argument('--video_render_range', type=int, nargs=2, default=(-1, -1))
+parser.add_argument('--width', type=int, default=1920)
+parser.add_argument('--height', type=int, default=1080)
+args, _ = parser.parse_known_args()
+
+LOG_RATE = float(os.getenv('STUB_NGP_LOG_RATE', '20'))
+
+
+def work(label, seconds, total, unit):
+    # Print PROGRESS lines evenly over `seconds`, the way run.py's tqdm output arrives
+    lines = max(1, int(seconds * LOG_RATE))
+    for i in range(1, lines + 1):
+        time.sleep(seconds / lines)
+        done = total * i // lines
+        print(f"{label} {100 * i // lines}% PROGRESS {unit}={done}/{total}", flush=True)
+
+
+def write_placeholder(path, size):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(min(size, 1024)) * (size // 1024 or 1))
+
+
+def write_mesh(path, resolution):
+    # A coloured UV sphere whose density follows --marching_cubes_res, written
+    # like instant-ngp does (binary PLY with per-vertex colour, or OBJ), with the
+    # seam and pole vertices duplicated so mesh post-processing has welding to do
+    rings, segments = max(4, resolution // 4), max(8, resolution // 2)
+    vertices = []
+    for i in range(rings + 1):
+        theta = math.pi * i / rings
+        for j in range(segments + 1):
+            phi = 2 * math.pi * j / segments
+            x, y, z = math.sin(theta) * math.cos(phi), math.cos(theta), math.sin(theta) * math.sin(phi)
+            vertices.append((x, y, z, int(127.5 * (x + 1)), int(127.5 * (y + 1)), int(127.5 * (z + 1))))
+    faces = []
+    for i in range(rings):
+        for j in range(segments):
+            a, b = i * (segments + 1) + j, (i + 1) * (segments + 1) + j
+            faces.append((a, a + 1, b))
+            faces.append((a + 1, b + 1, b))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.lower().endswith('.ply'):
+        with open(path, 'wb') as f:
+            f.write((f"ply\nformat binary_little_endian 1.0\nelement vertex {len(vertices)}\n"
+                     "property float x\nproperty float y\nproperty float z\n"
+                     "property uchar red\nproperty uchar green\nproperty uchar blue\n"
+                     f"element face {len(faces)}\nproperty list uchar int vertex_indices\nend_header\n").encode())
+            f.write(b''.join(struct.pack('<3f3B', *v) for v in vertices))
+            f.write(b''.join(struct.pack('<B3i', 3, *face) for face in faces))
+    else:
+        with open(path, 'w') as f:
+            f.writelines(f"v {x} {y} {z} {r / 255.0:.4f} {g / 255.0:.4f} {b / 255.0:.4f}\n" for x, y, z, r, g, b in vertices)
+            f.writelines(f"f {a + 1} {b + 1} {c + 1}\n" for a, b, c in faces)
+
+
+snapshot = args.load_snapshot or (args.files[0] if args.files else '')
+print(f"stub instant-ngp: scene={args.scene!r} snapshot={snapshot!r}", flush=True)
+
+if args.scene and args.n_steps != 0:
+    if not os.path.exists(os.path.join(args.scene, 'transforms.json')):
+        print(f"stub instant-ngp: no transforms.json in {args.scene}", file=sys.stderr)
+        sys.exit(1)
+    steps = args.n_steps if args.n_steps > 0 else 35000
+    work('Training', float(os.getenv('STUB_NGP_TRAIN_SECONDS', '2')), steps, 'step')
+    if args.save_snapshot:
+        write_placeholder(args.save_snapshot, int(float(os.getenv('STUB_NGP_SNAPSHOT_MB', '1')) * 1024 * 1024))
+
+if args.save_mesh:
+    if not os.path.exists(snapshot):
+        print(f"stub instant-ngp: snapshot {snapshot} not found", file=sys.stderr)
+        sys.exit(1)
+    work('Marching cubes', float(os.getenv('STUB_NGP_MESH_SECONDS', '0.5')), args.marching_cubes_res, 'slice')
+    write_mesh(args.save_mesh, args.marching_cubes_res)
+
+if args.video_camera_path:
+    if not os.path.exists(snapshot) or not os.path.exists(args.video_camera_path):
+        print("stub instant-ngp: snapshot or camera path not found", file=sys.stderr)
+        sys.exit(1)
+    frames = args.video_n_seconds * args.video_fps
+    start, end = args.video_render_range
+    start, end = max(start, 0), (end if end >= 0 else frames - 1)
+    marker = os.path.abspath('stub_failed_once')
+    if args.video_render_range[0] >= 0 and os.getenv('STUB_NGP_RENDER_FAIL_ONCE') == str(start) and not os.path.exists(marker):
+        open(marker, 'w').close()
+        print(f"stub instant-ngp: simulated failure rendering frames {start}-{end}", file=sys.stderr)
+        sys.exit(1)
+    save_frames = '%' in args.video_output
+    if not save_frames:
+        shutil.rmtree('tmp', ignore_errors=True)
+        os.makedirs('tmp')
+    # Render time scales with the frames in the range
+    rendered = end - start + 1
+    work('Rendering', float(os.getenv('STUB_NGP_RENDER_SECONDS', '1')) * rendered / frames, rendered, 'frame')
+    for i in range(start, end + 1):
+        write_placeholder(args.video_output % i if save_frames else f"tmp/{i:04d}.jpg", args.width * args.height // (50 * frames))
+    if not save_frames:
+        os.system(f"ffmpeg -y -framerate {args.video_fps} -i tmp/%04d.jpg -c:v libx264 -pix_fmt yuv420p {args.video_output}")
+
+print("stub instant-ngp: done", flush=True)
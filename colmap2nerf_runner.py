@@ -0,0 +1,63 @@
+import os
+import re
+import sys
+import time
+import subprocess
+
+# ===========================
+# Per-job colmap2nerf.py invocation
+# ===========================
+# Our copy of instant-ngp's colmap2nerf.py reads the text model from a
+# hard-coded TEXT_FOLDER instead of its --text argument. Rewriting that line in
+# the shared script before each run let concurrent jobs convert each other's
+# models (and once the line had been rewritten, the replacement no longer
+# matched at all). Instead, run_colmap2nerf() starts this file as a launcher:
+# it reads the script, points TEXT_FOLDER at the job's own folder in memory and
+# executes it as __main__ with the job's arguments. The script on disk is never
+# written, so any number of conversions can run at once. Scripts without a
+# TEXT_FOLDER line (stock instant-ngp) run unchanged and use --text.
+
+TEXT_FOLDER_LINE = re.compile(r'^TEXT_FOLDER\s*=.*$', re.MULTILINE)
+
+
+def colmap2nerf_command(script_path, text_folder, images, out_path, colmap_db=None, extra_args=(), python=None):
+    command = [python or sys.executable, os.path.abspath(__file__), script_path, text_folder, '--',
+               '--images', images, '--text', text_folder, '--out', out_path]
+    if colmap_db:
+        command += ['--colmap_db', colmap_db]
+    return command + [str(arg) for arg in extra_args]
+
+
+def run_colmap2nerf(script_path, text_folder, images, out_path, colmap_db=None, extra_args=(), python=None):
+    # Converts the text model in `text_folder` to `out_path`; returns the wall time in seconds
+    command = colmap2nerf_command(script_path, text_folder, images, out_path, colmap_db, extra_args, python)
+    print(f"\n>>> Running colmap2nerf: {' '.join(command)}")
+    # A stale result must not pass for this run's
+    if os.path.exists(out_path):
+        os.remove(out_path)
+    start = time.perf_counter()
+    result = subprocess.run(command)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"colmap2nerf.py failed with exit code {result.returncode}")
+    if not os.path.exists(out_path):
+        raise RuntimeError(f"colmap2nerf.py did not write {out_path}")
+    return seconds
+
+
+def _exec_script(script_path, text_folder, script_args):
+    script_path = os.path.abspath(script_path)
+    with open(script_path, 'r') as f:
+        source = f.read()
+    # A function replacement, so backslashes in Windows paths are not read as escapes
+    source = TEXT_FOLDER_LINE.sub(lambda _: f'TEXT_FOLDER = {text_folder!r}', source, count=1)
+    # As if started directly: sibling imports, __file__ and argv all refer to the real script
+    sys.argv = [script_path] + script_args
+    sys.path.insert(0, os.path.dirname(script_path))
+    exec(compile(source, script_path, 'exec'), {'__name__': '__main__', '__file__': script_path})
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4 or sys.argv[3] != '--':
+        sys.exit("usage: colmap2nerf_runner.py SCRIPT TEXT_FOLDER -- [colmap2nerf.py arguments]")
+    _exec_script(sys.argv[1], sys.argv[2], sys.argv[4:])
@@ -0,0 +1,276 @@
+import os
+import json
+import math
+import struct
+import numpy as np
+
+# ===========================
+# COLMAP binary model reader
+# ===========================
+# Reads cameras.bin / images.bin / points3D.bin straight into NumPy structured
+# arrays and converts them to an instant-ngp transforms.json, replacing the
+# `colmap model_converter` + colmap2nerf.py round trip through text files.
+# The pose math follows colmap2nerf.py, done for all frames at once.
+
+# model_id -> (name, number of params)
+CAMERA_MODELS = {
+    0: ('SIMPLE_PINHOLE', 3),
+    1: ('PINHOLE', 4),
+    2: ('SIMPLE_RADIAL', 4),
+    3: ('RADIAL', 5),
+    4: ('OPENCV', 8),
+    5: ('OPENCV_FISHEYE', 8),
+    6: ('FULL_OPENCV', 12),
+    7: ('FOV', 5),
+    8: ('SIMPLE_RADIAL_FISHEYE', 4),
+    9: ('RADIAL_FISHEYE', 5),
+    10: ('THIN_PRISM_FISHEYE', 12),
+}
+
+CAMERA_DTYPE = np.dtype([
+    ('camera_id', '<i4'), ('model', 'U24'), ('width', '<u8'), ('height', '<u8'), ('params', '<f8', 12),
+])
+IMAGE_HEADER_DTYPE = np.dtype([
+    ('image_id', '<i4'), ('qvec', '<f8', 4), ('tvec', '<f8', 3), ('camera_id', '<i4'),
+])
+IMAGE_DTYPE = np.dtype([
+    ('image_id', '<i4'), ('qvec', '<f8', 4), ('tvec', '<f8', 3), ('camera_id', '<i4'), ('name', 'U256'), ('num_points2D', '<u8'),
+    ('num_points3D', '<u8'),
+])
+# One 2D observation of an image; point3D_id is -1 when it was not triangulated
+OBSERVATION_DTYPE = np.dtype([('xy', '<f8', 2), ('point3D_id', '<i8')])
+POINT_HEADER_DTYPE = np.dtype([
+    ('point3D_id', '<u8'), ('xyz', '<f8', 3), ('rgb', 'u1', 3), ('error', '<f8'), ('track_length', '<u8'),
+])
+
+# instant-ngp maps NeRF coordinates into its unit cube with scale 0.33 around 0.5,
+# so aabb_scale=1 covers |p| <= 1.5 in transforms.json units
+NGP_UNIT_HALF_EXTENT = 1.5
+MAX_AABB_SCALE = 128
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def read_cameras_binary(path):
+    buf = _read_file(path)
+    num_cameras = struct.unpack_from('<Q', buf, 0)[0]
+    cameras = np.zeros(num_cameras, dtype=CAMERA_DTYPE)
+    offset = 8
+    for i in range(num_cameras):
+        camera_id, model_id, width, height = struct.unpack_from('<iiQQ', buf, offset)
+        offset += 24
+        model_name, num_params = CAMERA_MODELS[model_id]
+        cameras[i]['camera_id'] = camera_id
+        cameras[i]['model'] = model_name
+        cameras[i]['width'] = width
+        cameras[i]['height'] = height
+        cameras[i]['params'][:num_params] = np.frombuffer(buf, dtype='<f8', count=num_params, offset=offset)
+        offset += 8 * num_params
+    return cameras
+
+
+def read_images_binary(path):
+    buf = _read_file(path)
+    num_images = struct.unpack_from('<Q', buf, 0)[0]
+    images = np.zeros(num_images, dtype=IMAGE_DTYPE)
+    offset = 8
+    for i in range(num_images):
+        header = np.frombuffer(buf, dtype=IMAGE_HEADER_DTYPE, count=1, offset=offset)[0]
+        offset += IMAGE_HEADER_DTYPE.itemsize
+        name_end = buf.index(b'\x00', offset)
+        name = buf[offset:name_end].decode('utf-8')
+        offset = name_end + 1
+        num_points2D = struct.unpack_from('<Q', buf, offset)[0]
+        # Only the number of triangulated observations is kept, as a registration quality measure
+        observations = np.frombuffer(buf, dtype=OBSERVATION_DTYPE, count=num_points2D, offset=offset + 8)
+        num_points3D = int(np.count_nonzero(observations['point3D_id'] != -1))
+        offset += 8 + OBSERVATION_DTYPE.itemsize * num_points2D
+        images[i] = (header['image_id'], header['qvec'], header['tvec'], header['camera_id'], name, num_points2D, num_points3D)
+    return images
+
+
+def read_points3D_binary(path):
+    buf = _read_file(path)
+    num_points = struct.unpack_from('<Q', buf, 0)[0]
+    if num_points == 0:
+        return np.zeros(0, dtype=POINT_HEADER_DTYPE)
+
+    # Records have variable-length tracks, so their start offsets need one
+    # sequential scan; everything else is decoded with a single vectorized gather
+    header_size = POINT_HEADER_DTYPE.itemsize
+    track_length_offset = POINT_HEADER_DTYPE.fields['track_length'][1]
+    unpack_track_length = struct.Struct('<Q').unpack_from
+    offsets = np.empty(num_points, dtype=np.int64)
+    offset = 8
+    for i in range(num_points):
+        offsets[i] = offset
+        offset += header_size + 8 * unpack_track_length(buf, offset + track_length_offset)[0]
+
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    gathered = raw[offsets[:, None] + np.arange(header_size)]
+    return np.ascontiguousarray(gathered).view(POINT_HEADER_DTYPE).reshape(-1)
+
+
+def read_model(sparse_dir):
+    return (
+        read_cameras_binary(os.path.join(sparse_dir, 'cameras.bin')),
+        read_images_binary(os.path.join(sparse_dir, 'images.bin')),
+        read_points3D_binary(os.path.join(sparse_dir, 'points3D.bin')),
+    )
+
+
+# ===========================
+# Pose conversion
+# ===========================
+def qvec_to_rotmat(qvec):
+    # (N, 4) quaternions in COLMAP's (w, x, y, z) order -> (N, 3, 3)
+    w, x, y, z = qvec[:, 0], qvec[:, 1], qvec[:, 2], qvec[:, 3]
+    return np.stack([
+        np.stack([1 - 2 * y * y - 2 * z * z, 2 * x * y - 2 * w * z, 2 * z * x + 2 * w * y], axis=-1),
+        np.stack([2 * x * y + 2 * w * z, 1 - 2 * x * x - 2 * z * z, 2 * y * z - 2 * w * x], axis=-1),
+        np.stack([2 * z * x - 2 * w * y, 2 * y * z + 2 * w * x, 1 - 2 * x * x - 2 * y * y], axis=-1),
+    ], axis=-2)
+
+
+def rotation_between(a, b):
+    # Rotation taking direction a onto direction b (Rodrigues), as in colmap2nerf.py
+    a, b = a / np.linalg.norm(a), b / np.linalg.norm(b)
+    v = np.cross(a, b)
+    c = np.dot(a, b)
+    if c < -1 + 1e-10:
+        # Opposite directions: any perpendicular axis works, so nudge a slightly
+        return rotation_between(a + np.array([1e-2, -1e-2, 1e-2]), b)
+    s = np.linalg.norm(v)
+    kmat = np.array([[0, -v[2], v[1]], [v[2], 0, -v[0]], [-v[1], v[0], 0]])
+    return np.eye(3) + kmat + kmat.dot(kmat) * ((1 - c) / (s ** 2 + 1e-10))
+
+
+def look_at_center(origins, directions, chunk_size=512):
+    # Weighted mean of the closest points between every pair of optical axes,
+    # i.e. the point the cameras are all looking at. Pairs are processed in
+    # row chunks so memory stays bounded for thousands of frames.
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    total_point = np.zeros(3)
+    total_weight = 0.0
+    for start in range(0, len(origins), chunk_size):
+        oa = origins[start:start + chunk_size, None, :]
+        da = directions[start:start + chunk_size, None, :]
+        ob = origins[None, :, :]
+        db = directions[None, :, :]
+        c = np.cross(da, db)
+        denom = np.sum(c * c, axis=-1)
+        t = ob - oa
+        # det([t, db, c]) == dot(t, cross(db, c)), likewise for da
+        ta = np.sum(t * np.cross(db, c), axis=-1) / (denom + 1e-10)
+        tb = np.sum(t * np.cross(da, c), axis=-1) / (denom + 1e-10)
+        ta = np.minimum(ta, 0)
+        tb = np.minimum(tb, 0)
+        points = (oa + ta[..., None] * da + ob + tb[..., None] * db) * 0.5
+        weight = np.where(denom > 0.00001, denom, 0.0)
+        total_point += np.sum(points * weight[..., None], axis=(0, 1))
+        total_weight += float(np.sum(weight))
+    if total_weight > 0.0:
+        return total_point / total_weight
+    return total_point
+
+
+def colmap_to_nerf_poses(images):
+    # Returns (c2w matrices in NeRF convention, world transform) where the world
+    # transform maps COLMAP world points into the same NeRF frame: p' = scale * (R @ p - center)
+    rot = qvec_to_rotmat(images['qvec'])
+    rot_t = np.transpose(rot, (0, 2, 1))
+    c2w = np.tile(np.eye(4), (len(images), 1, 1))
+    c2w[:, :3, :3] = rot_t
+    c2w[:, :3, 3] = -np.einsum('nij,nj->ni', rot_t, images['tvec'])
+
+    # OpenCV camera axes -> OpenGL (flip y and z), then swap world x/y and flip
+    # z so the scene is upright, exactly like colmap2nerf.py
+    c2w[:, 0:3, 2] *= -1
+    c2w[:, 0:3, 1] *= -1
+    c2w = c2w[:, [1, 0, 2, 3], :]
+    c2w[:, 2, :] *= -1
+    world_rot = np.array([[0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, -1.0]])
+
+    # Rotate the average camera up vector onto +z
+    up = np.sum(c2w[:, 0:3, 1], axis=0)
+    up_rot = np.eye(4)
+    up_rot[:3, :3] = rotation_between(up / np.linalg.norm(up), np.array([0.0, 0.0, 1.0]))
+    c2w = np.matmul(up_rot, c2w)
+    world_rot = up_rot[:3, :3] @ world_rot
+
+    center = look_at_center(c2w[:, 0:3, 3], c2w[:, 0:3, 2])
+    c2w[:, 0:3, 3] -= center
+
+    # Scale so the average camera distance is 4 ("nerf sized")
+    avg_len = float(np.mean(np.linalg.norm(c2w[:, 0:3, 3], axis=1)))
+    scale = 4.0 / avg_len if avg_len > 0 else 1.0
+    c2w[:, 0:3, 3] *= scale
+    return c2w, (world_rot, center, scale)
+
+
+def compute_aabb_scale(points_xyz, camera_positions, world_transform, percentile=98.0):
+    # Smallest power of two whose box holds the bulk of the sparse points (and
+    # the cameras); a percentile keeps stray outlier points from inflating it
+    world_rot, center, scale = world_transform
+    extents = [np.abs(camera_positions)]
+    if len(points_xyz):
+        points = (points_xyz @ world_rot.T - center) * scale
+        extents.append(np.percentile(np.abs(points), percentile, axis=0)[None, :])
+    extent = float(np.max(np.concatenate(extents, axis=0)))
+    aabb_scale = 2 ** max(0, math.ceil(math.log2(max(extent, 1e-6) / NGP_UNIT_HALF_EXTENT)))
+    return int(min(aabb_scale, MAX_AABB_SCALE))
+
+
+def camera_intrinsics(camera):
+    model = str(camera['model'])
+    p = camera['params']
+    w, h = float(camera['width']), float(camera['height'])
+    out = {'fl_x': float(p[0]), 'fl_y': float(p[0]), 'cx': w / 2, 'cy': h / 2,
+           'k1': 0.0, 'k2': 0.0, 'k3': 0.0, 'k4': 0.0, 'p1': 0.0, 'p2': 0.0, 'is_fisheye': False}
+    if model == 'SIMPLE_PINHOLE':
+        out.update(cx=p[1], cy=p[2])
+    elif model == 'PINHOLE':
+        out.update(fl_y=p[1], cx=p[2], cy=p[3])
+    elif model in ('SIMPLE_RADIAL', 'SIMPLE_RADIAL_FISHEYE'):
+        out.update(cx=p[1], cy=p[2], k1=p[3], is_fisheye=model.endswith('FISHEYE'))
+    elif model in ('RADIAL', 'RADIAL_FISHEYE'):
+        out.update(cx=p[1], cy=p[2], k1=p[3], k2=p[4], is_fisheye=model.endswith('FISHEYE'))
+    elif model == 'OPENCV':
+        out.update(fl_y=p[1], cx=p[2], cy=p[3], k1=p[4], k2=p[5], p1=p[6], p2=p[7])
+    elif model == 'OPENCV_FISHEYE':
+        out.update(fl_y=p[1], cx=p[2], cy=p[3], k1=p[4], k2=p[5], k3=p[6], k4=p[7], is_fisheye=True)
+    else:
+        print(f"[COLMAP Model] Camera model {model} is not supported by instant-ngp; using focal length only")
+    out = {k: (v if isinstance(v, bool) else float(v)) for k, v in out.items()}
+    out['camera_angle_x'] = math.atan(w / (out['fl_x'] * 2)) * 2
+    out['camera_angle_y'] = math.atan(h / (out['fl_y'] * 2)) * 2
+    out['w'] = w
+    out['h'] = h
+    return out
+
+
+def write_transforms(sparse_dir, transforms_path, aabb_scale=None):
+    cameras, images, points = read_model(sparse_dir)
+    if len(cameras) == 0 or len(images) == 0:
+        raise RuntimeError(f"No registered cameras/images in COLMAP model at {sparse_dir}")
+
+    images = images[np.argsort(images['name'])]
+    c2w, world_transform = colmap_to_nerf_poses(images)
+    if aabb_scale is None:
+        aabb_scale = compute_aabb_scale(points['xyz'], c2w[:, 0:3, 3], world_transform)
+
+    # instant-ngp takes a single set of intrinsics; the pipeline extracts with one camera
+    out = camera_intrinsics(cameras[0])
+    out['aabb_scale'] = aabb_scale
+    out['frames'] = [
+        {'file_path': os.path.basename(str(name)), 'transform_matrix': matrix}
+        for name, matrix in zip(images['name'], c2w.tolist())
+    ]
+
+    with open(transforms_path, 'w') as f:
+        json.dump(out, f, indent=2)
+    print(f"[COLMAP Model] Wrote {len(images)} frames, {len(points)} sparse points, aabb_scale {aabb_scale} to {transforms_path}")
+    return out
@@ -0,0 +1,134 @@
+import os
+import time
+import subprocess
+from feature_cache import frame_hashes
+
+# ===========================
+# COLMAP reconstruction
+# ===========================
+# Video frames are temporally ordered, so matching each frame only against its
+# next `overlap` neighbours (plus optional vocabulary-tree loop closure) replaces
+# the O(n^2) exhaustive matching done by automatic_reconstructor.
+#
+# With a feature cache (see feature_cache.py) the database is seeded with the
+# features and matches of frames seen in earlier runs, so only new frames are
+# extracted and only new pairs are matched.
+
+DEFAULT_STAGE_OPTIONS = {
+    'feature_extractor': {'num_threads': -1, 'use_gpu': True},
+    'sequential_matcher': {'num_threads': -1, 'use_gpu': True},
+    'mapper': {'num_threads': -1, 'use_gpu': None},  # None: leave COLMAP's own default
+}
+
+
+def _flag(value):
+    return '1' if value else '0'
+
+
+def _run_stage(name, command, timings):
+    print(f"\n>>> Running COLMAP {name}: {' '.join(command)}")
+    start = time.perf_counter()
+    result = subprocess.run(command)
+    timings[name] = time.perf_counter() - start
+    print(f"[COLMAP] {name} finished in {timings[name]:.2f}s")
+    if result.returncode != 0:
+        raise RuntimeError(f"COLMAP {name} failed with exit code {result.returncode}")
+
+
+def stage_options(overrides=None):
+    options = {stage: dict(values) for stage, values in DEFAULT_STAGE_OPTIONS.items()}
+    for stage, values in (overrides or {}).items():
+        options[stage].update({k: v for k, v in values.items() if v is not None})
+    return options
+
+
+def run_sequential_reconstruction(colmap_path, image_path, workspace_path, overlap=10, loop_detection=False,
+                                  vocab_tree_path=None, camera_model='OPENCV', options=None, feature_cache=None):
+    # Runs feature_extractor -> sequential_matcher -> mapper and returns the wall
+    # time of every stage in seconds. The sparse model ends up in
+    # <workspace>/sparse/0, the same place automatic_reconstructor puts it.
+    options = stage_options(options)
+    database_path = os.path.join(workspace_path, 'database.db')
+    sparse_path = os.path.join(workspace_path, 'sparse')
+    os.makedirs(sparse_path, exist_ok=True)
+
+    if loop_detection and not vocab_tree_path:
+        print("[COLMAP] Loop detection needs --vocab_tree_path; continuing without it")
+        loop_detection = False
+
+    timings = {}
+
+    hashes, seeded = {}, set()
+    if feature_cache is not None:
+        start = time.perf_counter()
+        hashes = frame_hashes(image_path)
+        _run_stage('database_creator', [colmap_path, 'database_creator', '--database_path', database_path], timings)
+        seeded = feature_cache.seed(database_path, hashes)
+        timings['feature_cache_seed'] = time.perf_counter() - start - timings.pop('database_creator')
+
+    extractor = options['feature_extractor']
+    extractor_command = [
+        colmap_path, 'feature_extractor',
+        '--database_path', database_path,
+        '--image_path', image_path,
+        '--ImageReader.single_camera', '1',
+        '--ImageReader.camera_model', camera_model,
+        '--SiftExtraction.num_threads', str(extractor['num_threads']),
+        '--SiftExtraction.use_gpu', _flag(extractor['use_gpu']),
+    ]
+    new_images = [name for name in hashes if name not in seeded]
+    if seeded:
+        # Only the frames the cache did not have, sharing the seeded camera
+        image_list_path = os.path.join(workspace_path, 'new_images.txt')
+        with open(image_list_path, 'w') as f:
+            f.write(''.join(f"{name}\n" for name in new_images))
+        extractor_command += ['--image_list_path', image_list_path, '--ImageReader.existing_camera_id', '1']
+    if seeded and not new_images:
+        print("[COLMAP] All frames have cached features, skipping feature_extractor")
+    else:
+        _run_stage('feature_extractor', extractor_command, timings)
+
+    matcher = options['sequential_matcher']
+    matcher_command = [
+        colmap_path, 'sequential_matcher',
+        '--database_path', database_path,
+        '--SequentialMatching.overlap', str(overlap),
+        '--SequentialMatching.loop_detection', _flag(loop_detection),
+        '--SiftMatching.num_threads', str(matcher['num_threads']),
+        '--SiftMatching.use_gpu', _flag(matcher['use_gpu']),
+    ]
+    if loop_detection:
+        matcher_command += ['--SequentialMatching.vocab_tree_path', vocab_tree_path]
+    # Pairs that already have matches in the database (seeded ones) are skipped by COLMAP
+    _run_stage('sequential_matcher', matcher_command, timings)
+
+    if feature_cache is not None:
+        start = time.perf_counter()
+        feature_cache.store(database_path, hashes)
+        timings['feature_cache_store'] = time.perf_counter() - start
+
+    mapper = options['mapper']
+    mapper_command = [
+        colmap_path, 'mapper',
+        '--database_path', database_path,
+        '--image_path', image_path,
+        '--output_path', sparse_path,
+        '--Mapper.num_threads', str(mapper['num_threads']),
+    ]
+    if mapper['use_gpu'] is not None:
+        mapper_command += ['--Mapper.ba_use_gpu', _flag(mapper['use_gpu'])]
+    _run_stage('mapper', mapper_command, timings)
+
+    return timings
+
+
+def run_automatic_reconstruction(colmap_path, image_path, workspace_path, quality='low'):
+    # The original one-shot path, kept as a fallback
+    timings = {}
+    _run_stage('automatic_reconstructor', [
+        colmap_path, 'automatic_reconstructor',
+        '--workspace_path', workspace_path,
+        '--image_path', image_path,
+        '--quality', quality,
+    ], timings)
+    return timings
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import numpy as np
+
+# ===========================
+# Cross-run SIFT feature / match cache
+# ===========================
+# Reprocessing a video at another fps extracts mostly the same frames again,
+# and every run starts from an empty COLMAP database. This cache keeps the
+# keypoints and descriptors of every frame, keyed by the frame's content hash,
+# and the raw and verified matches of every image pair, keyed by the two frame
+# hashes, in one SQLite file shared by all runs. Before COLMAP runs, a new
+# database is seeded from it; the feature extractor then only sees frames not
+# in the cache, and the sequential matcher skips pairs whose matches already
+# exist in the database. Afterwards everything new is copied back.
+#
+# Entries are additionally keyed by the extraction / matching settings, so
+# e.g. CPU and GPU SIFT results are never mixed. Least recently used entries
+# are evicted beyond max_bytes.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+HASH_CHUNK_SIZE = 1024 * 1024
+# COLMAP's pair_id = image_id1 * MAX_IMAGE_ID + image_id2 with image_id1 < image_id2
+MAX_IMAGE_ID = 2147483647
+# Verified-geometry columns copied when the COLMAP database has them (older
+# versions lack qvec/tvec)
+GEOMETRY_COLUMNS = ('config', 'F', 'E', 'H', 'qvec', 'tvec')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS features (
+    feature_key TEXT NOT NULL,
+    frame_hash TEXT NOT NULL,
+    camera_model INTEGER NOT NULL,
+    camera_width INTEGER NOT NULL,
+    camera_height INTEGER NOT NULL,
+    camera_params BLOB,
+    kp_rows INTEGER NOT NULL,
+    kp_cols INTEGER NOT NULL,
+    keypoints BLOB,
+    desc_rows INTEGER NOT NULL,
+    desc_cols INTEGER NOT NULL,
+    descriptors BLOB,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (feature_key, frame_hash)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    match_key TEXT NOT NULL,
+    hash1 TEXT NOT NULL,
+    hash2 TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    data BLOB,
+    inlier_rows INTEGER,
+    inlier_cols INTEGER,
+    inlier_data BLOB,
+    config INTEGER,
+    F BLOB,
+    E BLOB,
+    H BLOB,
+    qvec BLOB,
+    tvec BLOB,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (match_key, hash1, hash2)
+);
+'''
+
+
+def settings_key(settings):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def frame_hashes(image_dir):
+    # {image name: sha256 of its bytes}; names are relative to image_dir, like COLMAP's
+    hashes = {}
+    for name in sorted(os.listdir(image_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        digest = hashlib.sha256()
+        with open(os.path.join(image_dir, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        hashes[name] = digest.hexdigest()
+    return hashes
+
+
+def pair_id(image_id1, image_id2):
+    if image_id1 > image_id2:
+        image_id1, image_id2 = image_id2, image_id1
+    return image_id1 * MAX_IMAGE_ID + image_id2
+
+
+def split_pair_id(value):
+    image_id2 = value % MAX_IMAGE_ID
+    return (value - image_id2) // MAX_IMAGE_ID, image_id2
+
+
+def _blob(value):
+    return None if value is None else bytes(value)
+
+
+def invert_geometry(geometry):
+    # The same two-view geometry seen from the other image: transposed F and E,
+    # inverted H and relative pose, as in COLMAP's TwoViewGeometry::Invert
+    inverted = dict(geometry)
+    for name in ('F', 'E'):
+        if geometry.get(name) is not None:
+            inverted[name] = np.frombuffer(geometry[name], dtype='<f8').reshape(3, 3).T.copy().tobytes()
+    if geometry.get('H') is not None:
+        H = np.frombuffer(geometry['H'], dtype='<f8').reshape(3, 3)
+        try:
+            inverted['H'] = np.linalg.inv(H).tobytes()
+        except np.linalg.LinAlgError:
+            inverted['H'] = np.zeros((3, 3)).tobytes()
+    if geometry.get('qvec') is not None and geometry.get('tvec') is not None:
+        w, x, y, z = np.frombuffer(geometry['qvec'], dtype='<f8')
+        t = np.frombuffer(geometry['tvec'], dtype='<f8')
+        R = np.array([
+            [1 - 2 * y * y - 2 * z * z, 2 * x * y - 2 * w * z, 2 * z * x + 2 * w * y],
+            [2 * x * y + 2 * w * z, 1 - 2 * x * x - 2 * z * z, 2 * y * z - 2 * w * x],
+            [2 * z * x - 2 * w * y, 2 * y * z + 2 * w * x, 1 - 2 * x * x - 2 * y * y],
+        ])
+        inverted['qvec'] = np.array([w, -x, -y, -z], dtype='<f8').tobytes()
+        inverted['tvec'] = (-R.T @ t).astype('<f8').tobytes()
+    return inverted
+
+
+def _swap_columns(rows, cols, data):
+    if data is None:
+        return data
+    return np.frombuffer(data, dtype='<u4').reshape(rows, cols)[:, ::-1].copy().tobytes()
+
+
+class FeatureCache:
+    def __init__(self, path, extraction_settings, matching_settings, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.feature_key = settings_key(extraction_settings)
+        self.match_key = settings_key({'features': self.feature_key, 'matching': matching_settings})
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Several video2nerf processes may share the cache file
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    # ---------- seeding ----------
+    def seed(self, database_path, hashes):
+        # Writes the cached camera, images, features and matches for the frames in
+        # `hashes` ({name: frame hash}) into the (freshly created) COLMAP database.
+        # Returns the names that got their features from the cache.
+        now = time.time()
+        with self._connect() as cache:
+            rows = {}
+            for name, frame_hash in hashes.items():
+                row = cache.execute('SELECT camera_model, camera_width, camera_height, camera_params, kp_rows, kp_cols, keypoints, '
+                                    'desc_rows, desc_cols, descriptors FROM features WHERE feature_key = ? AND frame_hash = ?',
+                                    (self.feature_key, frame_hash)).fetchone()
+                if row is not None:
+                    rows[name] = row
+            if not rows:
+                return set()
+            # One shared camera (the pipeline extracts with single_camera); frames of another size are left to COLMAP
+            camera = max({row[:3] for row in rows.values()}, key=lambda c: sum(1 for row in rows.values() if row[:3] == c))
+            camera_params = next(row[3] for row in rows.values() if row[:3] == camera)
+            rows = {name: row for name, row in rows.items() if row[:3] == camera}
+
+            db = sqlite3.connect(database_path)
+            db.execute('INSERT INTO cameras (camera_id, model, width, height, params, prior_focal_length) VALUES (1, ?, ?, ?, ?, 0)',
+                       (*camera, camera_params))
+            # Image ids follow frame order, like COLMAP's own extraction of a frame sequence
+            image_ids = {}
+            for image_id, name in enumerate(sorted(rows), start=1):
+                row = rows[name]
+                image_ids[name] = image_id
+                db.execute('INSERT INTO images (image_id, name, camera_id) VALUES (?, ?, 1)', (image_id, name))
+                db.execute('INSERT INTO keypoints (image_id, rows, cols, data) VALUES (?, ?, ?, ?)', (image_id, row[4], row[5], row[6]))
+                db.execute('INSERT INTO descriptors (image_id, rows, cols, data) VALUES (?, ?, ?, ?)', (image_id, row[7], row[8], row[9]))
+
+            geometry_columns = self._geometry_columns(db)
+            ids_by_hash = {}
+            for name, image_id in image_ids.items():
+                ids_by_hash.setdefault(hashes[name], []).append(image_id)
+            seeded_pairs = 0
+            for hash1, hash2, m_rows, m_cols, m_data, i_rows, i_cols, i_data, *geometry in self._cached_pairs(cache, list(ids_by_hash)):
+                geometry = dict(zip(GEOMETRY_COLUMNS, geometry))
+                for id1 in ids_by_hash[hash1]:
+                    for id2 in ids_by_hash[hash2]:
+                        if id1 == id2:
+                            continue
+                        data, inliers, pair_geometry = m_data, i_data, geometry
+                        if id1 > id2:
+                            # Stored the other way round: the matched keypoint columns swap
+                            data = _swap_columns(m_rows, m_cols, m_data)
+                            inliers = _swap_columns(i_rows, i_cols, i_data)
+                            pair_geometry = invert_geometry(geometry)
+                        pid = pair_id(id1, id2)
+                        db.execute('INSERT OR IGNORE INTO matches (pair_id, rows, cols, data) VALUES (?, ?, ?, ?)', (pid, m_rows, m_cols, data))
+                        if i_rows is not None:
+                            columns = ['pair_id', 'rows', 'cols', 'data'] + geometry_columns
+                            values = [pid, i_rows, i_cols, inliers] + [pair_geometry[c] for c in geometry_columns]
+                            db.execute(f"INSERT OR IGNORE INTO two_view_geometries ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values)
+                        seeded_pairs += 1
+            db.commit()
+            db.close()
+
+            hashes_used = list(ids_by_hash)
+            self._touch(cache, 'features', 'feature_key', self.feature_key, 'frame_hash', hashes_used, now)
+        print(f"[Feature Cache] Seeded {len(image_ids)} of {len(hashes)} frames and {seeded_pairs} matched pairs from the cache")
+        return set(image_ids)
+
+    def _cached_pairs(self, cache, frame_hashes_list):
+        # Cached match rows among the given frames, batched to stay under SQLite's variable limit
+        wanted = set(frame_hashes_list)
+        ordered = sorted(wanted)
+        for start in range(0, len(ordered), 400):
+            batch = ordered[start:start + 400]
+            query = (f"SELECT hash1, hash2, rows, cols, data, inlier_rows, inlier_cols, inlier_data, {', '.join(GEOMETRY_COLUMNS)} "
+                     f"FROM matches WHERE match_key = ? AND hash1 IN ({', '.join('?' * len(batch))})")
+            for row in cache.execute(query, (self.match_key, *batch)).fetchall():
+                if row[1] in wanted:
+                    cache.execute('UPDATE matches SET last_used = ? WHERE match_key = ? AND hash1 = ? AND hash2 = ?',
+                                  (time.time(), self.match_key, row[0], row[1]))
+                    yield row
+
+    @staticmethod
+    def _geometry_columns(db):
+        existing = {row[1] for row in db.execute('PRAGMA table_info(two_view_geometries)')}
+        return [c for c in GEOMETRY_COLUMNS if c in existing]
+
+    @staticmethod
+    def _touch(cache, table, key_column, key, hash_column, hashes, now):
+        for start in range(0, len(hashes), 400):
+            batch = hashes[start:start + 400]
+            cache.execute(f"UPDATE {table} SET last_used = ? WHERE {key_column} = ? AND {hash_column} IN ({', '.join('?' * len(batch))})",
+                          (now, key, *batch))
+
+    # ---------- storing ----------
+    def store(self, database_path, hashes):
+        # Copies the features and matches of this run's database into the cache
+        now = time.time()
+        db = sqlite3.connect(database_path)
+        images = {name: (image_id, camera_id) for image_id, name, camera_id in db.execute('SELECT image_id, name, camera_id FROM images')}
+        cameras = {row[0]: row[1:] for row in db.execute('SELECT camera_id, model, width, height, params FROM cameras')}
+        hash_by_id = {image_id: hashes[name] for name, (image_id, _) in images.items() if name in hashes}
+
+        new_features = 0
+        with self._connect() as cache:
+            known = set()
+            for start in range(0, len(hash_by_id), 400):
+                batch = list(hash_by_id.values())[start:start + 400]
+                known.update(row[0] for row in cache.execute(
+                    f"SELECT frame_hash FROM features WHERE feature_key = ? AND frame_hash IN ({', '.join('?' * len(batch))})",
+                    (self.feature_key, *batch)))
+            for name, (image_id, camera_id) in images.items():
+                frame_hash = hashes.get(name)
+                if frame_hash is None or frame_hash in known or camera_id not in cameras:
+                    continue
+                keypoints = db.execute('SELECT rows, cols, data FROM keypoints WHERE image_id = ?', (image_id,)).fetchone()
+                descriptors = db.execute('SELECT rows, cols, data FROM descriptors WHERE image_id = ?', (image_id,)).fetchone()
+                if keypoints is None or descriptors is None:
+                    continue
+                size = len(keypoints[2] or b'') + len(descriptors[2] or b'')
+                cache.execute('INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                              (self.feature_key, frame_hash, *cameras[camera_id][:3], _blob(cameras[camera_id][3]),
+                               keypoints[0], keypoints[1], _blob(keypoints[2]), descriptors[0], descriptors[1], _blob(descriptors[2]), size, now))
+                known.add(frame_hash)
+                new_features += 1
+
+            geometry_columns = self._geometry_columns(db)
+            geometries = {}
+            select = ', '.join(['pair_id', 'rows', 'cols', 'data'] + geometry_columns)
+            for row in db.execute(f'SELECT {select} FROM two_view_geometries'):
+                geometries[row[0]] = dict(zip(['rows', 'cols', 'data'] + geometry_columns, row[1:]))
+            new_pairs = 0
+            for pid, rows, cols, data in db.execute('SELECT pair_id, rows, cols, data FROM matches'):
+                id1, id2 = split_pair_id(pid)
+                if id1 not in hash_by_id or id2 not in hash_by_id or hash_by_id[id1] == hash_by_id[id2]:
+                    continue
+                hash1, hash2 = hash_by_id[id1], hash_by_id[id2]
+                geometry = geometries.get(pid, {})
+                inlier_rows, inlier_cols = geometry.get('rows'), geometry.get('cols')
+                data, inlier_data = _blob(data), _blob(geometry.get('data'))
+                pair_geometry = {c: geometry.get(c) if c == 'config' else _blob(geometry.get(c)) for c in GEOMETRY_COLUMNS}
+                if hash1 > hash2:
+                    # Stored with the smaller hash first so both orders find it
+                    hash1, hash2 = hash2, hash1
+                    data = _swap_columns(rows, cols, data)
+                    inlier_data = _swap_columns(inlier_rows, inlier_cols, inlier_data)
+                    pair_geometry = invert_geometry(pair_geometry)
+                exists = cache.execute('SELECT 1 FROM matches WHERE match_key = ? AND hash1 = ? AND hash2 = ?',
+                                       (self.match_key, hash1, hash2)).fetchone()
+                if exists:
+                    continue
+                size = len(data or b'') + len(inlier_data or b'')
+                cache.execute('INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                              (self.match_key, hash1, hash2, rows, cols, data, inlier_rows, inlier_cols, inlier_data,
+                               *(pair_geometry[c] for c in GEOMETRY_COLUMNS), size, now))
+                new_pairs += 1
+            self._evict(cache)
+        db.close()
+        print(f"[Feature Cache] Stored {new_features} new frames and {new_pairs} new matched pairs")
+
+    def _evict(self, cache):
+        # Drop least recently used features and matches until the cache fits max_bytes
+        total = sum(cache.execute('SELECT COALESCE(SUM(bytes), 0) FROM features').fetchone() +
+                    cache.execute('SELECT COALESCE(SUM(bytes), 0) FROM matches').fetchone())
+        if total <= self.max_bytes:
+            return
+        entries = cache.execute(
+            "SELECT 'features', rowid, bytes, last_used FROM features UNION ALL "
+            "SELECT 'matches', rowid, bytes, last_used FROM matches ORDER BY last_used").fetchall()
+        evicted = 0
+        for table, rowid, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            cache.execute(f'DELETE FROM {table} WHERE rowid = ?', (rowid,))
+            total -= size
+            evicted += 1
+        print(f"[Feature Cache] Evicted {evicted} entries to stay under {self.max_bytes / 1024 ** 3:.1f} GB")
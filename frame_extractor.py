@@ -0,0 +1,163 @@
+import os
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+# ===========================
+# Frame extraction
+# ===========================
+# Frames are decoded in-process with OpenCV, which asks for any available
+# hardware decoder (VAAPI, D3D11, ...) and otherwise uses FFmpeg's
+# multi-threaded software decoder. Only the frames to keep are converted to
+# BGR, optionally downscaled to `frame_width`, and handed to a pool of
+# encoder threads, which encode, hash and write them straight to their final
+# names. OpenCV releases the GIL while resizing and encoding, so threads scale
+# without copying frames between processes; at most workers + 2 decoded
+# frames are held at once.
+#
+# A manifest with the source frame index, timestamp and sha256 of every
+# written frame is saved next to frames/ (instant-ngp loads every .json in
+# the scene directory).
+
+# Output formats and their file extensions. 'raw' is uncompressed BMP, which
+# COLMAP and instant-ngp read without any decode cost, at ~10x the size of JPEG.
+FRAME_FORMATS = {'jpg': '.jpg', 'png': '.png', 'raw': '.bmp'}
+DEFAULT_JPEG_QUALITY = 95
+PNG_COMPRESSION = 1        # zlib level; higher levels are much slower for little gain
+MANIFEST_NAME = 'frames_manifest.json'
+
+
+def frame_name(number, image_format='jpg'):
+    return f"frame_{number:04d}{FRAME_FORMATS[image_format]}"
+
+
+def frame_glob(frames_dir, image_format='jpg'):
+    return os.path.join(frames_dir, 'frame_*' + FRAME_FORMATS[image_format])
+
+
+def clear_frames(frames_dir):
+    # Frames from an earlier run (in any format) would otherwise end up in the reconstruction
+    if not os.path.isdir(frames_dir):
+        return
+    extensions = tuple(FRAME_FORMATS.values())
+    for name in os.listdir(frames_dir):
+        if name.startswith('frame_') and name.endswith(extensions):
+            os.remove(os.path.join(frames_dir, name))
+
+
+def open_video(video_path):
+    params = []
+    if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    cap = cv2.VideoCapture(video_path, cv2.CAP_ANY, params) if params else cv2.VideoCapture(video_path)
+    if not cap.isOpened() and params:
+        cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    return cap
+
+
+def resize_to_width(frame, frame_width):
+    # Downscale only, to the given width with an even height (like ffmpeg's scale=W:-2)
+    h, w = frame.shape[:2]
+    if not frame_width or frame_width >= w:
+        return frame
+    height = max(2, int(round(h * frame_width / float(w) / 2)) * 2)
+    return cv2.resize(frame, (frame_width, height), interpolation=cv2.INTER_AREA)
+
+
+def decode_frames(video_path, fps=None, frame_indices=None):
+    # Yields (source frame index, timestamp in seconds, BGR frame) for every
+    # frame, the frame nearest each 1/fps tick, or the given frame indices
+    cap = open_video(video_path)
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    half_interval = 0.5 / source_fps
+    wanted = None if frame_indices is None else set(int(i) for i in frame_indices)
+    last_wanted = max(wanted) if wanted else -1
+    next_tick = 0
+    index = 0
+    try:
+        # grab() decodes without the colour conversion, which only kept frames pay for
+        while (wanted is None or index <= last_wanted) and cap.grab():
+            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if timestamp <= 0 and index > 0:
+                timestamp = index / source_fps
+            if wanted is not None:
+                keep = index in wanted
+            elif fps:
+                # A frame stands for the half source interval around its timestamp
+                keep = timestamp + half_interval >= next_tick / fps
+                while next_tick / fps <= timestamp + half_interval:
+                    next_tick += 1
+            else:
+                keep = True
+            if keep:
+                ok, frame = cap.retrieve()
+                if ok:
+                    yield index, timestamp, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def _encode_params(image_format, jpeg_quality):
+    if image_format == 'jpg':
+        return [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+    if image_format == 'png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+    return []
+
+
+def _write_frame(frame, path, frame_width, extension, params):
+    frame = resize_to_width(frame, frame_width)
+    ok, encoded = cv2.imencode(extension, frame, params)
+    if not ok:
+        raise RuntimeError(f"Could not encode frame {path}")
+    data = encoded.tobytes()
+    partial_path = path + '.partial'
+    with open(partial_path, 'wb') as f:
+        f.write(data)
+    os.replace(partial_path, path)
+    height, width = frame.shape[:2]
+    return {'file': os.path.basename(path), 'sha256': hashlib.sha256(data).hexdigest(), 'width': width, 'height': height}
+
+
+def extract_frames(video_path, frames_dir, fps=None, frame_indices=None, frame_width=0, image_format='jpg',
+                   jpeg_quality=DEFAULT_JPEG_QUALITY, workers=0, manifest_path=None):
+    # Writes frame_0001.<ext>, ... to frames_dir and returns their manifest
+    # entries; see decode_frames() for which frames are taken
+    if image_format not in FRAME_FORMATS:
+        raise ValueError(f"Unknown frame format: {image_format}")
+    os.makedirs(frames_dir, exist_ok=True)
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    extension = FRAME_FORMATS[image_format]
+    params = _encode_params(image_format, jpeg_quality)
+
+    entries = []
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for number, (index, timestamp, frame) in enumerate(decode_frames(video_path, fps, frame_indices), 1):
+            path = os.path.join(frames_dir, frame_name(number, image_format))
+            pending.append((index, timestamp, pool.submit(_write_frame, frame, path, frame_width, extension, params)))
+            while len(pending) > workers + 2:
+                entries.append(_finished(*pending.popleft()))
+        while pending:
+            entries.append(_finished(*pending.popleft()))
+
+    if manifest_path:
+        write_manifest(manifest_path, video_path, entries, fps=fps, frame_width=frame_width, image_format=image_format)
+    return entries
+
+
+def _finished(index, timestamp, future):
+    return dict(future.result(), index=index, timestamp=round(timestamp, 4))
+
+
+def write_manifest(manifest_path, video_path, entries, **settings):
+    manifest = dict(settings, video=os.path.basename(video_path), count=len(entries), frames=entries)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+from frame_extractor import open_video, extract_frames
+
+# ===========================
+# Keyframe selection
+# ===========================
+# Instead of sampling the video at a fixed fps, decode candidate frames at a
+# higher rate, score each for sharpness and measure how far the camera moved
+# since the previous candidate, then keep the sharpest frame in each of
+# `target_count` equal-parallax segments. Static stretches collapse into a
+# single frame and blurry frames lose to their sharper neighbours.
+
+SCORE_WIDTH = 480          # Frames are downscaled to this width for scoring
+MIN_SHARPNESS_RATIO = 0.35 # Candidates below this fraction of the median sharpness are dropped
+MAX_FLOW_FEATURES = 400
+
+
+def _to_score_gray(frame):
+    h, w = frame.shape[:2]
+    scale = SCORE_WIDTH / float(w) if w > SCORE_WIDTH else 1.0
+    if scale != 1.0:
+        frame = cv2.resize(frame, (int(round(w * scale)), int(round(h * scale))), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def sharpness(gray):
+    # Variance of the Laplacian: high for crisp edges, collapses under motion blur
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+
+def motion_between(prev_gray, gray):
+    # Median optical-flow displacement of tracked corners, normalized by the
+    # image diagonal so the value does not depend on resolution
+    diagonal = float(np.hypot(*gray.shape[:2]))
+    points = cv2.goodFeaturesToTrack(prev_gray, maxCorners=MAX_FLOW_FEATURES, qualityLevel=0.01, minDistance=8)
+    if points is None or len(points) < 8:
+        # Texture-poor frame: fall back to global phase correlation shift
+        (dx, dy), _ = cv2.phaseCorrelate(prev_gray.astype(np.float32), gray.astype(np.float32))
+        return float(np.hypot(dx, dy)) / diagonal
+    next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None)
+    tracked = status.reshape(-1).astype(bool)
+    if tracked.sum() < 8:
+        # Lost track of almost everything: treat as a large viewpoint change
+        return 1.0
+    displacement = np.linalg.norm((next_points - points).reshape(-1, 2)[tracked], axis=1)
+    return float(np.median(displacement)) / diagonal
+
+
+def score_candidates(video_path, candidate_fps):
+    cap = open_video(video_path)
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, int(round(source_fps / candidate_fps)))
+
+    indices, sharp_scores, motions = [], [], []
+    prev_gray = None
+    frame_idx = 0
+    while True:
+        if not cap.grab():
+            break
+        if frame_idx % step == 0:
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            gray = _to_score_gray(frame)
+            indices.append(frame_idx)
+            sharp_scores.append(sharpness(gray))
+            motions.append(0.0 if prev_gray is None else motion_between(prev_gray, gray))
+            prev_gray = gray
+        frame_idx += 1
+    cap.release()
+
+    return np.array(indices, dtype=np.int64), np.array(sharp_scores, dtype=np.float64), np.array(motions, dtype=np.float64)
+
+
+def select_keyframes(indices, sharp_scores, motions, target_count):
+    if len(indices) == 0:
+        return indices
+
+    # Discard clearly blurred candidates up front
+    keep = sharp_scores >= MIN_SHARPNESS_RATIO * np.median(sharp_scores)
+    if keep.sum() <= target_count:
+        return indices[keep]
+
+    # Cumulative parallax along the whole candidate sequence (including dropped
+    # frames, whose motion still counts), split into equal-parallax segments
+    travelled = np.cumsum(motions)
+    total = travelled[-1]
+    if total <= 0:
+        segments = np.minimum((np.arange(len(indices)) * target_count) // len(indices), target_count - 1)
+    else:
+        segments = np.minimum((travelled / total * target_count).astype(np.int64), target_count - 1)
+
+    indices, sharp_scores, segments = indices[keep], sharp_scores[keep], segments[keep]
+
+    # Sharpest candidate per segment: sort by (segment, -sharpness) and take the
+    # first entry of each segment run
+    order = np.lexsort((-sharp_scores, segments))
+    first_of_segment = np.ones(len(order), dtype=bool)
+    first_of_segment[1:] = segments[order][1:] != segments[order][:-1]
+    return np.sort(indices[order[first_of_segment]])
+
+
+def extract_keyframes(video_path, frames_dir, target_count, candidate_fps, frame_width=0, **write_options):
+    # write_options go to frame_extractor.extract_frames (format, quality, workers, manifest)
+    indices, sharp_scores, motions = score_candidates(video_path, candidate_fps)
+    selected = select_keyframes(indices, sharp_scores, motions, target_count)
+    print(f"[Keyframes] {len(indices)} candidates at {candidate_fps} fps -> {len(selected)} keyframes (target {target_count})")
+    if len(selected) == 0:
+        return []
+    return extract_frames(video_path, frames_dir, frame_indices=selected, frame_width=frame_width, **write_options)
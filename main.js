@@ -5,6 +5,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const progressBar = document.getElementById('progressBar');
     const progressText = document.getElementById('progressText');
     const qualitySelect = document.getElementById('quality');
+    const fitMinutesInput = document.getElementById('fitMinutes');
+    const estimatedTimeSpan = document.getElementById('estimatedTime');
     const modelDisplayDiv = document.querySelector('.model-display');
     const modelDisplayPlaceholder = document.getElementById('modelDisplayPlaceholder');
 
@@ -13,52 +15,127 @@ document.addEventListener('DOMContentLoaded', () => {
     const exportIngpButton = document.getElementById('exportIngp');
     const exportObjButton = document.getElementById('exportObj');
     const exportPlyButton = document.getElementById('exportPly');
+    const exportGlbButton = document.getElementById('exportGlb');
+    const meshLodSelect = document.getElementById('meshLod');
 
     let selectedFile = null;
     let uploadedFilename = null; // Store the filename returned by the backend
+    let uploadedOriginalName = null; // Name the user picked; the stored file is named by content hash
     let currentTaskId = null; // Store the current task ID for exports
 
     videoUpload.addEventListener('change', async (event) => {
         selectedFile = event.target.files[0];
         if (selectedFile) {
             fileNameSpan.textContent = selectedFile.name;
-            // Upload the file to the backend
+            // Upload the file to the backend in chunks, resuming after dropped connections
             try {
-                const formData = new FormData();
-                formData.append('video', selectedFile);
-
-                const uploadResponse = await fetch('/upload_video', {
-                    method: 'POST',
-                    body: formData,
-                });
-
-                if (!uploadResponse.ok) {
-                    throw new Error(`HTTP error! status: ${uploadResponse.status}`);
-                }
-
-                const uploadResult = await uploadResponse.json();
+                const uploadResult = await uploadInChunks(selectedFile);
                 uploadedFilename = uploadResult.filename; // Save the filename from backend
+                uploadedOriginalName = uploadResult.original_filename;
                 console.log('Upload successful:', uploadResult.message, 'filename:', uploadedFilename);
 
-                // Removed: updateEstimatedTime(uploadedFilename, qualitySelect.value);
+                updateEstimatedTime();
 
             } catch (error) {
                 console.error('Error uploading video:', error);
                 fileNameSpan.textContent = 'Upload failed.';
-                // Removed: estimatedTimeSpan.textContent = 'N/A';
+                estimatedTimeSpan.textContent = 'N/A';
             }
         } else {
             fileNameSpan.textContent = 'No file chosen';
-            // Removed: estimatedTimeSpan.textContent = 'N/A';
+            estimatedTimeSpan.textContent = 'N/A';
             uploadedFilename = null;
         }
     });
 
-    // Removed: qualitySelect.addEventListener('change', () => {
-    // Removed:     if (uploadedFilename) {
-    // Removed:         updateEstimatedTime(uploadedFilename, qualitySelect.value);
-    // Removed:     }
-    // Removed: });
+    const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+    const UPLOAD_MAX_RETRIES = 5;
+
+    // Opens (or reopens, after a page reload) an upload session and sends the file
+    // slice by slice; on a failed chunk it asks the server how far it got and continues
+    async function uploadInChunks(file) {
+        const sessionKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+        let uploadId = localStorage.getItem(sessionKey);
+        let offset = uploadId ? await fetchUploadOffset(uploadId).catch(() => null) : null;
+        if (offset === null) {
+            const createResponse = await fetch('/uploads', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: file.name, size: file.size }),
+            });
+            if (!createResponse.ok) {
+                throw new Error(`HTTP error! status: ${createResponse.status}`);
+            }
+            uploadId = (await createResponse.json()).upload_id;
+            localStorage.setItem(sessionKey, uploadId);
+            offset = 0;
+        }
+
+        let retries = 0;
+        while (true) {
+            const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+            let response;
+            try {
+                response = await fetch(`/uploads/${uploadId}`, {
+                    method: 'PUT',
+                    headers: { 'Upload-Offset': String(offset), 'Content-Type': 'application/octet-stream' },
+                    body: chunk,
+                });
+            } catch (error) {
+                response = null;
+            }
+
+            if (response && response.ok) {
+                const result = await response.json();
+                retries = 0;
+                fileNameSpan.textContent = `${file.name} (${Math.floor(100 * result.offset / file.size)}% uploaded)`;
+                if (result.complete) {
+                    localStorage.removeItem(sessionKey);
+                    fileNameSpan.textContent = file.name;
+                    return result;
+                }
+                offset = result.offset;
+                continue;
+            }
+            if (response && response.status !== 409 && response.status < 500) {
+                localStorage.removeItem(sessionKey);
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            if (++retries > UPLOAD_MAX_RETRIES) {
+                throw new Error('Upload failed after repeated retries');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            let serverOffset;
+            try {
+                serverOffset = await fetchUploadOffset(uploadId);
+            } catch (error) {
+                continue; // Still offline; retry the same chunk
+            }
+            if (serverOffset === null) {
+                localStorage.removeItem(sessionKey);
+                throw new Error('Upload session expired');
+            }
+            offset = serverOffset;
+        }
+    }
+
+    // Bytes the server has for an upload, or null if the session is gone; throws when offline
+    async function fetchUploadOffset(uploadId) {
+        const response = await fetch(`/uploads/${uploadId}`);
+        if (!response.ok) {
+            return null;
+        }
+        return (await response.json()).offset;
+    }
+
+    qualitySelect.addEventListener('change', updateEstimatedTime);
+    fitMinutesInput.addEventListener('change', updateEstimatedTime);
+
+    // Empty means no time budget
+    function fitMinutes() {
+        const minutes = parseFloat(fitMinutesInput.value);
+        return minutes > 0 ? minutes : null;
+    }
 
     processButton.addEventListener('click', async () => {
         if (uploadedFilename) {
@@ -77,7 +154,9 @@ document.addEventListener('DOMContentLoaded', () => {
                     },
                     body: JSON.stringify({
                         filename: uploadedFilename,
+                        original_filename: uploadedOriginalName,
                         quality: qualitySelect.value,
+                        fit_minutes: fitMinutes(),
                     }),
                 });
 
@@ -100,30 +179,42 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    // Removed: async function updateEstimatedTime(filename, quality) {
-    // Removed:     try {
-    // Removed:         const response = await fetch('/estimate_time', {
-    // Removed:             method: 'POST',
-    // Removed:             headers: {
-    // Removed:                 'Content-Type': 'application/json',
-    // Removed:             },
-    // Removed:             body: JSON.stringify({
-    // Removed:                 filename: filename,
-    // Removed:                 quality: quality,
-    // Removed:             }),
-    // Removed:         });
-    // Removed: 
-    // Removed:         if (!response.ok) {
-    // Removed:             throw new Error(`HTTP error! status: ${response.status}`);
-    // Removed:         }
-    // Removed: 
-    // Removed:         const result = await response.json();
-    // Removed:         estimatedTimeSpan.textContent = `${result.estimated_minutes} minutes`;
-    // Removed:     } catch (error) {
-    // Removed:         console.error('Error fetching estimated time:', error);
-    // Removed:         estimatedTimeSpan.textContent = 'N/A';
-    // Removed:     }
-    // Removed: }
+    // Predicted processing time for the uploaded video at the selected quality; with a
+    // time budget the server scales frames and resolution down until the run fits
+    async function updateEstimatedTime() {
+        if (!uploadedFilename) {
+            return;
+        }
+        try {
+            const response = await fetch('/estimate_time', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    filename: uploadedFilename,
+                    quality: qualitySelect.value,
+                    fit_minutes: fitMinutes(),
+                }),
+            });
+
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const result = await response.json();
+            const plan = result.plan;
+            let text = `${result.estimated_minutes} minutes (~${plan.expected_frames} frames`;
+            text += plan.frame_width ? `, ${plan.frame_width}px wide)` : ')';
+            if (result.fits === false) {
+                text += ' - cannot fit the time budget';
+            }
+            estimatedTimeSpan.textContent = text;
+        } catch (error) {
+            console.error('Error fetching estimated time:', error);
+            estimatedTimeSpan.textContent = 'N/A';
+        }
+    }
 
     function startProgressPolling(taskId) {
         const eventSource = new EventSource(`/progress/${taskId}`);
@@ -153,7 +244,11 @@ document.addEventListener('DOMContentLoaded', () => {
 
                 // Show export options
                 exportSection.style.display = 'block';
-            } else if (data.status === 'failed') {
+            } else if (data.status === 'stopped') {
+                // Partial run (to_stage before render) finished
+                eventSource.close();
+                progressText.textContent = `Stopped: ${data.line}`;
+            } else if (['failed', 'training_failed', 'rendering_failed', 'cancelled'].includes(data.status)) {
                 eventSource.close();
                 alert(`Video processing failed: ${data.line}`);
                 progressText.textContent = `Failed: ${data.line}`;
@@ -162,8 +257,11 @@ document.addEventListener('DOMContentLoaded', () => {
 
         eventSource.onerror = (error) => {
             console.error('EventSource failed:', error);
-            eventSource.close();
-            progressText.textContent = 'Error during processing.';
+            // The browser reconnects on its own and resumes after the last event id;
+            // only report an error once it has given up
+            if (eventSource.readyState === EventSource.CLOSED) {
+                progressText.textContent = 'Error during processing.';
+            }
         };
     }
 
@@ -171,6 +269,24 @@ document.addEventListener('DOMContentLoaded', () => {
     exportIngpButton.addEventListener('click', () => downloadFile('ingp'));
     exportObjButton.addEventListener('click', () => downloadFile('obj'));
     exportPlyButton.addEventListener('click', () => downloadFile('ply'));
+    exportGlbButton.addEventListener('click', () => downloadFile('glb'));
+
+    async function waitForExport(statusUrl) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const statusResponse = await fetch(statusUrl);
+            if (!statusResponse.ok) {
+                throw new Error(`HTTP error! status: ${statusResponse.status}`);
+            }
+            const status = await statusResponse.json();
+            if (status.state === 'ready') {
+                return;
+            }
+            if (status.state === 'failed' || status.state === 'unknown') {
+                throw new Error(status.error || 'Mesh export failed');
+            }
+        }
+    }
 
     async function downloadFile(format) {
         if (!currentTaskId) {
@@ -179,7 +295,15 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            const response = await fetch(`/export_model/${currentTaskId}/${format}`);
+            // Meshes are decimated to the selected level of detail (0 = full resolution)
+            const query = format === 'ingp' ? '' : `?lod=${meshLodSelect.value}`;
+            let response = await fetch(`/export_model/${currentTaskId}/${format}${query}`);
+            // Meshes are generated in the background on first request: poll until ready, then fetch again
+            if (response.status === 202) {
+                const exportInfo = await response.json();
+                await waitForExport(exportInfo.status_url);
+                response = await fetch(exportInfo.download_url);
+            }
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
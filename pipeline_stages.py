@@ -0,0 +1,179 @@
+import os
+import glob
+import json
+import time
+import hashlib
+
+# ===========================
+# Checkpointed pipeline stages
+# ===========================
+# The video-to-NeRF pipeline as an ordered stage graph. Each stage declares the
+# files it reads and writes (paths, directories or glob patterns); after it
+# succeeds a manifest with the content hashes of both is written to
+# <output_dir>/.stages/<stage>.json. A later run on the same output directory
+# skips every stage whose manifest still matches its parameters, inputs and
+# outputs, and restarts at the first one that does not.
+#
+# video2nerf.py runs frames -> sfm -> transforms -> prune; backend/app.py checks the
+# remaining stages the same way before training, camera path and rendering.
+
+PIPELINE_STAGES = ('frames', 'sfm', 'transforms', 'prune', 'train', 'camera_path', 'render')
+MANIFEST_DIR = '.stages'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class PipelineStage:
+    # `fn()` does the work. Under run_stages() (video2nerf.py) it raises or exits
+    # on failure and its return value is ignored; backend/app.py's
+    # run_checkpointed() instead treats a falsy return as failure, as its stage
+    # functions report errors to the task log and return False. Either way the
+    # manifest is only recorded after a successful run.
+    def __init__(self, name, inputs, outputs, params, fn):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params
+        self.fn = fn
+
+
+def _expand(spec):
+    if os.path.isdir(spec):
+        files = []
+        for root, dirs, names in os.walk(spec):
+            dirs[:] = [d for d in dirs if d != MANIFEST_DIR]
+            files.extend(os.path.join(root, name) for name in names)
+        return sorted(files)
+    if glob.has_magic(spec):
+        return sorted(glob.glob(spec))
+    return [spec] if os.path.isfile(spec) else []
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(specs, previous=None):
+    # {spec: {file: {size, mtime_ns, sha256}}}. Hashes from `previous` (the stored
+    # manifest) are reused for files whose size and mtime did not change, so
+    # checking a stage does not re-read gigabytes of frames.
+    previous = previous or {}
+    result = {}
+    for spec in specs:
+        known = previous.get(spec, {})
+        files = {}
+        for path in _expand(spec):
+            stat = os.stat(path)
+            old = known.get(path)
+            if old is not None and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+                sha = old['sha256']
+            else:
+                sha = _sha256(path)
+            files[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+        result[spec] = files
+    return result
+
+
+def _hashes(fingerprints):
+    # Only content matters for validity; touching a file without changing it is fine
+    return {spec: {path: entry['sha256'] for path, entry in files.items()} for spec, files in fingerprints.items()}
+
+
+def manifest_path(output_dir, stage_name):
+    return os.path.join(output_dir, MANIFEST_DIR, f"{stage_name}.json")
+
+
+def load_manifest(output_dir, stage_name):
+    path = manifest_path(output_dir, stage_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def clear_manifest(output_dir, stage_name):
+    path = manifest_path(output_dir, stage_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def check_stage(output_dir, stage):
+    # Returns None when the stage's recorded result is still valid, otherwise why not
+    manifest = load_manifest(output_dir, stage.name)
+    if manifest is None:
+        return 'not run yet'
+    if manifest['params'] != json.loads(json.dumps(stage.params)):
+        return 'parameters changed'
+    if _hashes(fingerprint(stage.inputs, manifest['inputs'])) != _hashes(manifest['inputs']):
+        return 'inputs changed'
+    outputs = fingerprint(stage.outputs, manifest['outputs'])
+    if any(not files for files in outputs.values()):
+        return 'outputs missing'
+    if _hashes(outputs) != _hashes(manifest['outputs']):
+        return 'outputs modified'
+    return None
+
+
+def record_stage(output_dir, stage, seconds):
+    os.makedirs(os.path.join(output_dir, MANIFEST_DIR), exist_ok=True)
+    manifest = {
+        'stage': stage.name,
+        'params': stage.params,
+        'inputs': fingerprint(stage.inputs),
+        'outputs': fingerprint(stage.outputs),
+        'seconds': round(seconds, 2),
+        'completed_at': time.time(),
+    }
+    path = manifest_path(output_dir, stage.name)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def report_timing(name, seconds):
+    # Parsed by backend/app.py into per-task timings and the /metrics endpoint
+    print(f"[Timing] {name} {seconds:.3f}s", flush=True)
+
+
+def stage_range(names, from_stage=None, to_stage=None):
+    # Indices [start, end] of the stages to consider; raises ValueError on unknown or reversed names
+    for name in (from_stage, to_stage):
+        if name is not None and name not in names:
+            raise ValueError(f"Unknown stage '{name}' (expected one of {', '.join(names)})")
+    start = names.index(from_stage) if from_stage else 0
+    end = names.index(to_stage) if to_stage else len(names) - 1
+    if start > end:
+        raise ValueError(f"--from-stage {from_stage} comes after --to-stage {to_stage}")
+    return start, end
+
+
+def run_stages(output_dir, stages, from_stage=None, to_stage=None):
+    # Stages from `from_stage` on are always rerun; without it, valid stages are
+    # skipped. Stages outside the requested range are not run at all.
+    names = [stage.name for stage in stages]
+    start, end = stage_range(names, from_stage, to_stage)
+    for index, stage in enumerate(stages):
+        if index < start or index > end:
+            continue
+        if from_stage is None:
+            reason = check_stage(output_dir, stage)
+            if reason is None:
+                print(f"[Stages] Skipping {stage.name}: up to date")
+                continue
+        else:
+            reason = f'forced by --from-stage {from_stage}'
+        print(f"[Stages] Running {stage.name} ({reason})")
+        # Drop the old manifest first so a crash mid-stage leaves it invalid
+        clear_manifest(output_dir, stage.name)
+        started = time.time()
+        stage.fn()
+        elapsed = time.time() - started
+        record_stage(output_dir, stage, elapsed)
+        report_timing(stage.name, elapsed)
@@ -0,0 +1,165 @@
+import os
+import json
+import math
+import numpy as np
+from colmap_model import read_model, qvec_to_rotmat, NGP_UNIT_HALF_EXTENT, MAX_AABB_SCALE
+
+# ===========================
+# Pose-based view pruning
+# ===========================
+# A slow-moving camera produces runs of near-identical viewpoints that cost
+# training time without adding coverage. After SfM, the registered views are
+# compared by camera position and viewing direction and thinned with greedy
+# farthest-point sampling: each step keeps the view farthest from everything
+# kept so far, until the next one is closer than `min_distance` (redundant)
+# or `max_views` are kept. Views with far fewer triangulated observations than
+# the median are dropped first as poorly registered.
+#
+# The sparse points also give a tight scene AABB; aabb_scale is the smallest
+# power of two whose instant-ngp cube contains it. The points are mapped into
+# the frame of transforms_in by fitting a similarity transform between the
+# COLMAP camera centres and the frames' positions, so this holds whichever
+# converter wrote the file (its re-centring and scaling need not match ours).
+# The AABB only sets aabb_scale and is not written out. The full
+# transforms.json is kept outside frames/ (instant-ngp loads every .json in the
+# scene directory).
+
+# Weight of the viewing-direction term relative to position (in units of the
+# mean camera distance); 1 - cos of the angle between the two optical axes
+ANGLE_WEIGHT = 1.0
+# Fraction of the sparse points trimmed at each side of every axis for the AABB
+AABB_PERCENTILE = 2.0
+AABB_PADDING = 0.05
+
+
+def view_distances(positions, directions, radius, index):
+    # Distance of view `index` to every view: position change relative to the
+    # scene radius plus the angle between the optical axes
+    position_term = np.linalg.norm(positions - positions[index], axis=1) / radius
+    angle_term = 1.0 - np.clip(directions @ directions[index], -1.0, 1.0)
+    return position_term + ANGLE_WEIGHT * angle_term
+
+
+def farthest_point_sample(positions, directions, max_views=0, min_distance=0.0):
+    # Indices of the kept views in input order, starting from the first view
+    count = len(positions)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    radius = float(np.mean(np.linalg.norm(positions - positions.mean(axis=0), axis=1))) or 1.0
+    limit = min(max_views, count) if max_views > 0 else count
+
+    selected = [0]
+    nearest = view_distances(positions, directions, radius, 0)
+    while len(selected) < limit:
+        index = int(np.argmax(nearest))
+        if nearest[index] <= min_distance:
+            break
+        selected.append(index)
+        nearest = np.minimum(nearest, view_distances(positions, directions, radius, index))
+    return np.sort(np.array(selected, dtype=np.int64))
+
+
+def poorly_registered(track_counts, min_track_ratio):
+    # Mask of views with fewer triangulated observations than min_track_ratio x the median
+    if min_track_ratio <= 0 or len(track_counts) == 0:
+        return np.zeros(len(track_counts), dtype=bool)
+    return track_counts < min_track_ratio * float(np.median(track_counts))
+
+
+def scene_aabb(points, percentile=AABB_PERCENTILE, padding=AABB_PADDING):
+    # (min corner, max corner) of the bulk of the points, padded a little
+    low = np.percentile(points, percentile, axis=0)
+    high = np.percentile(points, 100.0 - percentile, axis=0)
+    margin = (high - low) * padding
+    return low - margin, high + margin
+
+
+def fit_similarity(source, target):
+    # (rotation, translation, scale) best mapping source points onto target
+    # points (Umeyama); None if the points are too few or degenerate to fix it
+    if len(source) < 3:
+        return None
+    source_mean, target_mean = source.mean(axis=0), target.mean(axis=0)
+    source_centered, target_centered = source - source_mean, target - target_mean
+    variance = float(np.mean(np.sum(source_centered ** 2, axis=1)))
+    if variance <= 0:
+        return None
+    u, singular, vt = np.linalg.svd(target_centered.T @ source_centered / len(source))
+    # Collinear cameras leave the rotation about their line undetermined
+    if singular[1] <= 1e-9 * singular[0]:
+        return None
+    sign = np.ones(3)
+    if np.linalg.det(u) * np.linalg.det(vt) < 0:
+        sign[2] = -1.0
+    rotation = u @ np.diag(sign) @ vt
+    scale = float(np.sum(singular * sign)) / variance
+    return rotation, target_mean - scale * rotation @ source_mean, scale
+
+
+def colmap_to_frames(images, frames, c2w):
+    # Similarity transform from COLMAP world coordinates to those of the frames,
+    # fitted on the camera centres of the images both have
+    frame_index = {os.path.basename(frame['file_path']): i for i, frame in enumerate(frames)}
+    pairs = [(i, frame_index[os.path.basename(str(name))]) for i, name in enumerate(images['name'])
+             if os.path.basename(str(name)) in frame_index]
+    if not pairs:
+        return None
+    image_rows, frame_rows = (np.array(rows) for rows in zip(*pairs))
+    rot = qvec_to_rotmat(images['qvec'][image_rows])
+    centers = -np.einsum('nji,nj->ni', rot, images['tvec'][image_rows])
+    return fit_similarity(centers, c2w[frame_rows, :3, 3])
+
+
+def aabb_scale_for(aabb):
+    extent = float(np.max(np.abs(np.concatenate(aabb))))
+    aabb_scale = 2 ** max(0, math.ceil(math.log2(max(extent, 1e-6) / NGP_UNIT_HALF_EXTENT)))
+    return int(min(aabb_scale, MAX_AABB_SCALE))
+
+
+def prune_transforms(sparse_dir, transforms_in, transforms_out, max_views=0, min_distance=0.0, min_track_ratio=0.0, aabb_scale=None):
+    # Writes the pruned transforms.json and returns a summary of what was dropped
+    with open(transforms_in, 'r') as f:
+        transforms = json.load(f)
+    frames = transforms['frames']
+    _, images, points = read_model(sparse_dir)
+    images = images[np.argsort(images['name'])]
+
+    # Observation counts per frame; frames missing from the model count as well registered
+    tracks_by_name = {os.path.basename(str(name)): int(count) for name, count in zip(images['name'], images['num_points3D'])}
+    track_counts = np.array([tracks_by_name.get(os.path.basename(frame['file_path']), -1) for frame in frames], dtype=np.float64)
+    known = track_counts >= 0
+    weak = np.zeros(len(frames), dtype=bool)
+    weak[known] = poorly_registered(track_counts[known], min_track_ratio)
+    if weak.all():
+        weak[:] = False
+
+    c2w = np.array([frame['transform_matrix'] for frame in frames], dtype=np.float64).reshape(-1, 4, 4)
+    candidates = np.flatnonzero(~weak)
+    # NeRF cameras look down their -z axis
+    kept = candidates[farthest_point_sample(c2w[candidates, :3, 3], -c2w[candidates, :3, 2], max_views, min_distance)]
+
+    alignment = colmap_to_frames(images, frames, c2w) if len(points) and not aabb_scale else None
+    if alignment:
+        rotation, translation, scale = alignment
+        transforms['aabb_scale'] = aabb_scale_for(scene_aabb(scale * points['xyz'] @ rotation.T + translation))
+    elif aabb_scale:
+        transforms['aabb_scale'] = aabb_scale
+
+    transforms['frames'] = [frames[i] for i in kept]
+    tmp_path = transforms_out + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(transforms, f, indent=2)
+    os.replace(tmp_path, transforms_out)
+
+    total = len(frames)
+    summary = {
+        'total_views': total,
+        'kept_views': int(len(kept)),
+        'poorly_registered': int(weak.sum()),
+        'redundant': int(len(candidates) - len(kept)),
+        'reduction': round(1.0 - len(kept) / total, 3) if total else 0.0,
+        'aabb_scale': transforms.get('aabb_scale'),
+    }
+    print(f"[Prune] Kept {summary['kept_views']} of {total} views ({100 * summary['reduction']:.0f}% fewer): "
+          f"{summary['redundant']} redundant, {summary['poorly_registered']} poorly registered; aabb_scale {summary['aabb_scale']}")
+    return summary
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from pipeline_stages import PipelineStage, stage_range, check_stage, record_stage, run_stages, manifest_path
+
+
+def make_stage(tmp_path, name='frames', params=None, calls=None):
+    source, output = tmp_path / 'video.mp4', tmp_path / 'frames'
+
+    def fn():
+        output.mkdir(exist_ok=True)
+        (output / '0001.jpg').write_bytes(source.read_bytes()[:4])
+        if calls is not None:
+            calls.append(name)
+    return PipelineStage(name, [str(source)], [str(output)], params or {'fps': 2}, fn)
+
+
+def test_stage_range():
+    names = ['frames', 'sfm', 'transforms', 'prune']
+    assert stage_range(names) == (0, 3)
+    assert stage_range(names, from_stage='sfm') == (1, 3)
+    assert stage_range(names, to_stage='transforms') == (0, 2)
+    assert stage_range(names, 'sfm', 'sfm') == (1, 1)
+    with pytest.raises(ValueError, match='Unknown stage'):
+        stage_range(names, from_stage='train')
+    with pytest.raises(ValueError, match='comes after'):
+        stage_range(names, 'prune', 'sfm')
+
+
+def test_check_stage_invalidation(tmp_path):
+    (tmp_path / 'video.mp4').write_bytes(b'video one')
+    stage = make_stage(tmp_path)
+    assert check_stage(str(tmp_path), stage) == 'not run yet'
+    stage.fn()
+    record_stage(str(tmp_path), stage, 1.0)
+    assert check_stage(str(tmp_path), stage) is None
+
+    # Touching a file without changing its content keeps the result valid
+    os.utime(tmp_path / 'video.mp4', ns=(0, 0))
+    assert check_stage(str(tmp_path), stage) is None
+
+    assert check_stage(str(tmp_path), make_stage(tmp_path, params={'fps': 4})) == 'parameters changed'
+    (tmp_path / 'frames' / '0001.jpg').write_bytes(b'edit')
+    assert check_stage(str(tmp_path), stage) == 'outputs modified'
+    (tmp_path / 'frames' / '0001.jpg').unlink()
+    assert check_stage(str(tmp_path), stage) == 'outputs missing'
+    (tmp_path / 'video.mp4').write_bytes(b'video two')
+    assert check_stage(str(tmp_path), stage) == 'inputs changed'
+
+
+def test_run_stages_skips_valid_and_reruns_forced(tmp_path, capsys):
+    (tmp_path / 'video.mp4').write_bytes(b'video one')
+    calls = []
+    stages = [make_stage(tmp_path, 'frames', calls=calls), make_stage(tmp_path, 'sfm', calls=calls)]
+    run_stages(str(tmp_path), stages)
+    assert calls == ['frames', 'sfm']
+    assert os.path.exists(manifest_path(str(tmp_path), 'sfm'))
+
+    run_stages(str(tmp_path), stages)
+    assert calls == ['frames', 'sfm']
+    assert '[Stages] Skipping frames: up to date' in capsys.readouterr().out
+
+    run_stages(str(tmp_path), stages, from_stage='sfm')
+    assert calls == ['frames', 'sfm', 'sfm']
+    run_stages(str(tmp_path), stages, from_stage='frames', to_stage='frames')
+    assert calls == ['frames', 'sfm', 'sfm', 'frames']
+
+
+def test_failed_stage_leaves_no_manifest(tmp_path):
+    (tmp_path / 'video.mp4').write_bytes(b'video one')
+    stage = make_stage(tmp_path)
+    run_stages(str(tmp_path), [stage])
+
+    def fail():
+        raise RuntimeError('extraction failed')
+    stage.fn = fail
+    with pytest.raises(RuntimeError):
+        run_stages(str(tmp_path), [stage], from_stage='frames')
+    assert check_stage(str(tmp_path), stage) == 'not run yet'
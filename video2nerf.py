@@ -3,7 +3,18 @@ import subprocess
 import sys
 import argparse # Import argparse
 import json # Import json for post-processing
+import struct
+import shutil
+import time
 from dotenv import load_dotenv # Import load_dotenv
+from keyframes import extract_keyframes
+from frame_extractor import FRAME_FORMATS, DEFAULT_JPEG_QUALITY, MANIFEST_NAME, extract_frames as extract_fps_frames, frame_glob, clear_frames
+from colmap_runner import run_sequential_reconstruction, run_automatic_reconstruction
+from feature_cache import FeatureCache
+from colmap_model import write_transforms
+from colmap2nerf_runner import run_colmap2nerf
+from prune_views import prune_transforms
+from pipeline_stages import PipelineStage, run_stages, report_timing
 
 # ===========================
 # USER SETTINGS
@@ -15,12 +26,46 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 parser = argparse.ArgumentParser(description="Run video2nerf process.")
 parser.add_argument('--video_path', type=str, required=True, help='Path to the input video file.')
 parser.add_argument('--output_dir', type=str, default=os.path.join(os.path.dirname(__file__), "output"), help='Directory to save output files.') # Set default output_dir
-parser.add_argument('--fps', type=int, default=4, help='Frames per second to extract from the video.')
+parser.add_argument('--fps', type=float, default=4, help='Frames per second to extract from the video.')
+parser.add_argument('--frame_width', type=int, default=0, help='Downscale extracted frames to this width, keeping the aspect ratio (0 = source size).')
+parser.add_argument('--frame_format', type=str, default='jpg', choices=sorted(FRAME_FORMATS), help='Image format of the extracted frames (raw = uncompressed BMP).')
+parser.add_argument('--jpeg_quality', type=int, default=DEFAULT_JPEG_QUALITY, help='JPEG quality of the extracted frames.')
+parser.add_argument('--frame_workers', type=int, default=0, help='Threads encoding extracted frames (0 = all cores).')
+parser.add_argument('--frame_selection', type=str, default='fps', choices=['fps', 'keyframes'], help='Extract frames at a fixed fps, or pick sharp, well-spaced keyframes.')
+parser.add_argument('--target_frames', type=int, default=120, help='Number of keyframes to keep when --frame_selection keyframes.')
+parser.add_argument('--candidate_fps_multiplier', type=int, default=3, help='Keyframe candidates are sampled at fps times this value.')
+parser.add_argument('--colmap_quality', type=str, default='low', choices=['low', 'medium', 'high', 'extreme'], help='Quality preset for COLMAP automatic reconstruction.')
+parser.add_argument('--sfm', type=str, default='sequential', choices=['sequential', 'automatic'], help='Staged sequential-matching reconstruction, or the one-shot automatic_reconstructor fallback.')
+parser.add_argument('--sequential_overlap', type=int, default=10, help='Number of following frames each frame is matched against.')
+parser.add_argument('--loop_detection', action='store_true', help='Enable vocabulary-tree loop detection in the sequential matcher.')
+parser.add_argument('--vocab_tree_path', type=str, default=None, help='Vocabulary tree file, required for --loop_detection.')
+parser.add_argument('--extractor_threads', type=int, default=-1, help='Threads for COLMAP feature extraction (-1 = all cores).')
+parser.add_argument('--extractor_gpu', type=int, default=1, choices=[0, 1], help='Use the GPU for COLMAP feature extraction.')
+parser.add_argument('--matcher_threads', type=int, default=-1, help='Threads for COLMAP sequential matching (-1 = all cores).')
+parser.add_argument('--matcher_gpu', type=int, default=1, choices=[0, 1], help='Use the GPU for COLMAP sequential matching.')
+parser.add_argument('--mapper_threads', type=int, default=-1, help='Threads for the COLMAP mapper (-1 = all cores).')
+parser.add_argument('--mapper_gpu', type=int, default=None, choices=[0, 1], help='Use the GPU for mapper bundle adjustment (COLMAP default if omitted).')
+parser.add_argument('--feature_cache', type=str, default=None, help='SQLite file caching SIFT features and matches across runs (sequential SfM only).')
+parser.add_argument('--feature_cache_max_gb', type=float, default=20.0, help='Size limit of the feature cache.')
+parser.add_argument('--converter', type=str, default='native', choices=['native', 'colmap2nerf'], help='Convert the sparse model in-process, or via model_converter + colmap2nerf.py.')
+parser.add_argument('--aabb_scale', type=int, default=None, help='Override the aabb_scale computed from the sparse points.')
+parser.add_argument('--prune_max_views', type=int, default=0, help='Keep at most this many training views (0 = no limit).')
+parser.add_argument('--prune_min_distance', type=float, default=0.02, help='Drop views closer than this (position change / scene radius + 1 - cos of the view angle) to a kept view; 0 keeps them all.')
+parser.add_argument('--prune_min_track_ratio', type=float, default=0.25, help='Drop views with fewer triangulated points than this fraction of the median; 0 disables.')
+parser.add_argument('--from-stage', dest='from_stage', type=str, default=None, choices=['frames', 'sfm', 'transforms', 'prune'], help='Rerun from this stage even if its previous result is still valid.')
+parser.add_argument('--to-stage', dest='to_stage', type=str, default=None, choices=['frames', 'sfm', 'transforms', 'prune'], help='Stop after this stage.')
 args = parser.parse_args()
 
 VIDEO_PATH = args.video_path
 OUTPUT_DIR = args.output_dir
 FPS = args.fps
+FRAME_WIDTH = args.frame_width
+COLMAP_QUALITY = args.colmap_quality
+FRAME_SELECTION = args.frame_selection
+TARGET_FRAMES = args.target_frames
+CANDIDATE_FPS = FPS * args.candidate_fps_multiplier
+CONVERTER = args.converter
+AABB_SCALE = args.aabb_scale
 
 COLMAP_PATH = os.getenv("COLMAP_PATH")  # <-- your COLMAP path
 INSTANT_NGP_SCRIPTS = os.getenv("INSTANT_NGP_SCRIPTS")
@@ -40,56 +85,153 @@ def run(cmd):
 # ===========================
 frames_dir = os.path.join(OUTPUT_DIR, "frames")
 os.makedirs(frames_dir, exist_ok=True)
-
-run(f'ffmpeg -i "{VIDEO_PATH}" -q:v 2 -vf "fps={FPS}" "{frames_dir}\\frame_%04d.jpg"')
+frame_pattern = frame_glob(frames_dir, args.frame_format)
+# Source frame index, timestamp and hash of every frame (see frame_extractor.py)
+frames_manifest = os.path.join(OUTPUT_DIR, MANIFEST_NAME)
+
+def extract_frames():
+    clear_frames(frames_dir)
+    write_options = {'image_format': args.frame_format, 'jpeg_quality': args.jpeg_quality,
+                     'workers': args.frame_workers, 'manifest_path': frames_manifest}
+    try:
+        if FRAME_SELECTION == 'keyframes':
+            written = extract_keyframes(VIDEO_PATH, frames_dir, TARGET_FRAMES, CANDIDATE_FPS, FRAME_WIDTH, **write_options)
+        else:
+            written = extract_fps_frames(VIDEO_PATH, frames_dir, fps=FPS, frame_width=FRAME_WIDTH, **write_options)
+    except RuntimeError as e:
+        print(f"❌ Frame extraction failed: {e}")
+        sys.exit(1)
+    if not written:
+        print(f"❌ No frames could be extracted from {VIDEO_PATH}")
+        sys.exit(1)
+    print(f"[Frames] {len(written)} frames ({args.frame_format}, {written[0]['width']}x{written[0]['height']}) written to {frames_dir}")
 
 # ===========================
-# 2. Run COLMAP automatic reconstruction
+# 2. Run COLMAP reconstruction
 # ===========================
 colmap_project = os.path.join(OUTPUT_DIR, "colmap_project")
-os.makedirs(colmap_project, exist_ok=True)
-
-run(f'"{COLMAP_PATH}" automatic_reconstructor --workspace_path "{colmap_project}" --image_path "{frames_dir}" --quality low')
+colmap_sparse = os.path.join(colmap_project, "sparse", "0")
+sfm_options = {
+    'feature_extractor': {'num_threads': args.extractor_threads, 'use_gpu': bool(args.extractor_gpu)},
+    'sequential_matcher': {'num_threads': args.matcher_threads, 'use_gpu': bool(args.matcher_gpu)},
+    'mapper': {'num_threads': args.mapper_threads, 'use_gpu': None if args.mapper_gpu is None else bool(args.mapper_gpu)},
+}
+
+def reconstruct():
+    # Start from an empty workspace: COLMAP would otherwise add to the old database
+    shutil.rmtree(colmap_project, ignore_errors=True)
+    os.makedirs(colmap_project, exist_ok=True)
+    try:
+        if args.sfm == 'sequential':
+            feature_cache = None
+            if args.feature_cache:
+                # Only settings that change the extracted features / matches are part of the key
+                feature_cache = FeatureCache(
+                    args.feature_cache,
+                    {'camera_model': 'OPENCV', 'single_camera': True, 'use_gpu': sfm_options['feature_extractor']['use_gpu']},
+                    {'use_gpu': sfm_options['sequential_matcher']['use_gpu']},
+                    int(args.feature_cache_max_gb * 1024 ** 3))
+            sfm_timings = run_sequential_reconstruction(
+                COLMAP_PATH, frames_dir, colmap_project,
+                overlap=args.sequential_overlap,
+                loop_detection=args.loop_detection,
+                vocab_tree_path=args.vocab_tree_path,
+                options=sfm_options,
+                feature_cache=feature_cache)
+        else:
+            sfm_timings = run_automatic_reconstruction(COLMAP_PATH, frames_dir, colmap_project, quality=COLMAP_QUALITY)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"[COLMAP] Stage timings (s): {json.dumps({k: round(v, 2) for k, v in sfm_timings.items()})}")
+    for step, seconds in sfm_timings.items():
+        report_timing(f'sfm.{step}', seconds)
 
 # ===========================
-# 3. Export sparse model to text format
+# 3. Convert sparse model to transforms.json
 # ===========================
-colmap_sparse = os.path.join(colmap_project, "sparse", "0")
-colmap_text = os.path.join(OUTPUT_DIR, "colmap_text")
-os.makedirs(colmap_text, exist_ok=True)
+# Every registered view; the pruned training set goes to frames/transforms.json
+transforms_full = os.path.join(OUTPUT_DIR, "transforms_full.json")
+transforms_out = os.path.join(frames_dir, "transforms.json")
 
-run(f'"{COLMAP_PATH}" model_converter --input_path "{colmap_sparse}" --output_path "{colmap_text}" --output_type TXT')
+def convert_model():
+    if CONVERTER == 'native':
+        # Read the binary model in-process and write the final transforms.json in one pass
+        try:
+            write_transforms(colmap_sparse, transforms_full, aabb_scale=AABB_SCALE)
+        except (OSError, KeyError, ValueError, RuntimeError, struct.error) as e:
+            print(f"❌ Failed to convert COLMAP model {colmap_sparse}: {e}")
+            sys.exit(1)
+        return
+
+    # Legacy path: export the model to text, then run instant-ngp's colmap2nerf.py on it
+    colmap_text = os.path.join(OUTPUT_DIR, "colmap_text")
+    os.makedirs(colmap_text, exist_ok=True)
+
+    started = time.time()
+    run(f'"{COLMAP_PATH}" model_converter --input_path "{colmap_sparse}" --output_path "{colmap_text}" --output_type TXT')
+    report_timing('transforms.model_converter', time.time() - started)
+
+    # Run with this job's paths; the shared script itself is never modified (see colmap2nerf_runner.py)
+    colmap2nerf_script = os.path.join(INSTANT_NGP_SCRIPTS, "colmap2nerf.py")
+    try:
+        seconds = run_colmap2nerf(colmap2nerf_script, colmap_text, frames_dir, transforms_full,
+                                  colmap_db=os.path.join(colmap_project, "database.db"))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    report_timing('transforms.colmap2nerf', seconds)
+
+    # Post-process transforms.json to simplify file paths
+    try:
+        with open(transforms_full, 'r') as f:
+            transforms_data = json.load(f)
+
+        for frame in transforms_data['frames']:
+            # Extract only the filename from the file_path
+            frame['file_path'] = os.path.basename(frame['file_path'])
+
+        with open(transforms_full, 'w') as f:
+            json.dump(transforms_data, f, indent=2)
+        
+        print(f"[Post-processing] transforms.json updated successfully.")
+    except Exception as e:
+        print(f"[Post-processing Error] Failed to post-process transforms.json: {e}")
 
 # ===========================
-# 4. Run colmap2nerf.py
+# 4. Prune redundant views, compute the scene bounds
 # ===========================
-colmap2nerf_script = os.path.join(INSTANT_NGP_SCRIPTS, "colmap2nerf.py")
+prune_options = {'max_views': args.prune_max_views, 'min_distance': args.prune_min_distance, 'min_track_ratio': args.prune_min_track_ratio}
 
-# Make sure colmap2nerf.py points to correct TEXT_FOLDER
-with open(colmap2nerf_script, "r") as f:
-    content = f.read()
-content = content.replace('TEXT_FOLDER = r"D:\VScode\Code\simpleNeRF\dataset\my_video\output\colmap_text"', f'TEXT_FOLDER = r"{colmap_text}"')
-with open(colmap2nerf_script, "w") as f:
-    f.write(content)
+def prune_views():
+    try:
+        summary = prune_transforms(colmap_sparse, transforms_full, transforms_out, aabb_scale=AABB_SCALE, **prune_options)
+    except (OSError, KeyError, ValueError, struct.error) as e:
+        print(f"❌ Failed to prune views from {transforms_full}: {e}")
+        sys.exit(1)
+    # Parsed by backend/app.py into the task record
+    print(f"[Prune] Summary: {json.dumps(summary)}")
 
-transforms_out = os.path.join(frames_dir, "transforms.json")
-run(f'python "{colmap2nerf_script}" --colmap_db "{os.path.join(colmap_project, "database.db")}" --images "{frames_dir}" --text "{colmap_text}" --out "{transforms_out}"')
+# ===========================
+# Run the stages, skipping those whose outputs are still valid
+# ===========================
+stages = [
+    PipelineStage('frames', [VIDEO_PATH], [frame_pattern, frames_manifest],
+                  {'frame_selection': FRAME_SELECTION, 'fps': FPS, 'target_frames': TARGET_FRAMES, 'candidate_fps': CANDIDATE_FPS,
+                   'frame_width': FRAME_WIDTH, 'frame_format': args.frame_format, 'jpeg_quality': args.jpeg_quality},
+                  extract_frames),
+    PipelineStage('sfm', [frame_pattern], [colmap_sparse],
+                  {'sfm': args.sfm, 'colmap_quality': COLMAP_QUALITY, 'overlap': args.sequential_overlap,
+                   'loop_detection': args.loop_detection, 'vocab_tree_path': args.vocab_tree_path, 'options': sfm_options},
+                  reconstruct),
+    PipelineStage('transforms', [colmap_sparse, frame_pattern], [transforms_full],
+                  {'converter': CONVERTER, 'aabb_scale': AABB_SCALE},
+                  convert_model),
+    PipelineStage('prune', [transforms_full, colmap_sparse], [transforms_out],
+                  {'aabb_scale': AABB_SCALE, **prune_options},
+                  prune_views),
+]
+run_stages(OUTPUT_DIR, stages, from_stage=args.from_stage, to_stage=args.to_stage)
 
 print("\nAll done! Open this folder in instant-ngp.exe (NeRF mode):")
 print(frames_dir)
-
-# Post-process transforms.json to simplify file paths
-try:
-    with open(transforms_out, 'r') as f:
-        transforms_data = json.load(f)
-
-    for frame in transforms_data['frames']:
-        # Extract only the filename from the file_path
-        frame['file_path'] = os.path.basename(frame['file_path'])
-
-    with open(transforms_out, 'w') as f:
-        json.dump(transforms_data, f, indent=2)
-    
-    print(f"[Post-processing] transforms.json updated successfully.")
-except Exception as e:
-    print(f"[Post-processing Error] Failed to post-process transforms.json: {e}")